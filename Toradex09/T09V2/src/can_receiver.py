@@ -1,131 +1,32 @@
+import os
 import can
 import logging
 from time import sleep
 from collections import defaultdict
+from pathlib import Path
 
-# Funções de processamento
-def process_id_0080(msg):
-    """Processa mensagens com ID 0x0080"""
-    data = msg.data
-    if len(data) >= 8:
-        apps_real = (data[0] << 8) | data[1]
-        bse_real = (data[2] << 8) | data[3]
-        volante = (data[4] << 8) | data[5]
-        erros = data[6]
-        contador = data[7]
-        return {
-            'APPS Real': apps_real,
-            'BSE Real': bse_real,
-            'Volante': volante,
-            'Erros': erros,
-            'Contador': contador
-        }
-    return None
+from can_dbc import load_compiled
 
-def process_id_0090(msg):
-    """Processa mensagens com ID 0x0090"""
-    data = msg.data
-    if len(data) >= 6:
-        apps1raw = (data[0] << 8) | data[1]
-        apps2raw = (data[2] << 8) | data[3]
-        erros = data[4]
-        contador = data[5]
-        return {
-            'apps1Raw': apps1raw,
-            'apps2Raw': apps2raw,
-            'Erros': erros,
-            'Contador': contador
-        }
-    return None
+# Sinais do T09 em t09.dbc, com as chaves deste projeto (visão "T09V2"
+# do DBC). CAN_DBC aponta para outro arquivo.
+CAN_DBC = os.getenv("CAN_DBC", str(Path(__file__).with_name("t09.dbc")))
+DBC_VIEW = "T09V2"
 
-def process_id_0091(msg):
-    """Processa mensagens com ID 0x0091"""
-    data = msg.data
-    if len(data) >= 7:
-        bse1raw = (data[0] << 8) | data[1]
-        bse2raw = (data[2] << 8) | data[3]
-        volraw = (data[4] << 8) | data[5]
-        contador = data[6]
-        return {
-            'bse1Raw': bse1raw,
-            'bse2Raw': bse2raw,
-            'volRaw': volraw,
-            'Contador': contador
-        }
-    return None
+def _dbc_processor(message):
+    """Função de processamento de um ID: {chave: valor} a partir do DBC."""
+    keys = message.names
 
-def process_id_003B(msg):
-    """Processa mensagens com ID 0x003B"""
-    data = msg.data
-    if len(data) >= 5:
-        corrente_pack = data[0]
-        in_use_1 = data[1]
-        tensao_instantanea = data[2]
-        in_use_2 = data[3]
-        crc_checksum = data[4]
-        return {
-            'CorrentePack': corrente_pack,
-            'IN_USE_1': in_use_1,
-            'TensaoInstantanea': tensao_instantanea,
-            'IN_USE_2': in_use_2,
-            'CRC_Checksum': crc_checksum
-        }
-    return None
+    def process(msg):
+        if len(msg.data) < message.size:
+            return None
+        return dict(zip(keys, message.values(msg.data)))
 
-def process_id_03CB(msg):
-    """Processa mensagens com ID 0x03CB"""
-    data = msg.data
-    if len(data) >= 7:
-        pack_dcl = data[0]
-        pack_ccl = data[1]
-        blank = data[2]
-        simulated_soc = data[3]
-        high_temp = data[4]
-        low_temp = data[5]
-        crc_checksum = data[6]
-        return {
-            'PackDCL': pack_dcl,
-            'PackCCL': pack_ccl,
-            'Blank': blank,
-            'SimulatedSOC': simulated_soc,
-            'HighTemp': high_temp,
-            'LowTemp': low_temp,
-            'CRC_Checksum': crc_checksum
-        }
-    return None
-
-def process_id_06B2(msg):
-    """Processa mensagens com ID 0x06B2"""
-    data = msg.data
-    if len(data) >= 8:
-        relay_state = data[0]
-        pack_soc = data[1]
-        pack_resistance = data[2]
-        in_use_1 = data[3]
-        pack_open_voltage = data[4]
-        in_use_2 = data[5]
-        pack_amphours = data[6]
-        crc_checksum = data[7]
-        return {
-            'RelayState': relay_state,
-            'PackSOC': pack_soc,
-            'PackResistance': pack_resistance,
-            'IN_USE_1': in_use_1,
-            'PackOpenVoltage': pack_open_voltage,
-            'IN_USE_2': in_use_2,
-            'PackAmphours': pack_amphours,
-            'CRC_Checksum': crc_checksum
-        }
-    return None
+    return process
 
 # Mapeamento de IDs para funções de processamento
 PROCESS_FUNCTIONS = {
-    0x0080: process_id_0080,
-    0x0090: process_id_0090,
-    0x0091: process_id_0091,
-    0x003B: process_id_003B,
-    0x03CB: process_id_03CB,
-    0x06B2: process_id_06B2
+    can_id: _dbc_processor(message)
+    for can_id, message in load_compiled(CAN_DBC, DBC_VIEW).items()
 }
 
 # Dicionário global para armazenar os dados processados
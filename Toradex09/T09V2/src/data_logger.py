@@ -4,105 +4,31 @@ from datetime import datetime
 import logging
 import csv
 from collections import defaultdict
+from pathlib import Path
 
-# Funções de processamento (adaptadas de Processo.py)
-def process_id_0080(timestamp, data):
-    """Processa mensagens com ID 0x0080"""
-    if len(data) >= 8:
-        apps_real = (data[0] << 8) | data[1]
-        bse_real = (data[2] << 8) | data[3]
-        volante = (data[4] << 8) | data[5]
-        erros = data[6]
-        contador = data[7]
-        return [timestamp, apps_real, bse_real, volante, erros, contador]
-    return None
+from can_dbc import load_compiled
 
-def process_id_0090(timestamp, data):
-    """Processa mensagens com ID 0x0090"""
-    if len(data) >= 6:
-        apps1raw = (data[0] << 8) | data[1]
-        apps2raw = (data[2] << 8) | data[3]
-        erros = data[4]
-        contador = data[5]
-        return [timestamp, apps1raw, apps2raw, erros, contador]
-    return None
+# Sinais do T09 em t09.dbc, com as colunas deste projeto (visão "T09V2"
+# do DBC). CAN_DBC aponta para outro arquivo.
+CAN_DBC = os.getenv("CAN_DBC", str(Path(__file__).with_name("t09.dbc")))
+DBC_VIEW = "T09V2"
 
-def process_id_0091(timestamp, data):
-    """Processa mensagens com ID 0x0091"""
-    if len(data) >= 7:
-        bse1raw = (data[0] << 8) | data[1]
-        bse2raw = (data[2] << 8) | data[3]
-        volraw = (data[4] << 8) | data[5]
-        contador = data[6]
-        return [timestamp, bse1raw, bse2raw, volraw, contador]
-    return None
+def _dbc_process_info(message):
+    """Entrada de PROCESS_FUNCTIONS (função + cabeçalho CSV) gerada a partir do DBC."""
+    def process(timestamp, data):
+        if len(data) < message.size:
+            return None
+        return [timestamp, *message.values(data)]
 
-def process_id_003B(timestamp, data):
-    """Processa mensagens com ID 0x003B"""
-    if len(data) >= 5:
-        corrente_pack = data[0]
-        in_use_1 = data[1]
-        tensao_instantanea = data[2]
-        in_use_2 = data[3]
-        crc_checksum = data[4]
-        return [timestamp, corrente_pack, in_use_1, tensao_instantanea, in_use_2, crc_checksum]
-    return None
-
-def process_id_03CB(timestamp, data):
-    """Processa mensagens com ID 0x03CB"""
-    if len(data) >= 7:
-        pack_dcl = data[0]
-        pack_ccl = data[1]
-        blank = data[2]
-        simulated_soc = data[3]
-        high_temp = data[4]
-        low_temp = data[5]
-        crc_checksum = data[6]
-        return [timestamp, pack_dcl, pack_ccl, blank, simulated_soc, high_temp, low_temp, crc_checksum]
-    return None
-
-def process_id_06B2(timestamp, data):
-    """Processa mensagens com ID 0x06B2"""
-    if len(data) >= 8:
-        relay_state = data[0]
-        pack_soc = data[1]
-        pack_resistance = data[2]
-        in_use_1 = data[3]
-        pack_open_voltage = data[4]
-        in_use_2 = data[5]
-        pack_amphours = data[6]
-        crc_checksum = data[7]
-        return [timestamp, relay_state, pack_soc, pack_resistance, in_use_1, 
-                pack_open_voltage, in_use_2, pack_amphours, crc_checksum]
-    return None
+    return {
+        'function': process,
+        'header': ['Timestamp', *message.names]
+    }
 
 # Mapeamento de IDs para funções de processamento e cabeçalhos
 PROCESS_FUNCTIONS = {
-    0x0080: {
-        'function': process_id_0080,
-        'header': ['Timestamp', 'APPS Real', 'BSE Real', 'Volante', 'Erros', 'Contador']
-    },
-    0x0090: {
-        'function': process_id_0090,
-        'header': ['Timestamp', 'apps1Raw', 'apps2Raw', 'Erros', 'Contador']
-    },
-    0x0091: {
-        'function': process_id_0091,
-        'header': ['Timestamp', 'bse1Raw', 'bse2Raw', 'volRaw', 'Contador']
-    },
-    0x003B: {
-        'function': process_id_003B,
-        'header': ['Timestamp', 'CorrentePack', 'IN_USE_1', 'TensaoInstantanea', 'IN_USE_2', 'CRC_Checksum']
-    },
-    0x03CB: {
-        'function': process_id_03CB,
-        'header': ['Timestamp', 'PackDCL', 'PackCCL', 'Blank', 'SimulatedSOC', 'HighTemp', 'LowTemp', 'CRC_Checksum']
-    },
-    0x06B2: {
-        'function': process_id_06B2,
-        'header': ['Timestamp', 'RelayState', 'PackSOC', 'PackResistance', 'IN_USE_1', 
-                  'PackOpenVoltage', 'IN_USE_2', 'PackAmphours', 'CRC_Checksum']
-    }
+    can_id: _dbc_process_info(message)
+    for can_id, message in load_compiled(CAN_DBC, DBC_VIEW).items()
 }
 
 class DataLogger:
@@ -184,8 +110,10 @@ class DataLogger:
 
     def process_message(self, message):
         """Processa uma mensagem CAN para log bruto e processado"""
-        # Formatar dados para log bruto
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        # Formatar dados para log bruto com o timestamp de recepção do kernel
+        # (SO_TIMESTAMP), sem o atraso de fila/processamento do datetime.now()
+        received = datetime.fromtimestamp(message.timestamp) if message.timestamp else datetime.now()
+        timestamp = received.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
         can_id = f"0x{message.arbitration_id:04X}"
         data_hex = message.data.hex().upper()
         
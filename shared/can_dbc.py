@@ -0,0 +1,276 @@
+"""
+Tabela de sinais CAN: leitura de DBC e compilação para decodificação rápida.
+
+Módulo sem dependências externas, usado pelo gateway e pelos projetos
+Toradex09 e Toradexvcan. O original fica em shared/can_dbc.py; altere lá e
+rode python shared/sync.py para atualizar as cópias.
+
+Só sinais alinhados em byte (1, 2, 4 ou 8 bytes) são suportados, que é o
+que todas as ECUs do carro usam; o resto é rejeitado ao carregar o DBC.
+"""
+import re
+import struct
+from collections import namedtuple
+from functools import lru_cache
+
+
+# ============================================
+# Signal table
+# ============================================
+#
+# Cada ID lista seus sinais como:
+#   start (byte), length (bytes), signed, endian ("big"/"little"),
+#   scale, offset, unit, name
+# valor = raw * scale + offset
+
+Signal = namedtuple(
+    "Signal",
+    ["start", "length", "signed", "endian", "scale", "offset", "unit", "name"]
+)
+
+
+# ============================================
+# Compilation
+# ============================================
+
+_STRUCT_CODES = {1: "b", 2: "h", 4: "i", 8: "q"}
+
+
+class CompiledMessage:
+    """
+    Um ID CAN compilado: um struct.Struct cobrindo os sinais (bytes não
+    usados viram padding) e escala/offset resolvidos no startup. Sinais
+    sobrepostos (ex.: um campo de 16 bits e os seus dois bytes) vão para
+    structs separados, lidos do mesmo frame.
+    """
+
+    def __init__(self, can_id, signals):
+        signals = sorted(signals, key=lambda s: s.start)
+
+        endians = {s.endian for s in signals if s.length > 1}
+        if len(endians) > 1:
+            raise ValueError(f"ID {can_id:#05x} mistura big e little endian")
+        prefix = "<" if endians == {"little"} else ">"
+
+        # Cada camada é uma sequência de sinais sem sobreposição:
+        # [fmt, fim do último sinal, índices dos sinais]
+        layers = []
+        for index, s in enumerate(signals):
+            layer = next((c for c in layers if c[1] <= s.start), None)
+            if layer is None:
+                layer = [prefix, 0, []]
+                layers.append(layer)
+            code = _STRUCT_CODES[s.length]
+            layer[0] += "x" * (s.start - layer[1]) + (code if s.signed else code.upper())
+            layer[1] = s.start + s.length
+            layer[2].append(index)
+
+        self.can_id = can_id
+        self.signals = tuple(signals)
+        self.names = tuple(s.name for s in signals)
+        self.units = tuple(s.unit for s in signals)
+        self.structs = tuple(struct.Struct(fmt) for fmt, _, _ in layers)
+        self.layers = tuple(tuple(indices) for _, _, indices in layers)
+        self.size = max((st.size for st in self.structs), default=0)
+        self.scales = tuple(s.scale for s in signals)
+        self.offsets = tuple(s.offset for s in signals)
+
+        self.values = self._values_function()
+
+    def _values_function(self):
+        """
+        Função data -> tupla de valores físicos, montada uma vez por ID:
+        sem escala/offset é o próprio unpack_from do struct.
+        """
+        unpacks = [st.unpack_from for st in self.structs]
+
+        if len(unpacks) == 1:
+            unpack = unpacks[0]
+        else:
+            # Camadas lidas em sequência e reordenadas para a ordem dos sinais
+            order = [0] * len(self.signals)
+            for position, index in enumerate(i for layer in self.layers for i in layer):
+                order[index] = position
+
+            def unpack(data):
+                raw = [v for unpack_from in unpacks for v in unpack_from(data)]
+                return [raw[i] for i in order]
+
+        if all(sc == 1 for sc in self.scales) and all(of == 0 for of in self.offsets):
+            if len(unpacks) == 1:
+                return unpack
+            return lambda data: tuple(unpack(data))
+
+        # Sinais sem escala/offset passam direto (inteiros continuam inteiros)
+        scaled = tuple(
+            (i, sc, of) for i, (sc, of) in enumerate(zip(self.scales, self.offsets))
+            if sc != 1 or of != 0
+        )
+
+        def values(data):
+            v = list(unpack(data))
+            for i, sc, of in scaled:
+                v[i] = v[i] * sc + of
+            return tuple(v)
+
+        return values
+
+    def signal_dicts(self, values):
+        """Sinais no formato JSON do gateway: [{"name", "value", "unit"}, ...]."""
+        return [
+            {"name": name, "value": value, "unit": unit}
+            for name, value, unit in zip(self.names, values, self.units)
+        ]
+
+
+def compile_table(table):
+    return {can_id: CompiledMessage(can_id, signals) for can_id, signals in table.items()}
+
+
+# ============================================
+# DBC
+# ============================================
+#
+# O nome publicado de cada sinal é "/<mensagem>/<sinal>". Quando o prefixo
+# não é um identificador DBC válido (ex.: "/0x100"), use o atributo de
+# mensagem "Topic"; nomes que nem cabem nesse formato (ex.: com espaço)
+# vão no atributo "Topic" do sinal, e "Unit" troca a unidade publicada:
+#   BA_DEF_ BO_ "Topic" STRING ;
+#   BA_ "Topic" BO_ 256 "/0x100";
+#   BA_ "Topic" SG_ 1412 RPM_Motor_L "/0x584/RMP Motor L";
+#   BA_ "Unit" SG_ 1714 Resistence "ohms?";
+#
+# Um DBC pode servir projetos que publicam os mesmos frames com nomes
+# diferentes: com view="T09V2" valem os atributos "Topic_T09V2" e
+# "Unit_T09V2", e só entram os sinais que têm nome nessa visão.
+
+_BO = re.compile(r"^BO_\s+(\d+)\s+(\w+)\s*:\s*(\d+)\s+\w+")
+_SG = re.compile(
+    r"^SG_\s+(\w+)\s*(?:[Mm]\d*\s*)?:\s*(\d+)\|(\d+)@([01])([+-])\s*"
+    r"\(\s*([^,\s]+)\s*,\s*([^)\s]+)\s*\)\s*\[[^\]]*\]\s*\"([^\"]*)\""
+)
+_BA = re.compile(r'^BA_\s+"(\w+)"\s+(?:BO_\s+(\d+)|SG_\s+(\d+)\s+(\w+))\s+"([^"]*)"\s*;')
+
+_CAN_ID_MASK = 0x1FFFFFFF
+
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and not any(c in text for c in ".eE") else value
+
+
+def _dbc_signal(msg_name, can_id, line):
+    m = _SG.match(line)
+    if not m:
+        raise ValueError(f"Linha SG_ inválida no ID {can_id:#05x}: {line}")
+
+    name, start_bit, bits, byte_order, sign, scale, offset, unit = m.groups()
+    start_bit, bits = int(start_bit), int(bits)
+
+    if bits % 8 or bits // 8 not in _STRUCT_CODES:
+        raise ValueError(f"{msg_name}.{name}: só sinais de 8/16/32/64 bits são suportados")
+
+    if byte_order == "0":
+        # Motorola: start bit é o MSB, que fica no bit 7 do primeiro byte
+        if start_bit % 8 != 7:
+            raise ValueError(f"{msg_name}.{name}: sinal big endian não alinhado em byte")
+        endian = "big"
+    else:
+        if start_bit % 8 != 0:
+            raise ValueError(f"{msg_name}.{name}: sinal little endian não alinhado em byte")
+        endian = "little"
+
+    return Signal(
+        start=start_bit // 8,
+        length=bits // 8,
+        signed=sign == "-",
+        endian=endian,
+        scale=_number(scale),
+        offset=_number(offset),
+        unit=unit,
+        name=name,
+    )
+
+
+def parse_dbc(text, view=None):
+    """
+    Converte o conteúdo de um DBC na tabela {can_id: [Signal, ...]},
+    com os nomes e unidades da visão pedida (None: todos os sinais).
+    """
+    suffix = f"_{view}" if view else ""
+    messages = {}
+    names = {}
+    topics = {}
+    signal_topics = {}
+    signal_units = {}
+    current = None
+
+    for raw in text.splitlines():
+        line = raw.strip()
+
+        if line.startswith("BO_ "):
+            m = _BO.match(line)
+            if not m:
+                raise ValueError(f"Linha BO_ inválida: {line}")
+            current = int(m.group(1)) & _CAN_ID_MASK
+            names[current] = m.group(2)
+            messages[current] = []
+
+        elif line.startswith("SG_ ") and current is not None:
+            messages[current].append(_dbc_signal(names[current], current, line))
+
+        elif line.startswith("BA_ "):
+            m = _BA.match(line)
+            if not m:
+                continue
+            attribute, msg_id, sig_id, sig_name, value = m.groups()
+            if msg_id is not None and attribute == f"Topic{suffix}":
+                topics[int(msg_id) & _CAN_ID_MASK] = value
+            elif sig_id is not None and attribute == f"Topic{suffix}":
+                signal_topics[int(sig_id) & _CAN_ID_MASK, sig_name] = value
+            elif sig_id is not None and attribute == f"Unit{suffix}":
+                signal_units[int(sig_id) & _CAN_ID_MASK, sig_name] = value
+
+        elif not line:
+            current = None
+
+    table = {}
+    for can_id, signals in messages.items():
+        prefix = topics.get(can_id, None if view else f"/{names[can_id]}")
+
+        named = []
+        for s in signals:
+            key = (can_id, s.name)
+            if key in signal_topics:
+                name = signal_topics[key]
+            elif prefix is not None:
+                name = f"{prefix.rstrip('/')}/{s.name}"
+            else:
+                continue
+            named.append(s._replace(name=name, unit=signal_units.get(key, s.unit)))
+
+        if named:
+            table[can_id] = named
+
+    return table
+
+
+@lru_cache(maxsize=None)
+def load_dbc(path, view=None):
+    """Lê e interpreta o DBC uma única vez por caminho e visão."""
+    with open(path, "rb") as f:
+        raw = f.read()
+
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        # DBCs gerados pelo CANdb++ costumam vir em cp1252
+        text = raw.decode("cp1252")
+
+    return parse_dbc(text, view)
+
+
+@lru_cache(maxsize=None)
+def load_compiled(path, view=None):
+    """Tabela do DBC já compilada ({can_id: CompiledMessage}), em cache."""
+    return compile_table(load_dbc(path, view))
@@ -0,0 +1,390 @@
+"""
+Protocolo do stream de telemetria do gateway (porta 7000).
+
+Módulo sem dependências externas, usado pelo gateway (encoder) e pelos
+consumidores (leitor). O original fica em shared/stream_protocol.py;
+altere lá e rode python shared/sync.py para atualizar as cópias.
+
+Sem negociação o servidor envia NDJSON, como sempre. Logo após conectar
+o cliente pode enviar uma linha de hello:
+
+    TUPA-STREAM 1 <binary|ndjson>[ <subscription JSON>]\n
+
+e recebe "TUPA-STREAM 1 <formato> ok\n" antes do primeiro frame. A
+subscription ({"topics": ["/IMU/*", "/GPS/speed"], "max_rate_hz": 50})
+restringe os sinais por padrão de nome (fnmatch) e limita a taxa de cada
+sinal; clientes NDJSON com subscription recebem payloads no formato
+{"source", "timestamp_ns", "signals": [{"name", "value", "unit"}]}.
+
+Cada frame binário é:
+
+    u16 tamanho do corpo | u8 tipo | corpo            (little endian)
+
+    FRAME_DICTIONARY: entradas u16 id | u8 len + source | u8 len + nome
+                      | u8 len + unidade (UTF-8)
+    FRAME_SAMPLES:    i64 timestamp_ns | u16 n | n x (u16 id | f64 valor)
+
+O dicionário completo é o primeiro frame de cada conexão; sinais novos
+(ex.: um campo de GNSS que aparece depois) geram um frame de dicionário
+antes do primeiro frame de amostras que os usa. Todos os sinais de um
+frame de amostras vêm do mesmo payload, portanto do mesmo source.
+"""
+import fnmatch
+import json
+import logging
+import math
+import struct
+from functools import lru_cache
+
+
+HELLO_PREFIX = b"TUPA-STREAM 1 "
+HELLO = b"TUPA-STREAM 1 binary\n"
+HELLO_OK = b"TUPA-STREAM 1 binary ok\n"
+NDJSON_OK = b"TUPA-STREAM 1 ndjson ok\n"
+MAX_HELLO = 4096
+
+FRAME_DICTIONARY = 1
+FRAME_SAMPLES = 2
+
+FRAME_HEADER = struct.Struct("<HB")
+SAMPLES_HEADER = struct.Struct("<qH")
+SAMPLE = struct.Struct("<Hd")
+DICTIONARY_ID = struct.Struct("<H")
+
+MAX_BODY = 0xFFFF
+
+logger = logging.getLogger("StreamProtocol")
+
+
+# =========================================================
+# PAYLOAD -> SINAIS
+# =========================================================
+
+def source_from_name(name):
+    """'/IMU/yaw' -> 'imu'; mensagens {"n","v"} não trazem o campo source."""
+    if not name:
+        return "unknown"
+    return name.strip("/").split("/", 1)[0].lower() or "unknown"
+
+
+def payload_signals(payload):
+    """
+    Retorna (source, [(nome, valor, unidade), ...]) com os sinais numéricos
+    de qualquer payload do gateway: {"n","v"}, CAN ("signals") ou registro
+    agrupado (um dict plano por amostra, ex. IMU/GNSS).
+    """
+    if "n" in payload:
+        source = payload.get("source") or source_from_name(payload["n"])
+        value = payload.get("v")
+        if isinstance(value, (int, float)):
+            return source, [(payload["n"], value, "")]
+        return source, []
+
+    source = payload.get("source") or "unknown"
+
+    signals = payload.get("signals")
+    if isinstance(signals, list):
+        return source, [
+            (s["name"], s["value"], s.get("unit", ""))
+            for s in signals
+            if isinstance(s.get("value"), (int, float))
+        ]
+
+    prefix = f"/{source.upper()}"
+    return source, [
+        (f"{prefix}/{key}", value, "")
+        for key, value in payload.items()
+        if key not in ("source", "timestamp_ns")
+        and isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+
+# =========================================================
+# SUBSCRIPTION
+# =========================================================
+
+class Subscription:
+    """
+    Sinais que um cliente quer: padrões de nome (fnmatch) e taxa máxima
+    por sinal em Hz (None = sem limite). O estado de taxa é por cliente.
+    """
+
+    def __init__(self, topics=None, max_rate_hz=None):
+        self.topics = list(topics) if topics else ["*"]
+        self.max_rate_hz = max_rate_hz or None
+        self.min_interval_ns = int(1e9 / max_rate_hz) if max_rate_hz else 0
+
+        self._matches = {}
+        self._last_sent = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Subscription do JSON do hello; ValueError se os tipos não batem."""
+        if not isinstance(data, dict):
+            raise ValueError("subscription deve ser um objeto JSON")
+
+        topics = data.get("topics")
+        if topics is not None and not (
+            isinstance(topics, list) and all(isinstance(t, str) for t in topics)
+        ):
+            raise ValueError("topics deve ser uma lista de strings")
+
+        max_rate_hz = data.get("max_rate_hz")
+        if max_rate_hz is not None:
+            if isinstance(max_rate_hz, bool) or not isinstance(max_rate_hz, (int, float)):
+                raise ValueError("max_rate_hz deve ser um número")
+            if not math.isfinite(max_rate_hz) or max_rate_hz < 0:
+                raise ValueError("max_rate_hz deve ser positivo")
+        return cls(topics, max_rate_hz)
+
+    def to_dict(self):
+        return {"topics": self.topics, "max_rate_hz": self.max_rate_hz}
+
+    def matches(self, name):
+        match = self._matches.get(name)
+        if match is None:
+            match = any(fnmatch.fnmatchcase(name, t) for t in self.topics)
+            self._matches[name] = match
+        return match
+
+    def select(self, signals, timestamp_ns):
+        """Filtra [(nome, valor, unidade)] por padrão e taxa máxima."""
+        matches = self.matches
+        selected = [s for s in signals if matches(s[0])]
+
+        if not self.min_interval_ns or not selected:
+            return selected
+
+        last_sent = self._last_sent
+        min_interval = self.min_interval_ns
+        allowed = []
+
+        for signal in selected:
+            last = last_sent.get(signal[0])
+            if last is None or timestamp_ns - last >= min_interval or timestamp_ns < last:
+                last_sent[signal[0]] = timestamp_ns
+                allowed.append(signal)
+
+        return allowed
+
+
+def hello_line(binary=True, subscription=None):
+    """Linha de hello do cliente."""
+    line = HELLO_PREFIX + (b"binary" if binary else b"ndjson")
+    if subscription is not None:
+        line += b" " + json.dumps(subscription.to_dict(), separators=(",", ":")).encode()
+    return line + b"\n"
+
+
+def parse_hello(line):
+    """Retorna (binary, Subscription ou None); ValueError se a linha for inválida."""
+    if not line.startswith(HELLO_PREFIX) or not line.endswith(b"\n"):
+        raise ValueError("hello inválido")
+
+    fmt, _, rest = line[len(HELLO_PREFIX):].strip().partition(b" ")
+    if fmt not in (b"binary", b"ndjson"):
+        raise ValueError(f"formato desconhecido: {fmt!r}")
+
+    subscription = Subscription.from_dict(json.loads(rest)) if rest.strip() else None
+    return fmt == b"binary", subscription
+
+
+def signals_payload(source, timestamp_ns, signals):
+    """Payload NDJSON de um cliente com subscription."""
+    return {
+        "source": source,
+        "timestamp_ns": timestamp_ns,
+        "signals": [{"name": n, "value": v, "unit": u} for n, v, u in signals],
+    }
+
+
+# =========================================================
+# ENCODER (gateway)
+# =========================================================
+
+@lru_cache(maxsize=None)
+def _samples_struct(count):
+    return struct.Struct("<qH" + "Hd" * count)
+
+
+def _frame(frame_type, body):
+    return FRAME_HEADER.pack(len(body), frame_type) + body
+
+
+def _short_text(text):
+    raw = text.encode("utf-8")[:255]
+    return bytes((len(raw),)) + raw
+
+
+class BinaryEncoder:
+    """
+    Converte payloads do gateway em frames binários, mantendo o dicionário
+    nome -> id. Não é thread-safe: quem publica deve serializar encode() e
+    o envio, para que o dicionário chegue antes das amostras.
+    """
+
+    def __init__(self, signals=()):
+        self.ids = {}
+        self.entries = []
+
+        # Sinais conhecidos no startup (ex.: todo o DBC) ganham ids estáveis
+        for source, name, unit in signals:
+            self._register(source, name, unit)
+
+    def _register(self, source, name, unit):
+        signal_id = len(self.entries)
+        if signal_id > 0xFFFF:
+            raise ValueError("Dicionário do stream binário cheio (65536 sinais)")
+
+        entry = (
+            DICTIONARY_ID.pack(signal_id)
+            + _short_text(source)
+            + _short_text(name)
+            + _short_text(unit)
+        )
+        self.ids[name] = signal_id
+        self.entries.append(entry)
+        return entry
+
+    def _dictionary_frames(self, entries):
+        frames = []
+        body = b""
+        for entry in entries:
+            if len(body) + len(entry) > MAX_BODY:
+                frames.append(_frame(FRAME_DICTIONARY, body))
+                body = b""
+            body += entry
+        if body:
+            frames.append(_frame(FRAME_DICTIONARY, body))
+        return b"".join(frames)
+
+    def dictionary_frame(self):
+        """Dicionário completo, enviado a cada cliente binário novo."""
+        return self._dictionary_frames(self.entries)
+
+    def register(self, source, signals):
+        """Frame(s) de dicionário com os sinais ainda sem id; None se todos já existem."""
+        ids = self.ids
+        new_entries = [
+            self._register(source, name, unit)
+            for name, _, unit in signals
+            if name not in ids
+        ]
+        return self._dictionary_frames(new_entries) if new_entries else None
+
+    def encode_signals(self, signals, timestamp_ns):
+        """Frame de amostras de [(nome, valor, unidade)] já registrados."""
+        ids = self.ids
+        values = [timestamp_ns, len(signals)]
+
+        for name, value, _ in signals:
+            values.append(ids[name])
+            values.append(value)
+
+        return _frame(FRAME_SAMPLES, _samples_struct(len(signals)).pack(*values))
+
+    def encode(self, payload, timestamp_ns):
+        """Frame(s) do payload, com o dicionário novo antes; None sem sinal numérico."""
+        source, signals = payload_signals(payload)
+        if not signals:
+            return None
+
+        dictionary = self.register(source, signals)
+        frame = self.encode_signals(signals, timestamp_ns)
+        return dictionary + frame if dictionary else frame
+
+# =========================================================
+# LEITOR (consumidores)
+# =========================================================
+
+def _read_text(body, pos):
+    size = body[pos]
+    end = pos + 1 + size
+    return body[pos + 1:end].decode("utf-8"), end
+
+
+class StreamReader:
+    """
+    Lê o stream do gateway e gera (source, timestamp_ns, sinais) por
+    mensagem, com sinais = [(nome, valor, unidade), ...], tanto em binário
+    quanto em NDJSON. Com binary=True negocia o formato binário e, se o
+    gateway não responder HELLO_OK (versão antiga), segue em NDJSON.
+    subscription (Subscription) pede ao gateway só os sinais usados.
+    """
+
+    def __init__(self, sock, binary=True, subscription=None):
+        self.sock = sock
+        self.file = sock.makefile("rb")
+        self.binary = binary
+        self.subscription = subscription
+        # id -> (source, nome, unidade)
+        self.dictionary = {}
+
+    def __iter__(self):
+        first = None
+
+        if self.binary or self.subscription is not None:
+            self.sock.sendall(hello_line(self.binary, self.subscription))
+            first = self.file.readline()
+            if first == HELLO_OK:
+                return self._iter_binary()
+            if first == NDJSON_OK:
+                first = None
+
+        return self._iter_ndjson(first)
+
+    def _iter_ndjson(self, first=None):
+        line = first
+
+        while True:
+            if line is None:
+                line = self.file.readline()
+            if not line:
+                raise ConnectionError("Acquisition connection closed")
+
+            if line.strip():
+                try:
+                    payload = json.loads(line)
+                except ValueError as e:
+                    logger.error(f"Invalid JSON line in acquisition stream: {e}")
+                else:
+                    source, signals = payload_signals(payload)
+                    yield source, payload.get("timestamp_ns"), signals
+
+            line = None
+
+    def _read_exact(self, size):
+        data = self.file.read(size)
+        if len(data) < size:
+            raise ConnectionError("Acquisition connection closed")
+        return data
+
+    def _iter_binary(self):
+        dictionary = self.dictionary
+        header_size = FRAME_HEADER.size
+
+        while True:
+            size, frame_type = FRAME_HEADER.unpack(self._read_exact(header_size))
+            body = self._read_exact(size)
+
+            if frame_type == FRAME_DICTIONARY:
+                pos = 0
+                while pos < size:
+                    (signal_id,) = DICTIONARY_ID.unpack_from(body, pos)
+                    source, pos = _read_text(body, pos + DICTIONARY_ID.size)
+                    name, pos = _read_text(body, pos)
+                    unit, pos = _read_text(body, pos)
+                    dictionary[signal_id] = (source, name, unit)
+
+            elif frame_type == FRAME_SAMPLES:
+                timestamp_ns, count = SAMPLES_HEADER.unpack_from(body)
+                source = None
+                signals = []
+
+                for signal_id, value in SAMPLE.iter_unpack(body[SAMPLES_HEADER.size:]):
+                    source, name, unit = dictionary[signal_id]
+                    signals.append((name, value, unit))
+
+                yield source, timestamp_ns, signals
+
+            # Tipos desconhecidos são ignorados (compatibilidade futura)
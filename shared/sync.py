@@ -0,0 +1,81 @@
+"""
+Arquivos compartilhados entre os containers/projetos.
+
+Cada projeto gera a sua imagem a partir do próprio diretório (docker build .
+ou o build: do docker-compose), então quem usa um arquivo daqui tem uma
+cópia real dele, sem links nem contextos de build extras. Os originais
+ficam nesta pasta: altere aqui e rode
+
+    python shared/sync.py            # atualiza as cópias
+    python shared/sync.py --check    # só confere (como test_shared_copies.py)
+"""
+import argparse
+import shutil
+import sys
+from pathlib import Path
+
+
+SHARED = Path(__file__).resolve().parent
+REPO = SHARED.parent
+
+# arquivo desta pasta -> diretórios que têm uma cópia dele
+COPIES = {
+    "can_dbc.py": [
+        "toradexhome/Acquisition",
+        "Toradex09/T09V2/src",
+        "Toradex09/TXV0.2/src",
+        "Toradexvcan/TXV0.1/src",
+    ],
+    "t09.dbc": [
+        "Toradex09/T09V2/src",
+        "Toradex09/TXV0.2/src",
+        "Toradexvcan/TXV0.1/src",
+    ],
+    "stream_protocol.py": [
+        "toradexhome/Acquisition",
+        "toradexhome/Control",
+        "toradexhome/telemetry",
+    ],
+    "shm_ring.py": [
+        "toradexhome/Acquisition",
+        "toradexhome/Control",
+        "toradexhome/telemetry",
+    ],
+}
+
+
+def copies():
+    """(original, cópia) de cada arquivo compartilhado."""
+    for name, targets in COPIES.items():
+        for target in targets:
+            yield SHARED / name, REPO / target / name
+
+
+def stale_copies():
+    """Cópias ausentes ou diferentes do original."""
+    return [
+        copy for original, copy in copies()
+        if not copy.is_file() or copy.read_bytes() != original.read_bytes()
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="só confere, sem copiar")
+    args = parser.parse_args()
+
+    stale = stale_copies()
+
+    if args.check:
+        for copy in stale:
+            print(f"desatualizada: {copy.relative_to(REPO)}")
+        sys.exit(1 if stale else 0)
+
+    for original, copy in copies():
+        if copy in stale:
+            shutil.copyfile(original, copy)
+            print(f"{original.relative_to(REPO)} -> {copy.relative_to(REPO)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+As cópias dos arquivos compartilhados nos projetos precisam ser iguais aos
+originais desta pasta (corrija com python shared/sync.py).
+
+Uso:
+    python -m pytest shared
+"""
+import pytest
+
+from sync import REPO, copies
+
+
+@pytest.mark.parametrize(
+    "original, copy", list(copies()),
+    ids=[str(copy.relative_to(REPO)) for _, copy in copies()]
+)
+def test_copy_matches_shared_original(original, copy):
+    assert copy.is_file(), f"{copy} não existe: rode python shared/sync.py"
+    assert copy.read_bytes() == original.read_bytes(), (
+        f"{copy.relative_to(REPO)} difere de {original.relative_to(REPO)}: "
+        f"altere o original e rode python shared/sync.py"
+    )
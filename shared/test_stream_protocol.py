@@ -0,0 +1,56 @@
+"""
+Hello do stream da porta 7000: linhas malformadas precisam dar ValueError
+(o negotiate_rx_client do gateway só trata ValueError e cai para NDJSON).
+
+Uso:
+    python -m pytest shared/test_stream_protocol.py
+"""
+import pytest
+
+from stream_protocol import HELLO_PREFIX, Subscription, hello_line, parse_hello
+
+
+MALFORMED_HELLOS = [
+    b"GET / HTTP/1.1\r\n",
+    HELLO_PREFIX + b"binary",                                   # sem \n
+    HELLO_PREFIX + b"xml\n",
+    HELLO_PREFIX + b"binary {not json\n",
+    HELLO_PREFIX + b"binary \xff\xfe\n",                        # UTF-8 inválido
+    HELLO_PREFIX + b"binary []\n",                              # não é objeto
+    HELLO_PREFIX + b"binary 42\n",
+    HELLO_PREFIX + b'binary "topics"\n',
+    HELLO_PREFIX + b"binary null\n",
+    HELLO_PREFIX + b'binary {"topics": "/IMU/*"}\n',
+    HELLO_PREFIX + b'binary {"topics": ["/IMU/*", 3]}\n',
+    HELLO_PREFIX + b'binary {"max_rate_hz": "50"}\n',
+    HELLO_PREFIX + b'binary {"max_rate_hz": [50]}\n',
+    HELLO_PREFIX + b'binary {"max_rate_hz": true}\n',
+    HELLO_PREFIX + b'binary {"max_rate_hz": -1}\n',
+    HELLO_PREFIX + b'binary {"max_rate_hz": NaN}\n',
+    HELLO_PREFIX + b'binary {"max_rate_hz": Infinity}\n',
+]
+
+
+@pytest.mark.parametrize("line", MALFORMED_HELLOS)
+def test_malformed_hello_raises_value_error(line):
+    with pytest.raises(ValueError):
+        parse_hello(line)
+
+
+def test_hello_round_trip():
+    subscription = Subscription(["/IMU/*", "/GPS/speed"], 50)
+    binary, parsed = parse_hello(hello_line(True, subscription))
+
+    assert binary is True
+    assert parsed.to_dict() == subscription.to_dict()
+
+
+def test_hello_without_subscription():
+    assert parse_hello(HELLO_PREFIX + b"ndjson\n") == (False, None)
+
+
+def test_null_fields_mean_defaults():
+    _, subscription = parse_hello(HELLO_PREFIX + b'binary {"topics": null, "max_rate_hz": null}\n')
+
+    assert subscription.topics == ["*"]
+    assert subscription.max_rate_hz is None
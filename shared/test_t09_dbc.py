@@ -0,0 +1,275 @@
+"""
+Decodificação do T09 pelo t09.dbc contra os handlers escritos à mão que ela
+substituiu (Toradex09/TXV0.2, Toradexvcan/TXV0.1 e Toradex09/T09V2): mesmos
+nomes, valores, unidades e colunas de CSV, frame a frame.
+
+Os decoders dos projetos são carregados dos próprios diretórios, com as
+cópias de can_dbc.py e t09.dbc que vão para as imagens.
+
+Uso:
+    python -m pytest shared/test_t09_dbc.py
+"""
+import importlib.util
+import random
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+from can_dbc import load_compiled
+
+
+REPO = Path(__file__).resolve().parents[1]
+T09_DBC = Path(__file__).with_name("t09.dbc")
+T09_IDS = [0x080, 0x03B, 0x090, 0x091, 0x3CB, 0x6B2, 0x584, 0x585, 0x586, 0x587]
+
+
+class _Frame:
+    def __init__(self, arbitration_id, data):
+        self.arbitration_id = arbitration_id
+        self.data = data
+
+
+class _Sink:
+    """FoxgloveSender falso: guarda (tópico, valor, unidade)."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, topic, payload):
+        self.sent.append((topic, payload["value"], payload["unit"]))
+
+
+def _load(relative, name):
+    """Importa um módulo de outro projeto com a pasta src dele no sys.path."""
+    path = REPO / relative
+    sys.path.insert(0, str(path.parent))
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(path.parent))
+    return module
+
+
+def _frames(count=3000, seed=0):
+    rng = random.Random(seed)
+    return [
+        _Frame(rng.choice(T09_IDS), bytes(rng.getrandbits(8) for _ in range(8)))
+        for _ in range(count)
+    ]
+
+
+def _u16(data, start):
+    return struct.unpack(">H", data[start:start + 2])[0]
+
+
+def _i16(data, start):
+    return struct.unpack(">h", data[start:start + 2])[0]
+
+
+# ============================================
+# Handlers antigos, mantidos só para comparação
+# ============================================
+
+def legacy_txv02(msg):
+    """Toradex09/TXV0.2 CANDecoder._decode_0x...: [(tópico, valor, unidade)]."""
+    data = msg.data
+    can_id = msg.arbitration_id
+
+    if can_id == 0x03B:
+        return [
+            ("/BMS1/pack_current", _i16(data, 0) * 0.1, "A"),
+            ("/BMS1/pack_voltage", _i16(data, 2) * 0.1, "V"),
+            ("/BMS1/checksum", data[4], ""),
+        ]
+    if can_id == 0x3CB:
+        return [
+            ("/BMS2/PackDCL", data[0] * 0.1, "kW"),
+            ("/BMS2/PackCCL", data[1], "A"),
+            ("/BMS2/simulatedSOC", data[3], ""),
+            ("/BMS2/HighTempCell", data[4], "C"),
+            ("/BMS2/LowTempCell", data[5], "C"),
+            ("/BMS2/Checksum2", data[6], ""),
+        ]
+    if can_id == 0x90:
+        return [
+            ("/0x90/APPS1raw", _u16(data, 0), ""),
+            ("/0x90/APPS2raw", _u16(data, 2), ""),
+            ("/0x90/erros", data[4], ""),
+            ("/0x90/contador", data[5], ""),
+        ]
+    if can_id == 0x91:
+        return [
+            ("/0x91/BSE1raw", _u16(data, 0), ""),
+            ("/0x91/BSE2raw", _u16(data, 2), ""),
+            ("/0x91/VOL", _u16(data, 4), ""),
+            ("/0x91/contador", data[6], ""),
+        ]
+    if can_id == 0x6B2:
+        return [
+            ("/BMS3/RelayState", data[0], ""),
+            ("/BMS3/PackSOC", data[1], ""),
+            ("/BMS3/Resistence", _u16(data, 2), "ohms?"),
+            ("/BMS3/PackOpenVoltage", _u16(data, 4), "V"),
+            ("/BMS3/PackAmphours", data[6], "A*h"),
+            ("/BMS3/Checksum3", data[7], ""),
+        ]
+
+    rpm = {
+        0x587: "/0x587/RMP Roda L",
+        0x586: "/0x586/RMP Roda R",
+        0x585: "/0x585/RMP Motor R",
+        0x584: "/0x584/RMP Motor L",
+    }
+    if can_id in rpm:
+        # O handler antigo do 0x584 publicava o contador em /0x587/contador
+        # (cópia do 0x587); o DBC publica cada contador no seu ID
+        return [
+            (rpm[can_id], _u16(data, 0), "RPM"),
+            (f"/{can_id:#x}/contador", data[3], ""),
+        ]
+    return []
+
+
+def legacy_vcan(msg):
+    """Toradexvcan/TXV0.1 CANDecoder._decode_0x...: [(tópico, valor, unidade)]."""
+    data = msg.data
+    can_id = msg.arbitration_id
+
+    if can_id == 0x90:
+        return [("/0x90/APPS1raw", _u16(data, 0), ""), ("/0x90/APPS2raw", _u16(data, 2), "")]
+    if can_id == 0x91:
+        return [
+            ("/0x91/BSE1raw", _u16(data, 0), ""),
+            ("/0x91/BSE2raw", _u16(data, 2), ""),
+            ("/0x91/VOL", _u16(data, 4), ""),
+        ]
+    if can_id == 0x03B:
+        return [
+            ("/BMS1/pack_current", _i16(data, 0) * 0.1, "A"),
+            ("/BMS1/pack_voltage", _i16(data, 2) * 0.1, "V"),
+        ]
+    if can_id == 0x3CB:
+        return [
+            ("/BMS2/PackDCL", data[0] * 0.1, "kW"),
+            ("/BMS2/PackCCL", data[1], "A"),
+            ("/BMS2/simulatedSOC", data[3], ""),
+        ]
+    if can_id == 0x6B2:
+        return [("/BMS3/PackSOC", data[1], "%"), ("/BMS3/PackOpenVoltage", _u16(data, 4), "V")]
+
+    rpm = {0x587: "/Wheel/RPM_L", 0x586: "/Wheel/RPM_R", 0x585: "/Motor/RPM_R", 0x584: "/Motor/RPM_L"}
+    if can_id in rpm:
+        return [(rpm[can_id], _u16(data, 0), "RPM")]
+    return []
+
+
+# Toradex09/T09V2 process_id_...: chaves (can_receiver) e colunas (data_logger)
+LEGACY_T09V2_KEYS = {
+    0x0080: ['APPS Real', 'BSE Real', 'Volante', 'Erros', 'Contador'],
+    0x0090: ['apps1Raw', 'apps2Raw', 'Erros', 'Contador'],
+    0x0091: ['bse1Raw', 'bse2Raw', 'volRaw', 'Contador'],
+    0x003B: ['CorrentePack', 'IN_USE_1', 'TensaoInstantanea', 'IN_USE_2', 'CRC_Checksum'],
+    0x03CB: ['PackDCL', 'PackCCL', 'Blank', 'SimulatedSOC', 'HighTemp', 'LowTemp', 'CRC_Checksum'],
+    0x06B2: ['RelayState', 'PackSOC', 'PackResistance', 'IN_USE_1',
+             'PackOpenVoltage', 'IN_USE_2', 'PackAmphours', 'CRC_Checksum'],
+}
+
+
+def legacy_t09v2(msg):
+    """Valores na ordem de LEGACY_T09V2_KEYS, ou None."""
+    data = msg.data
+    can_id = msg.arbitration_id
+
+    if can_id == 0x0080:
+        return [_u16(data, 0), _u16(data, 2), _u16(data, 4), data[6], data[7]]
+    if can_id == 0x0090:
+        return [_u16(data, 0), _u16(data, 2), data[4], data[5]]
+    if can_id == 0x0091:
+        return [_u16(data, 0), _u16(data, 2), _u16(data, 4), data[6]]
+    if can_id in (0x003B, 0x03CB, 0x06B2):
+        return list(data[:len(LEGACY_T09V2_KEYS[can_id])])
+    return None
+
+
+# ============================================
+# Equivalência
+# ============================================
+
+def test_txv02_matches_legacy_handlers():
+    module = _load("Toradex09/TXV0.2/src/can_decoder.py", "txv02_can_decoder")
+    sink = _Sink()
+    decoder = module.CANDecoder(sink)
+
+    for msg in _frames():
+        sink.sent.clear()
+        decoder.handle_message(msg)
+        assert sink.sent == legacy_txv02(msg), hex(msg.arbitration_id)
+
+
+def test_vcan_matches_legacy_handlers():
+    module = _load("Toradexvcan/TXV0.1/src/can_decoder.py", "vcan_can_decoder")
+    sink = _Sink()
+    averaged = []
+    decoder = module.CANDecoder(sink, signal_callback=averaged.append)
+
+    for msg in _frames():
+        sink.sent.clear()
+        averaged.clear()
+        decoder.handle_message(msg)
+        assert sink.sent == legacy_vcan(msg), hex(msg.arbitration_id)
+        assert [(s["name"], s["value"], s["unit"]) for s in averaged] == sink.sent
+
+
+def test_t09v2_receiver_matches_legacy_handlers():
+    pytest.importorskip("can")
+    module = _load("Toradex09/T09V2/src/can_receiver.py", "t09v2_can_receiver")
+
+    assert sorted(module.PROCESS_FUNCTIONS) == sorted(LEGACY_T09V2_KEYS)
+    for msg in _frames():
+        result = module.PROCESS_FUNCTIONS.get(msg.arbitration_id)
+        values = legacy_t09v2(msg)
+        if values is None:
+            assert result is None
+            continue
+        expected = dict(zip(LEGACY_T09V2_KEYS[msg.arbitration_id], values))
+        assert list(result(msg).items()) == list(expected.items())
+
+
+def test_t09v2_csv_matches_legacy_handlers():
+    module = _load("Toradex09/T09V2/src/data_logger.py", "t09v2_data_logger")
+
+    assert sorted(module.PROCESS_FUNCTIONS) == sorted(LEGACY_T09V2_KEYS)
+    for can_id, info in module.PROCESS_FUNCTIONS.items():
+        assert info['header'] == ['Timestamp'] + LEGACY_T09V2_KEYS[can_id]
+
+    for msg in _frames():
+        info = module.PROCESS_FUNCTIONS.get(msg.arbitration_id)
+        if info is None:
+            continue
+        assert info['function']("ts", msg.data) == ["ts"] + legacy_t09v2(msg)
+
+
+def test_t09v2_short_frames_are_skipped():
+    module = _load("Toradex09/T09V2/src/data_logger.py", "t09v2_data_logger")
+
+    # Mesmos limites de len(data) dos process_id_... antigos
+    minimum = {0x0080: 8, 0x0090: 6, 0x0091: 7, 0x003B: 5, 0x03CB: 7, 0x06B2: 8}
+    for can_id, size in minimum.items():
+        function = module.PROCESS_FUNCTIONS[can_id]['function']
+        assert function("ts", bytes(size - 1)) is None
+        assert function("ts", bytes(size)) is not None
+
+
+def test_full_view_decodes_overlapping_signals():
+    message = load_compiled(str(T09_DBC))[0x03B]
+    values = dict(zip(message.names, message.values(bytes([0xFF, 0x38, 0x01, 0x02, 0x7F, 0, 0, 0]))))
+
+    assert values["/BMS1/pack_current"] == pytest.approx(-20.0)
+    assert values["/BMS1/pack_current_MSB"] == 0xFF
+    assert values["/BMS1/pack_current_LSB"] == 0x38
+    assert values["/BMS1/pack_voltage"] == pytest.approx(25.8)
+    assert values["/BMS1/checksum"] == 0x7F
@@ -0,0 +1,247 @@
+"""
+Micro-benchmark da recepção CAN em lotes (CAN_BATCH=1) contra o caminho
+frame a frame, da leitura do socket até os sinks:
+
+    frame a frame  bus.recv() do python-can (select + recvmsg + can.Message),
+                   CANDecoderCore.decode() e um broadcast_can() por frame
+    lote           FrameBatchReader (um recvmmsg por lote), BatchDecoder e
+                   um broadcast_can() por lote (log_deferred, publish_many,
+                   NDJSON concatenado)
+
+Sem --interface os frames (struct can_frame de 16 bytes) vão por um par de
+sockets UDP no loopback, que também entrega SO_TIMESTAMPNS; com
+--interface vcan0 usa um socket CAN_RAW de verdade. Também confere que os
+dois caminhos produzem os mesmos payloads, na mesma ordem.
+
+Uso:
+    python bench_can_batch.py --frames 200000 --batch 1 16 64 256 --sinks mcap shm
+"""
+import argparse
+import json
+import os
+import random
+import select
+import socket
+import struct
+import tempfile
+import time
+
+import can
+from can.interfaces.socketcan.socketcan import capture_message
+
+from can_batch import SO_TIMESTAMPNS, BatchDecoder, FrameBatchReader
+from can_decoder import CANDecoderCore
+from mcap_logger import McapTelemetryLogger
+from shm_ring import ShmRingWriter
+from timebase import FrameClock
+
+
+class _SocketBus(can.BusABC):
+    """Bus do python-can sobre um socket já aberto (mesmo _recv_internal do SocketcanBus)."""
+
+    def __init__(self, sock):
+        self.socket = sock
+        super().__init__(channel=None)
+
+    def _recv_internal(self, timeout):
+        ready, _, _ = select.select([self.socket], [], [], timeout)
+        if ready:
+            return capture_message(self.socket), False
+        return None, False
+
+    def send(self, msg, timeout=None):
+        raise NotImplementedError
+
+
+# ============================================
+# Sockets
+# ============================================
+
+def open_sockets(interface):
+    """(tx, rx) entregando struct can_frame; rx com SO_TIMESTAMPNS."""
+    if interface:
+        tx = socket.socket(socket.AF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+        rx = socket.socket(socket.AF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+        tx.bind((interface,))
+        rx.bind((interface,))
+    else:
+        tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rx.bind(("127.0.0.1", 0))
+        tx.connect(rx.getsockname())
+
+    rx.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 << 20)
+    rx.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    return tx, rx
+
+
+def make_frames(ids, count, seed=0):
+    rng = random.Random(seed)
+    return [
+        struct.pack("=IB3x8s", rng.choice(ids), 8, bytes(rng.getrandbits(8) for _ in range(8)))
+        for _ in range(count)
+    ]
+
+
+# ============================================
+# Caminhos
+# ============================================
+
+class Sinks:
+    """Os sinks do broadcast_can() que o bench liga: MCAP assíncrono, shm ring e NDJSON."""
+
+    def __init__(self, names, tmp):
+        self.mcap = McapTelemetryLogger(output_dir=tmp, async_mode=True) if "mcap" in names else None
+        self.shm = ShmRingWriter(os.path.join(tmp, "ring")) if "shm" in names else None
+        self.ndjson = "ndjson" in names
+        self.out = []
+
+    def publish(self, frames):
+        """main.broadcast_can() com os frames decodificados."""
+        if self.mcap:
+            self.mcap.log_deferred([(f.timestamp_ns, "can", f.payload) for f in frames])
+        if self.shm:
+            self.shm.publish_many([("can", f.signals(), f.timestamp_ns) for f in frames])
+        if self.ndjson:
+            self.out.append("".join(json.dumps(f.payload(), separators=(",", ":")) + "\n" for f in frames).encode())
+
+    def close(self):
+        if self.mcap:
+            self.mcap.close()
+        if self.shm:
+            self.shm.close()
+
+
+class PerFramePath:
+    """main.handle_can: bus.recv() e um broadcast_can() por frame."""
+
+    def __init__(self, rx, decoder, sinks, clock):
+        self.bus = _SocketBus(rx)
+        self.decoder = decoder
+        self.sinks = sinks
+        self.clock = clock
+
+    def run(self, count):
+        bus = self.bus
+        decoder = self.decoder
+        for _ in range(count):
+            msg = bus.recv(timeout=1.0)
+
+            frame = decoder.decode(msg, self.clock.to_wall_ns(msg.timestamp))
+            if frame is None:
+                continue
+
+            self.sinks.publish((frame,))
+
+    def close(self):
+        self.bus.shutdown()
+
+
+class BatchPath:
+    """main.handle_can_batch: um recvmmsg() e um broadcast_can() por lote."""
+
+    def __init__(self, rx, decoder, sinks, clock, max_batch):
+        self.reader = FrameBatchReader(rx, max_batch=max_batch)
+        self.decoder = BatchDecoder(decoder.messages)
+        self.sinks = sinks
+        self.clock = clock
+
+    def run(self, count):
+        while count > 0:
+            frames, timestamps_ns = self.reader.read()
+            count -= len(frames)
+
+            offset_ns = self.clock.offset_ns(int(timestamps_ns[0]))
+            decoded, _ = self.decoder.decode(frames, timestamps_ns, offset_ns)
+            self.sinks.publish(decoded)
+
+    def close(self):
+        pass
+
+
+def run(path, tx, frames, batch):
+    """Envia `batch` frames (fora da medição) e mede o caminho consumindo-os."""
+    elapsed = 0.0
+    for i in range(0, len(frames), batch):
+        chunk = frames[i:i + batch]
+        for frame in chunk:
+            tx.send(frame)
+
+        start = time.perf_counter()
+        path.run(len(chunk))
+        elapsed += time.perf_counter() - start
+
+    path.close()
+    return elapsed
+
+
+def check_equivalence(tx, rx, decoder, tmp, frames):
+    """
+    Mesmos payloads (sinais, IDs e ordem). Cada caminho lê a sua própria
+    transmissão, então do timestamp só se confere que é de wallclock.
+    """
+    clock = FrameClock("realtime")
+    single = Sinks(["ndjson"], tmp)
+    run(PerFramePath(rx, decoder, single, clock), tx, frames, 64)
+    batched = Sinks(["ndjson"], tmp)
+    run(BatchPath(rx, decoder, batched, clock, 64), tx, frames, 64)
+
+    old = [json.loads(line) for line in b"".join(single.out).splitlines()]
+    new = [json.loads(line) for line in b"".join(batched.out).splitlines()]
+
+    if len(old) != len(new):
+        raise SystemExit(f"Divergência: {len(old)} payloads frame a frame, {len(new)} em lote")
+
+    now_ns = time.time_ns()
+    for a, b in zip(old, new):
+        stamps = (a.pop("timestamp_ns"), b.pop("timestamp_ns"))
+        if any(abs(now_ns - t) > 60 * 1_000_000_000 for t in stamps) or a != b:
+            raise SystemExit(f"Divergência no ID {a['can_id']}: {a} != {b}")
+
+    return len(old)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 4, 16, 64, 256])
+    parser.add_argument("--sinks", nargs="*", default=["mcap"], choices=["mcap", "shm", "ndjson"],
+                        help="padrão: mcap (gateway sem SHM_RING e sem clientes)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--interface", default=None, help="ex. vcan0 (padrão: UDP no loopback)")
+    args = parser.parse_args()
+
+    decoder = CANDecoderCore()
+    ids = sorted(decoder.messages)
+    frames = make_frames(ids, args.frames)
+    tx, rx = open_sockets(args.interface)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checked = check_equivalence(tx, rx, decoder, tmp, frames[:2000])
+        print(f"{len(frames)} frames, {len(ids)} IDs, sinks: {' '.join(args.sinks) or '-'} "
+              f"({checked} payloads idênticos nos dois caminhos)")
+
+        clock = FrameClock("realtime")
+        print(f"{'batch':>6}{'frame a frame':>18}{'lote':>12}{'speedup':>10}")
+
+        for batch in args.batch:
+            results = []
+            for make_path in (
+                lambda sinks: PerFramePath(rx, decoder, sinks, clock),
+                lambda sinks: BatchPath(rx, decoder, sinks, clock, batch),
+            ):
+                best = float("inf")
+                for _ in range(args.repeat):
+                    sinks = Sinks(args.sinks, tmp)
+                    best = min(best, run(make_path(sinks), tx, frames, batch))
+                    sinks.close()
+                results.append(best)
+
+            single, batched = results
+            per_frame = 1e6 * single / len(frames)
+            per_batch = 1e6 * batched / len(frames)
+            print(f"{batch:>6}{per_frame:>12.2f} us/fr{per_batch:>8.2f} us/fr{single / batched:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
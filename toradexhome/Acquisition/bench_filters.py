@@ -0,0 +1,186 @@
+"""
+Micro-benchmark dos passa-baixas do IMU, com os canais do bno055.py
+(12 com quaternion: ângulos, gyro, aceleração linear e gravidade):
+
+    dict LowPassFilter   o filtro antigo, apply()/apply_angle() por canal
+    NumPy por amostra    FilterBank com estado em arrays NumPy (versão
+                         anterior, mantida aqui só para comparação)
+    apply()              FilterBank atual, float do Python por amostra
+    filter_batch()       reprocessamento em lote contra um laço de apply()
+
+Também confere que todos produzem os mesmos valores.
+
+Uso:
+    python bench_filters.py --samples 20000 --order 1 2 4
+"""
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from bno055 import ANGLE_WRAP, FILTER_CHANNELS, GRAVITY_CHANNELS
+from filters import FilterBank
+
+
+class LegacyLowPassFilter:
+    """Filtro RC antigo (estado em dict por canal), mantido só para comparação."""
+
+    def __init__(self, cutoff_hz=5.0, sample_rate=200.0):
+        dt = 1.0 / sample_rate
+        rc = 1.0 / (2 * 3.1415926535 * cutoff_hz)
+        self.alpha = dt / (rc + dt)
+        self.state = {}
+
+    def apply(self, name, value):
+        if name not in self.state:
+            self.state[name] = value
+
+        filtered = self.state[name] + self.alpha * (value - self.state[name])
+        self.state[name] = filtered
+
+        return filtered
+
+    def apply_angle(self, name, value, low=-180.0, period=360.0):
+        if name not in self.state:
+            self.state[name] = value
+
+        previous = self.state[name]
+        delta = (value - previous + period / 2) % period - period / 2
+
+        filtered = (previous + self.alpha * delta - low) % period + low
+        self.state[name] = filtered
+
+        return filtered
+
+
+class NumpyFilterBank:
+    """FilterBank anterior (seções x canais em arrays NumPy), só para comparação."""
+
+    def __init__(self, bank):
+        sections = np.array(bank.sections).transpose(2, 1, 0)
+        self.b0, self.b1, self.b2, self.a1, self.a2 = sections
+        self.order = bank.order
+        self.wrap_index = np.array([i for i, _, _ in bank.wrap], dtype=int)
+        self.wrap_low = np.array([low for _, low, _ in bank.wrap])
+        self.wrap_period = np.array([period for _, _, period in bank.wrap])
+        self.z1 = self.z2 = None
+
+    def apply(self, sample):
+        x = np.asarray(sample, dtype=np.float64)
+        idx, period = self.wrap_index, self.wrap_period
+
+        if self.z1 is None:
+            self.last_input = x[idx].copy()
+            self.unwrapped = x[idx].copy()
+            x[idx] = self.unwrapped
+            self.z2 = (self.b2 - self.a2) * x
+            self.z1 = (self.b1 - self.a1) * x + self.z2
+        else:
+            raw = x[idx]
+            self.unwrapped += (raw - self.last_input + period / 2) % period - period / 2
+            self.last_input = raw
+            x[idx] = self.unwrapped
+
+        for s in range(len(self.b0)):
+            y = self.b0[s] * x + self.z1[s]
+            self.z1[s] = self.b1[s] * x - self.a1[s] * y + self.z2[s]
+            self.z2[s] = self.b2[s] * x - self.a2[s] * y
+            x = y
+
+        x[idx] = (x[idx] - self.wrap_low) % period + self.wrap_low
+        return x
+
+
+def make_samples(count, seed=0):
+    """Sinal de IMU sintético: ângulos que dão a volta + ruído nos demais canais."""
+    rng = random.Random(seed)
+    samples = []
+    for n in range(count):
+        t = n / 200.0
+        samples.append(
+            [(37.0 * t) % 360.0, 10.0 * math.sin(t), (25.0 * t) % 360.0 - 180.0]
+            + [rng.gauss(0.0, 1.0) for _ in range(6)]
+            + [9.8 * math.sin(0.1 * t), 0.5 * rng.random(), 9.8 * math.cos(0.1 * t)]
+        )
+    return samples
+
+
+def bench(label, fn, samples, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(samples)
+        best = min(best, time.perf_counter() - start)
+
+    us = 1e6 * best / len(samples)
+    print(f"{label:<28}{us:>10.2f} us/amostra")
+    return us
+
+
+def run_legacy(channels, samples):
+    lpf = LegacyLowPassFilter(cutoff_hz=5.0, sample_rate=200.0)
+    out = []
+    for sample in samples:
+        row = []
+        for name, value in zip(channels, sample):
+            if name in ANGLE_WRAP:
+                low, period = ANGLE_WRAP[name]
+                row.append(lpf.apply_angle(name, value, low, period))
+            else:
+                row.append(lpf.apply(name, value))
+        out.append(row)
+    return out
+
+
+def run_apply(make_bank, samples):
+    bank = make_bank()
+    return [bank.apply(sample) for sample in samples]
+
+
+def run_numpy(make_bank, samples):
+    bank = NumpyFilterBank(make_bank())
+    return [bank.apply(sample).tolist() for sample in samples]
+
+
+def check(label, expected, got, tol):
+    err = float(np.max(np.abs(np.asarray(expected) - np.asarray(got))))
+    if err > tol:
+        raise SystemExit(f"Divergência em {label}: erro máximo {err:g}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--order", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    channels = FILTER_CHANNELS + GRAVITY_CHANNELS
+    samples = make_samples(args.samples)
+    print(f"{len(samples)} amostras, {len(channels)} canais")
+
+    for order in args.order:
+        def make_bank():
+            return FilterBank(channels, 200.0, cutoff_hz=5.0, order=order, wrap=ANGLE_WRAP)
+
+        print(f"\norder={order}")
+        reference = run_apply(make_bank, samples)
+        check("NumPy por amostra", reference, run_numpy(make_bank, samples), 1e-9)
+        check("filter_batch()", reference, make_bank().filter_batch(samples), 0.0)
+
+        if order == 1:
+            # O RC antigo acumula os arredondamentos de outro jeito
+            check("dict LowPassFilter", reference, run_legacy(channels, samples), 1e-9)
+            bench("dict LowPassFilter", lambda s: run_legacy(channels, s), samples, args.repeat)
+
+        old = bench("NumPy por amostra", lambda s: run_numpy(make_bank, s), samples, args.repeat)
+        new = bench("apply()", lambda s: run_apply(make_bank, s), samples, args.repeat)
+        batch = bench("filter_batch()", make_bank().filter_batch, samples, args.repeat)
+
+        print(f"speedup apply(): {old / new:.2f}x | filter_batch(): {new / batch:.2f}x sobre apply()")
+
+
+if __name__ == "__main__":
+    main()
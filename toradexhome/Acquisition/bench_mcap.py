@@ -0,0 +1,164 @@
+"""
+Benchmark das opções de compressão do McapTelemetryLogger.
+
+Gera um trecho sintético com a mesma composição do gateway (IMU 200 Hz,
+CAN e GNSS) e mede, para cada compressão: throughput em MB/s (volume
+não comprimido processado por segundo), CPU por segundo de dados
+gravados (fração de um núcleo no tempo real), µs de CPU por mensagem,
+tamanho final, razão de compressão e MB por hora de gravação.
+
+Uso no i.MX8M Mini (dentro do container acquisition):
+    python bench_mcap.py --seconds 60 --encoding json
+    python bench_mcap.py --options zstd,lz4,none
+"""
+import argparse
+import math
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from can_decoder import CANDecoderCore
+from mcap_logger import McapTelemetryLogger
+
+
+IMU_RATE = 200
+GNSS_RATE = 10
+CAN_RATE = 100
+
+IMU_NAMES = [
+    "yaw", "roll", "pitch",
+    "gyro_x", "gyro_y", "gyro_z",
+    "lin_accel_x", "lin_accel_y", "lin_accel_z",
+]
+
+
+
+class _Frame:
+    def __init__(self, arbitration_id, data):
+        self.arbitration_id = arbitration_id
+        self.data = data
+
+
+def synthetic_payloads(seconds):
+    """Payloads no formato do gateway, com sinais variando suavemente."""
+    decoder = CANDecoderCore()
+    can_ids = sorted(decoder.messages)
+    base_ns = time.time_ns()
+
+    for tick in range(int(seconds * IMU_RATE)):
+        t = tick / IMU_RATE
+        ts = base_ns + int(t * 1e9)
+
+        # Um registro agrupado por amostra, como o bno055.py publica
+        imu = {"source": "imu", "timestamp_ns": ts}
+        for i, name in enumerate(IMU_NAMES):
+            imu[name] = 10.0 * math.sin(t + i)
+        imu.update(calib_sys=3, calib_gyro=3, calib_accel=2, calib_mag=0, calib_state=1)
+        yield imu
+
+        if tick % (IMU_RATE // CAN_RATE) == 0:
+            for can_id in can_ids:
+                raw = int(1000 + 500 * math.sin(t + can_id)) & 0xFFFF
+                frame = _Frame(can_id, bytes([raw >> 8, raw & 0xFF] * 4))
+                yield {
+                    "source": "can",
+                    "timestamp_ns": ts,
+                    "can_id": hex(can_id),
+                    "signals": decoder.decode(frame),
+                }
+
+        if tick % (IMU_RATE // GNSS_RATE) == 0:
+            # Um registro GnssFix por época, como o neo_m8n.py publica
+            yield {
+                "source": "gps",
+                "timestamp_ns": ts,
+                "latitude": -23.5 + 1e-6 * tick,
+                "longitude": -47.1 + 1e-6 * tick,
+                "altitude": 755.0 + math.sin(t),
+                "speed": 12.0 + 3.0 * math.sin(t),
+                "heading": (10.0 * t) % 360.0,
+                "fix": 3,
+                "satellites": 12,
+                "h_acc": 1.5,
+                "v_acc": 2.5,
+                "s_acc": 0.3,
+            }
+
+
+def run(option, payloads, args):
+    out_dir = Path(tempfile.mkdtemp(prefix="bench_mcap_"))
+
+    try:
+        logger = McapTelemetryLogger(
+            output_dir=out_dir,
+            max_file_size_mb=10_000,
+            max_files=2,
+            default_encoding=args.encoding,
+            split_signals=args.split,
+            compression=option,
+            chunk_size=args.chunk_kb * 1024,
+        )
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        for payload in payloads:
+            logger.log_payload(payload)
+        logger.close()
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+        size = sum(f.stat().st_size for f in out_dir.glob("*.mcap"))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    return {
+        "option": option,
+        "wall_s": wall,
+        # O laço roda sem pausa (CPU% ~100 sempre): o custo é CPU por
+        # segundo de dados gravados e por mensagem
+        "cpu_per_s": cpu / args.seconds,
+        "us_per_msg": 1e6 * cpu / len(payloads),
+        "size_mb": size / 1e6,
+        "msgs_per_s": len(payloads) / wall if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="segundos de dados sintéticos")
+    parser.add_argument("--options", default="none,lz4,zstd")
+    parser.add_argument("--encoding", default="json", choices=["json", "cdr"])
+    parser.add_argument("--split", action="store_true", help="um canal por sinal")
+    parser.add_argument("--chunk-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    payloads = list(synthetic_payloads(args.seconds))
+    print(f"{len(payloads)} mensagens ({args.seconds:.0f} s de dados, encoding={args.encoding})")
+
+    options = args.options.split(",")
+    if "none" not in options:
+        # A execução sem compressão dá o volume lógico usado no MB/s
+        options.insert(0, "none")
+
+    results = [run(opt, payloads, args) for opt in options]
+    baseline = next(r for r in results if r["option"] == "none")
+
+    print(
+        f"{'opção':<10}{'MB/s':>10}{'CPU s/s':>9}{'µs/msg':>8}{'arquivo MB':>12}"
+        f"{'razão':>8}{'msg/s':>12}{'MB/h':>10}"
+    )
+    for r in results:
+        mb_s = baseline["size_mb"] / r["wall_s"] if r["wall_s"] else 0.0
+        ratio = baseline["size_mb"] / r["size_mb"] if r["size_mb"] else 1.0
+        mb_per_hour = r["size_mb"] * 3600.0 / args.seconds
+        print(
+            f"{r['option']:<10}{mb_s:>10.2f}{r['cpu_per_s']:>9.3f}{r['us_per_msg']:>8.1f}{r['size_mb']:>12.2f}"
+            f"{ratio:>8.2f}{r['msgs_per_s']:>12.0f}{mb_per_hour:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
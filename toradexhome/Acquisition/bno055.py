@@ -1,8 +1,17 @@
+import os
+import json
+import math
 import time
+import errno
 import struct
 import logging
 import threading
-from smbus2 import SMBus
+from collections import namedtuple
+from smbus2 import SMBus, i2c_msg
+
+from filters import FilterBank
+from timebase import FrameClock
+from imu_sampler import SamplingStats, TimerTrigger, GpioTrigger
 
 BNO055_ADDRESS = 0x28
 
@@ -12,9 +21,8 @@ BNO055_PWR_MODE = 0x3E
 BNO055_SYS_TRIGGER = 0x3F
 BNO055_UNIT_SEL = 0x3B
 
-REG_GYRO = 0x14
-REG_LINEAR_ACCEL = 0x28
-REG_EULER = 0x1A
+REG_ACCEL = 0x08
+REG_CALIB_OFFSETS = 0x55
 
 CONFIG_MODE = 0x00
 IMUPLUS_MODE = 0x08
@@ -23,8 +31,11 @@ logger = logging.getLogger("BNO055")
 
 
 # =========================================================
-# LOW PASS FILTER (1 Hz)
+# LOW PASS FILTER (quaternion)
 # =========================================================
+#
+# Os canais escalares passam pelo FilterBank (filters.py); o quaternion
+# precisa de hemisfério e renormalização, então fica com este filtro RC.
 
 class LowPassFilter:
 
@@ -34,12 +45,24 @@ class LowPassFilter:
         self.alpha = dt / (rc + dt)
         self.state = {}
 
-    def apply(self, name, value):
+    def apply_quaternion(self, name, q):
+        """
+        Filtra (w, x, y, z) mantendo o hemisfério do estado anterior
+        (q e -q são a mesma orientação) e renormaliza.
+        """
+
+        previous = self.state.get(name)
+        if previous is None:
+            previous = q
 
-        if name not in self.state:
-            self.state[name] = value
+        if sum(a * b for a, b in zip(previous, q)) < 0:
+            q = tuple(-c for c in q)
 
-        filtered = self.state[name] + self.alpha * (value - self.state[name])
+        alpha = self.alpha
+        filtered = [p + alpha * (c - p) for p, c in zip(previous, q)]
+
+        norm = math.sqrt(sum(c * c for c in filtered)) or 1.0
+        filtered = tuple(c / norm for c in filtered)
         self.state[name] = filtered
 
         return filtered
@@ -54,17 +77,173 @@ def write_byte(bus, reg, value):
     time.sleep(0.01)
 
 
-def read_vector(bus, reg):
-    data = bus.read_i2c_block_data(BNO055_ADDRESS, reg, 6)
-    x, y, z = struct.unpack('<hhh', bytes(data))
-    return x, y, z
+# =========================================================
+# Burst reader
+# =========================================================
+#
+# Os registradores de dados do BNO055 são contíguos de ACC_DATA (0x08) até
+# CALIB_STAT (0x35): accel, mag, gyro, euler, quaternion, linear accel,
+# gravity, temperatura e calibração. Uma única transação I2C de 46 bytes
+# substitui as leituras separadas por vetor.
+
+BURST_STRUCT = struct.Struct("<3h3h3h3h4h3h3hbB")
+BURST_LENGTH = BURST_STRUCT.size
+
+# Escalas (UNIT_SEL = 0x00): m/s², µT, dps, graus
+ACCEL_LSB = 100.0
+MAG_LSB = 16.0
+GYRO_LSB = 16.0
+EULER_LSB = 16.0
+QUAT_LSB = float(1 << 14)
+
+ImuData = namedtuple("ImuData", [
+    "accel_x", "accel_y", "accel_z",
+    "mag_x", "mag_y", "mag_z",
+    "gyro_x", "gyro_y", "gyro_z",
+    "yaw", "roll", "pitch",
+    "quat_w", "quat_x", "quat_y", "quat_z",
+    "lin_accel_x", "lin_accel_y", "lin_accel_z",
+    "gravity_x", "gravity_y", "gravity_z",
+    "temperature",
+    "calib_sys", "calib_gyro", "calib_accel", "calib_mag",
+])
+
+
+class BNO055Reader:
+    """
+    Lê todo o bloco de dados do BNO055 em uma transação (write do
+    registrador + read repetido via i2c_rdwr) e decodifica com um único
+    struct. Adaptadores sem I2C_RDWR caem em blocos SMBus de 32 bytes.
+    """
+
+    def __init__(self, bus, address=BNO055_ADDRESS):
+        self.bus = bus
+        self.address = address
+        self.burst = True
+
+    def read_raw(self):
+        if self.burst:
+            try:
+                write = i2c_msg.write(self.address, [REG_ACCEL])
+                read = i2c_msg.read(self.address, BURST_LENGTH)
+                self.bus.i2c_rdwr(write, read)
+                return bytes(read)
+            except OSError as e:
+                # Só desiste do burst se o adaptador não suporta I2C_RDWR;
+                # NACK/timeout do sensor sobe para o loop como antes
+                if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL):
+                    raise
+                logger.warning(f"I2C burst read unavailable ({e}), using SMBus block reads")
+                self.burst = False
+
+        first = self.bus.read_i2c_block_data(self.address, REG_ACCEL, 32)
+        rest = self.bus.read_i2c_block_data(self.address, REG_ACCEL + 32, BURST_LENGTH - 32)
+        return bytes(first + rest)
+
+    def read(self):
+        (
+            ax, ay, az, mx, my, mz, gx, gy, gz,
+            yaw, roll, pitch, qw, qx, qy, qz,
+            lx, ly, lz, grx, gry, grz, temp, calib,
+        ) = BURST_STRUCT.unpack(self.read_raw())
+
+        return ImuData(
+            ax / ACCEL_LSB, ay / ACCEL_LSB, az / ACCEL_LSB,
+            mx / MAG_LSB, my / MAG_LSB, mz / MAG_LSB,
+            gx / GYRO_LSB, gy / GYRO_LSB, gz / GYRO_LSB,
+            yaw / EULER_LSB, roll / EULER_LSB, pitch / EULER_LSB,
+            qw / QUAT_LSB, qx / QUAT_LSB, qy / QUAT_LSB, qz / QUAT_LSB,
+            lx / ACCEL_LSB, ly / ACCEL_LSB, lz / ACCEL_LSB,
+            grx / ACCEL_LSB, gry / ACCEL_LSB, grz / ACCEL_LSB,
+            temp,
+            (calib >> 6) & 0x03, (calib >> 4) & 0x03, (calib >> 2) & 0x03, calib & 0x03,
+        )
+
+
+# =========================================================
+# Calibration profile
+# =========================================================
+#
+# Offsets de accel/mag/gyro e raios de accel/mag (0x55..0x6A, 22 bytes).
+# Só podem ser lidos/escritos em CONFIG_MODE; restaurados no boot, o
+# sensor já sai usando a calibração da última vez em vez de recomeçar.
+
+CALIB_STRUCT = struct.Struct("<3h3h3hhh")
+CALIB_LENGTH = CALIB_STRUCT.size
+
+# calib_state no registro do IMU
+CALIB_STATE_NONE = 0        # calibrando, sem perfil salvo
+CALIB_STATE_RESTORED = 1    # perfil restaurado do disco
+CALIB_STATE_CALIBRATED = 2  # gyro e accel em 3 nesta execução (perfil salvo)
+
+# Espera entre tentativas de salvar o perfil depois de uma falha
+CALIB_SAVE_RETRY = 30.0
+
+
+def read_calibration_offsets(bus):
+    """Lê o perfil (bytes); sai e volta ao IMUPLUS, pausando ~50 ms."""
+    write_byte(bus, BNO055_OPR_MODE, CONFIG_MODE)
+    try:
+        time.sleep(0.02)
+        return bytes(bus.read_i2c_block_data(BNO055_ADDRESS, REG_CALIB_OFFSETS, CALIB_LENGTH))
+    finally:
+        # Em CONFIG_MODE o sensor não gera dados: volta mesmo se a leitura falhar
+        write_byte(bus, BNO055_OPR_MODE, IMUPLUS_MODE)
+
+
+def write_calibration_offsets(bus, offsets):
+    """Escreve o perfil; o sensor precisa estar em CONFIG_MODE."""
+    bus.write_i2c_block_data(BNO055_ADDRESS, REG_CALIB_OFFSETS, list(offsets))
+
+
+class CalibrationStore:
+    """Perfil de calibração em JSON (hex + campos decodificados para leitura)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                offsets = bytes.fromhex(json.load(f)["offsets"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Invalid BNO055 calibration file {self.path}: {e}")
+            return None
+
+        if len(offsets) != CALIB_LENGTH:
+            logger.warning(f"Invalid BNO055 calibration file {self.path}: {len(offsets)} bytes")
+            return None
+        return offsets
+
+    def save(self, offsets):
+        values = CALIB_STRUCT.unpack(offsets)
+        profile = {
+            "offsets": offsets.hex(),
+            "accel_offset": values[0:3],
+            "mag_offset": values[3:6],
+            "gyro_offset": values[6:9],
+            "accel_radius": values[9],
+            "mag_radius": values[10],
+            "saved_at_ns": time.time_ns(),
+        }
+
+        # Arquivo temporário + rename: queda de energia não deixa perfil pela metade
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
 
 
 # =========================================================
 # Initialization
 # =========================================================
 
-def init_bno055(bus):
+def init_bno055(bus, offsets=None):
+    """Configura o IMUPLUS; offsets (perfil salvo) são escritos em CONFIG_MODE."""
 
     write_byte(bus, BNO055_OPR_MODE, CONFIG_MODE)
     time.sleep(0.05)
@@ -74,6 +253,9 @@ def init_bno055(bus):
 
     write_byte(bus, BNO055_UNIT_SEL, 0x00)
 
+    if offsets is not None:
+        write_calibration_offsets(bus, offsets)
+
     write_byte(bus, BNO055_OPR_MODE, IMUPLUS_MODE)
     time.sleep(0.1)
 
@@ -82,89 +264,180 @@ def init_bno055(bus):
 # START IMU LOOP (200 Hz + Low Pass)
 # =========================================================
 
-def start(callback, i2c_bus=3, rate_hz=200):
-
-    period = 1.0 / rate_hz
-    lpf = LowPassFilter(cutoff_hz=1.0, sample_rate=rate_hz)
+# Canais filtrados pelo FilterBank, na ordem do vetor de cada amostra
+FILTER_CHANNELS = (
+    "yaw", "roll", "pitch",
+    "gyro_x", "gyro_y", "gyro_z",
+    "lin_accel_x", "lin_accel_y", "lin_accel_z",
+)
+GRAVITY_CHANNELS = ("gravity_x", "gravity_y", "gravity_z")
+
+# Heading 0..360 e pitch -180..180 dão a volta; roll fica em ±90
+ANGLE_WRAP = {"yaw": (0.0, 360.0), "pitch": (-180.0, 360.0)}
+
+
+def start(callback, i2c_bus=3, rate_hz=200, quaternion=False,
+          lpf_cutoff_hz=1.0, lpf_order=1, lpf_cutoffs=None,
+          int_gpio=None, int_edge="rising", stats_interval=10.0,
+          calibration_path=None):
+    """
+    quaternion=True inclui no registro o quaternion fundido (quat_w..z) e o
+    vetor gravidade (gravity_x..z), que não sofrem com gimbal lock.
+
+    lpf_cutoff_hz/lpf_order configuram o FilterBank dos canais; lpf_cutoffs
+    ({canal: Hz}) sobrescreve o corte por canal.
+
+    int_gpio=(chip, linha) amostra na borda do GPIO em vez do timer. A cada
+    stats_interval segundos as estatísticas de amostragem (período, jitter,
+    overruns) vão para o log e para o callback como source "imu_stats".
+
+    calibration_path: perfil de calibração restaurado no init e salvo quando
+    gyro e accel chegam a 3 (uma vez por execução); estado em calib_state.
+    """
+
+    channels = FILTER_CHANNELS + (GRAVITY_CHANNELS if quaternion else ())
+    bank = FilterBank(
+        channels, rate_hz, cutoff_hz=lpf_cutoff_hz, order=lpf_order,
+        wrap=ANGLE_WRAP, cutoffs=lpf_cutoffs
+    )
+    # Quaternion fica no filtro escalar (hemisfério + renormalização)
+    lpf = LowPassFilter(cutoff_hz=lpf_cutoff_hz, sample_rate=rate_hz)
 
     def imu_loop():
 
         with SMBus(i2c_bus) as bus:
 
-            init_bno055(bus)
-            logger.info(f"BNO055 IMUPLUS running at {rate_hz} Hz (LPF 1Hz)")
+            store = CalibrationStore(calibration_path) if calibration_path else None
+            offsets = store.load() if store else None
+
+            try:
+                init_bno055(bus, offsets)
+            except OSError as e:
+                if offsets is None:
+                    raise
+                logger.error(f"BNO055 calibration restore failed ({e}), starting uncalibrated")
+                offsets = None
+                init_bno055(bus)
+
+            if offsets is not None:
+                calib_state = CALIB_STATE_RESTORED
+                logger.info(f"BNO055 calibration restored from {calibration_path}")
+            else:
+                calib_state = CALIB_STATE_NONE
+
+            logger.info(
+                f"BNO055 IMUPLUS running at {rate_hz} Hz "
+                f"(LPF {lpf_cutoff_hz}Hz, order {lpf_order})"
+            )
+
+            reader = BNO055Reader(bus)
+
+            stats = SamplingStats(rate_hz)
+            trigger = None
+            if int_gpio:
+                try:
+                    trigger = GpioTrigger(*int_gpio, rate_hz, stats, edge=int_edge)
+                except Exception as e:
+                    logger.error(f"IMU interrupt GPIO {int_gpio} unavailable ({e}), using timer")
+            if trigger is None:
+                trigger = TimerTrigger(rate_hz, stats)
 
-            next_time = time.perf_counter()
+            # Instante do trigger (monotônico) -> wallclock
+            clock = FrameClock(clock="monotonic")
+            next_report_ns = time.monotonic_ns() + int(stats_interval * 1e9)
+            next_calib_save_ns = 0
 
             while True:
 
-                try:
+                sample_ns = trigger.wait()
+                stats.record(sample_ns)
+                timestamp_ns = clock.to_wall_ns(sample_ns / 1e9)
 
-                    # Euler (1 LSB = 1/16 deg)
-                    y, r, p = read_vector(bus, REG_EULER)
-                    yaw = y / 16.0
-                    roll = r / 16.0
-                    pitch = p / 16.0
+                try:
 
-                    # Gyro (1 LSB = 1/16 deg/s)
-                    gx, gy, gz = read_vector(bus, REG_GYRO)
-                    gx /= 16.0
-                    gy /= 16.0
-                    gz /= 16.0
+                    # Euler, gyro, linear accel e calibração numa só leitura
+                    data = reader.read()
 
-                    # Linear Accel (1 LSB = 1 mg)
-                    ax, ay, az = read_vector(bus, REG_LINEAR_ACCEL)
-                    ax /= 100.0
-                    ay /= 100.0
-                    az /= 100.0
+                    sample = [
+                        data.yaw, data.roll, data.pitch,
+                        data.gyro_x, data.gyro_y, data.gyro_z,
+                        data.lin_accel_x, data.lin_accel_y, data.lin_accel_z,
+                    ]
+                    if quaternion:
+                        sample += [data.gravity_x, data.gravity_y, data.gravity_z]
 
                     # ===============================
                     # APPLY LOW PASS FILTER
                     # ===============================
 
-                    yaw = lpf.apply("yaw", yaw)
-                    roll = lpf.apply("roll", roll)
-                    pitch = lpf.apply("pitch", pitch)
-
-                    gx = lpf.apply("gyro_x", gx)
-                    gy = lpf.apply("gyro_y", gy)
-                    gz = lpf.apply("gyro_z", gz)
-
-                    ax = lpf.apply("lin_accel_x", ax)
-                    ay = lpf.apply("lin_accel_y", ay)
-                    az = lpf.apply("lin_accel_z", az)
-
-                    signals = [
-                        {"value": yaw, "name": "/IMU/yaw"},
-                        {"value": roll, "name": "/IMU/roll"},
-                        {"value": pitch, "name": "/IMU/pitch"},
-                        
-                        {"value": gx, "name": "/IMU/gyro_x"},
-                        {"value": gy, "name": "/IMU/gyro_y"},
-                        {"value": gz, "name": "/IMU/gyro_z"},
-                        
-                        {"value": ax, "name": "/IMU/lin_accel_x"},
-                        {"value": ay, "name": "/IMU/lin_accel_y"},
-                        {"value": az, "name": "/IMU/lin_accel_z"}
-                    ]
-
-                    for s in signals:
-                        payload = {
-                            "v": s["value"],
-                            "n": s["name"]
-                        }
-                        callback(payload)
+                    filtered = bank.apply(sample)
+
+                    # Um registro por amostra (campos do IMU_SAMPLE_SCHEMA)
+                    record = {
+                        "source": "imu",
+                        "timestamp_ns": timestamp_ns
+                    }
+                    record.update(zip(channels, filtered))
+                    record.update(
+                        calib_sys=data.calib_sys,
+                        calib_gyro=data.calib_gyro,
+                        calib_accel=data.calib_accel,
+                        calib_mag=data.calib_mag,
+                        calib_state=calib_state
+                    )
+
+                    if quaternion:
+                        qw, qx, qy, qz = lpf.apply_quaternion(
+                            "quat", (data.quat_w, data.quat_x, data.quat_y, data.quat_z)
+                        )
+                        record.update(
+                            quat_w=qw,
+                            quat_x=qx,
+                            quat_y=qy,
+                            quat_z=qz
+                        )
+
+                    callback(record)
+
+                    # IMUPLUS não usa o magnetômetro: basta gyro e accel
+                    if (
+                        calib_state != CALIB_STATE_CALIBRATED
+                        and data.calib_gyro == 3 and data.calib_accel == 3
+                        and sample_ns >= next_calib_save_ns
+                    ):
+                        if store:
+                            try:
+                                store.save(read_calibration_offsets(bus))
+                            except OSError as e:
+                                # Continua no estado anterior e tenta de novo mais tarde
+                                next_calib_save_ns = sample_ns + int(CALIB_SAVE_RETRY * 1e9)
+                                logger.error(f"BNO055 calibration save failed: {e}")
+                            else:
+                                calib_state = CALIB_STATE_CALIBRATED
+                                logger.info(f"BNO055 fully calibrated, profile saved to {calibration_path}")
+                        else:
+                            calib_state = CALIB_STATE_CALIBRATED
 
                 except Exception as e:
                     logger.error(f"IMU error: {e}")
 
-                # Deterministic timing
-                next_time += period
-                sleep_time = next_time - time.perf_counter()
-
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
-                else:
-                    next_time = time.perf_counter()
+                if stats_interval and sample_ns >= next_report_ns:
+                    next_report_ns = sample_ns + int(stats_interval * 1e9)
+                    report_stats(stats.snapshot(reset=True), timestamp_ns)
+
+    def report_stats(snapshot, timestamp_ns):
+        log = logger.warning if snapshot["overruns"] or snapshot["timeouts"] else logger.info
+        log(
+            f"IMU sampling: {snapshot['rate_hz']:.1f} Hz, "
+            f"period {snapshot['period_min_us']:.0f}/{snapshot['period_mean_us']:.0f}/"
+            f"{snapshot['period_max_us']:.0f} us (min/mean/max), "
+            f"jitter p99 <= {snapshot['jitter_p99_us']:.0f} us, "
+            f"overruns={snapshot['overruns']} missed={snapshot['missed']} "
+            f"timeouts={snapshot['timeouts']}"
+        )
+        try:
+            callback({"source": "imu_stats", "timestamp_ns": timestamp_ns, **snapshot})
+        except Exception as e:
+            logger.error(f"IMU stats error: {e}")
 
     threading.Thread(target=imu_loop, daemon=True).start()
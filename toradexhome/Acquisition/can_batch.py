@@ -0,0 +1,222 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+from can_decoder import DecodedFrame, _new_frame
+
+
+# =========================================================
+# RECVMMSG (um syscall por lote)
+# =========================================================
+#
+# O python-can faz um recvmsg() e monta um can.Message por frame. Aqui um
+# único recvmmsg() escreve até max_batch frames (struct can_frame, 16
+# bytes) e os timestamps do kernel (SO_TIMESTAMPNS) direto em arrays NumPy
+# alocados uma vez: nenhum objeto Python por frame até a decodificação.
+# As linhas ficam na ordem de chegada.
+
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35)
+MSG_WAITFORONE = 0x10000
+
+CAN_EFF_FLAG = 0x80000000
+CAN_RTR_FLAG = 0x40000000
+CAN_ERR_FLAG = 0x20000000
+CAN_EFF_MASK = 0x1FFFFFFF
+
+# struct can_frame: can_id (com flags), len, 3 bytes reservados, data[8]
+FRAME_DTYPE = np.dtype({
+    "names": ["can_id", "dlc", "data"],
+    "formats": ["=u4", "u1", ("u1", (8,))],
+    "offsets": [0, 4, 8],
+    "itemsize": 16,
+})
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_iovec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _msghdr), ("msg_len", ctypes.c_uint)]
+
+
+class _cmsghdr(ctypes.Structure):
+    _fields_ = [
+        ("cmsg_len", ctypes.c_size_t),
+        ("cmsg_level", ctypes.c_int),
+        ("cmsg_type", ctypes.c_int),
+    ]
+
+
+def _cmsg_align(size):
+    align = ctypes.sizeof(ctypes.c_size_t)
+    return (size + align - 1) & ~(align - 1)
+
+
+# Buffer de controle de cada frame: um cmsghdr seguido da struct timespec
+_TIMESPEC_SIZE = 2 * ctypes.sizeof(ctypes.c_long)
+_CMSG_DATA = _cmsg_align(ctypes.sizeof(_cmsghdr))
+_CMSG_LEN = _CMSG_DATA + _TIMESPEC_SIZE
+_CONTROL_SIZE = _CMSG_DATA + _cmsg_align(_TIMESPEC_SIZE)
+
+_CONTROL_DTYPE = np.dtype({
+    "names": ["sec", "nsec"],
+    "formats": [np.dtype(ctypes.c_long), np.dtype(ctypes.c_long)],
+    "offsets": [_CMSG_DATA, _CMSG_DATA + ctypes.sizeof(ctypes.c_long)],
+    "itemsize": _CONTROL_SIZE,
+})
+
+# Os mmsghdr vivem num array NumPy para resetar os msg_controllen sem laço
+_HEADER_DTYPE = np.dtype({
+    "names": ["controllen"],
+    "formats": [np.dtype(ctypes.c_size_t)],
+    "offsets": [_mmsghdr.msg_hdr.offset + _msghdr.msg_controllen.offset],
+    "itemsize": ctypes.sizeof(_mmsghdr),
+})
+
+_libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+_recvmmsg = _libc.recvmmsg
+_recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+_recvmmsg.restype = ctypes.c_int
+
+
+class FrameBatchReader:
+    """
+    Lê lotes de frames de um socket CAN_RAW (bloqueante) com recvmmsg().
+    read() devolve (frames, timestamps_ns) como views dos buffers internos,
+    válidas até o próximo read(). Sem CAN_RAW_FD_FRAMES o kernel só entrega
+    frames clássicos, sempre com os 16 bytes da struct can_frame.
+    """
+
+    def __init__(self, sock, max_batch=256, timeout=1.0):
+        self.sock = sock
+        self.max_batch = max_batch
+
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        # Timeout do kernel: o recvmmsg com MSG_WAITFORONE espera só o primeiro frame
+        seconds = int(timeout)
+        sock.setsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVTIMEO,
+            struct.pack("ll", seconds, int((timeout - seconds) * 1e6))
+        )
+
+        self.frames = np.zeros(max_batch, dtype=FRAME_DTYPE)
+        self.control = np.zeros(max_batch, dtype=_CONTROL_DTYPE)
+        self.headers = np.zeros(max_batch, dtype=_HEADER_DTYPE)
+
+        self.iovecs = (_iovec * max_batch)()
+        self.msgs = (_mmsghdr * max_batch).from_buffer(self.headers)
+
+        frames_base = self.frames.ctypes.data
+        control_base = self.control.ctypes.data
+        iovecs_base = ctypes.addressof(self.iovecs)
+
+        for i in range(max_batch):
+            self.iovecs[i].iov_base = frames_base + i * FRAME_DTYPE.itemsize
+            self.iovecs[i].iov_len = FRAME_DTYPE.itemsize
+
+            header = self.msgs[i].msg_hdr
+            header.msg_iov = ctypes.cast(iovecs_base + i * ctypes.sizeof(_iovec), ctypes.POINTER(_iovec))
+            header.msg_iovlen = 1
+            header.msg_control = control_base + i * _CONTROL_SIZE
+
+        # Views criadas uma vez: read() só paga pelas operações do lote.
+        # (sec, nsec) de cada frame como uma linha; timestamp = linha · (1e9, 1)
+        self.controllen = self.headers["controllen"]
+        self.controllen[:] = _CONTROL_SIZE
+        self.timespecs = np.lib.stride_tricks.as_strided(
+            self.control["sec"], shape=(max_batch, 2),
+            strides=(_CONTROL_SIZE, ctypes.sizeof(ctypes.c_long)), writeable=False
+        )
+        self.ns_per_field = np.array([1_000_000_000, 1], dtype=self.timespecs.dtype)
+
+    def read(self):
+        """Espera o primeiro frame (até o timeout) e lê todos os que já estão na fila."""
+        n = _recvmmsg(self.sock.fileno(), self.msgs, self.max_batch, MSG_WAITFORONE, None)
+
+        if n < 0:
+            error = ctypes.get_errno()
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return None
+            raise OSError(error, os.strerror(error))
+
+        timestamps = self.timespecs[:n].dot(self.ns_per_field)
+
+        # O kernel troca msg_controllen pelo tamanho usado (nunca maior que o
+        # buffer): soma menor que n * _CONTROL_SIZE é frame sem timestamp, o
+        # que não acontece no socketcan; esses usam o relógio do sistema
+        controllen = self.controllen[:n]
+        if controllen.sum() != n * _CONTROL_SIZE:
+            timestamps[controllen < _CMSG_LEN] = time.time_ns()
+            controllen[:] = _CONTROL_SIZE
+
+        return self.frames[:n], timestamps
+
+
+# =========================================================
+# BATCH DECODER
+# =========================================================
+#
+# O lote é percorrido em C (struct.iter_unpack direto no buffer do array)
+# e os dados de cada frame passam pelo struct compilado do CANDecoderCore.
+# A saída são dicts por frame de qualquer jeito: decodificar coluna a
+# coluna por ID custa mais em overhead de NumPy do que economiza, ainda
+# mais nos lotes pequenos de um barramento pouco carregado (ver
+# bench_can_batch.py).
+
+_FRAME = struct.Struct("=IB3x8s")
+
+
+class BatchDecoder:
+    """
+    Decodifica lotes do FrameBatchReader com as mensagens compiladas do
+    CANDecoderCore. Os frames saem na ordem de chegada e iguais aos do
+    caminho frame a frame.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+
+    def decode(self, frames, timestamps_ns, offset_ns=0):
+        """
+        Decodifica um lote (FRAME_DTYPE); timestamp de cada frame é o do
+        kernel (ns) mais offset_ns (wallclock - relógio do kernel). Retorna
+        ([DecodedFrame], não decodificados): os índices de frames com ID
+        desconhecido, curtos, RTR ou de erro ficam para o log bruto.
+        """
+        messages = self.messages
+        decoded = []
+        undecoded = []
+
+        for index, ((can_id, dlc, data), timestamp_ns) in enumerate(
+            zip(_FRAME.iter_unpack(frames), timestamps_ns.tolist())
+        ):
+            message = None
+            if not can_id & (CAN_RTR_FLAG | CAN_ERR_FLAG):
+                message = messages.get(can_id & CAN_EFF_MASK)
+
+            if message is None or dlc < message.size:
+                undecoded.append(index)
+                continue
+
+            decoded.append(_new_frame(DecodedFrame, (timestamp_ns + offset_ns, message, message.values(data))))
+
+        return decoded, undecoded
@@ -1,8 +1,12 @@
 import can
 import logging
+import socket
+import struct
 import threading
 import time
 
+from can_batch import CAN_EFF_FLAG, FrameBatchReader
+
 
 class CANReceiver:
     """
@@ -10,12 +14,37 @@ class CANReceiver:
     Automatically reconnects if bus fails.
     """
 
-    def __init__(self, interface="can0"):
+    def __init__(self, interface="can0", can_ids=None):
+        """
+        can_ids: IDs aceitos pelo filtro do kernel (CAN_RAW_FILTER).
+        None recebe todos os frames do barramento.
+        """
         self.interface = interface
+        self.can_filters = self._build_filters(can_ids)
         self.bus = None
         self.running = False
         self.logger = logging.getLogger("CANReceiver")
 
+    # =====================================================
+    # KERNEL FILTERS
+    # =====================================================
+
+    @staticmethod
+    def _build_filters(can_ids):
+        """Um filtro de ID exato por ID; frames fora da lista nem acordam o processo."""
+        if can_ids is None:
+            return None
+
+        filters = []
+        for can_id in sorted(can_ids):
+            extended = can_id > 0x7FF
+            filters.append({
+                "can_id": can_id,
+                "can_mask": 0x1FFFFFFF if extended else 0x7FF,
+                "extended": extended,
+            })
+        return filters
+
     # =====================================================
     # CONNECT TO CAN BUS
     # =====================================================
@@ -24,9 +53,16 @@ class CANReceiver:
         try:
             self.bus = can.interface.Bus(
                 interface="socketcan",
-                channel=self.interface
+                channel=self.interface,
+                can_filters=self.can_filters
             )
-            self.logger.info(f"CAN RX connected on {self.interface}")
+            if self.can_filters is None:
+                self.logger.info(f"CAN RX connected on {self.interface} (no filters)")
+            else:
+                self.logger.info(
+                    f"CAN RX connected on {self.interface} "
+                    f"({len(self.can_filters)} kernel filters)"
+                )
             return True
         except Exception as e:
             self.logger.error(f"Failed to connect CAN RX: {e}")
@@ -65,6 +101,76 @@ class CANReceiver:
                 self.logger.error(f"Unexpected RX error: {e}")
                 self._reset_bus()
 
+    # =====================================================
+    # BATCH RECEIVING LOOP
+    # =====================================================
+
+    def _open_raw_socket(self):
+        """Socket CAN_RAW próprio (sem python-can) com os mesmos filtros do kernel."""
+        sock = socket.socket(socket.AF_CAN, socket.SOCK_RAW, socket.CAN_RAW)
+
+        try:
+            if self.can_filters is not None:
+                packed = b""
+                for f in self.can_filters:
+                    can_id, can_mask = f["can_id"], f["can_mask"] | CAN_EFF_FLAG
+                    if f["extended"]:
+                        can_id |= CAN_EFF_FLAG
+                    packed += struct.pack("=II", can_id, can_mask)
+                sock.setsockopt(socket.SOL_CAN_RAW, socket.CAN_RAW_FILTER, packed)
+
+            sock.bind((self.interface,))
+        except OSError:
+            sock.close()
+            raise
+
+        return sock
+
+    def start_receiving_batches(self, callback, max_batch=256):
+        """
+        Start blocking receive loop in batch mode.
+        Each recvmmsg() waits for one frame and takes everything already
+        queued in the socket; callback(frames, timestamps_ns) is called
+        once per batch (see can_batch.FrameBatchReader).
+        """
+        self.running = True
+        sock = None
+        reader = None
+
+        while self.running:
+
+            if reader is None:
+                try:
+                    sock = self._open_raw_socket()
+                    reader = FrameBatchReader(sock, max_batch=max_batch, timeout=1.0)
+                    self.logger.info(
+                        f"CAN RX connected on {self.interface} "
+                        f"(recvmmsg, batch {max_batch})"
+                    )
+                except Exception as e:
+                    self.logger.error(f"Failed to connect CAN RX: {e}")
+                    if sock:
+                        sock.close()
+                    sock = None
+                    time.sleep(2)
+                    continue
+
+            try:
+                batch = reader.read()
+
+                if batch is not None:
+                    callback(*batch)
+
+            except Exception as e:
+                self.logger.error(f"Unexpected RX error: {e}")
+                sock.close()
+                sock = None
+                reader = None
+                time.sleep(1)
+
+        if sock:
+            sock.close()
+
     # =====================================================
     # RESET BUS
     # =====================================================
@@ -0,0 +1,327 @@
+import logging
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+
+
+logger = logging.getLogger("Fanout")
+
+POLICY_DROP_OLDEST = "drop_oldest"
+POLICY_DISCONNECT = "disconnect"
+
+
+# =========================================================
+# PER-CLIENT SEND QUEUE
+# =========================================================
+
+class ClientQueue:
+    """
+    Bounded send queue of one telemetry client.
+    Only the writer thread touches the socket.
+    """
+
+    def __init__(self, conn, addr, max_frames, subscription=None):
+        self.conn = conn
+        self.addr = addr
+        self.frames = deque()
+        self.max_frames = max_frames
+
+        # Clientes com subscription recebem frames próprios via publish_to()
+        self.subscription = subscription
+
+        # Frame partially sent (memoryview) after a short send()
+        self.pending = None
+        self.want_write = False
+        self.closed = False
+
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.max_depth = 0
+        self.reported_drops = 0
+
+    def depth(self):
+        return len(self.frames) + (1 if self.pending is not None else 0)
+
+    def stats(self):
+        return {
+            "addr": f"{self.addr[0]}:{self.addr[1]}" if self.addr else "?",
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "bytes_sent": self.bytes_sent,
+        }
+
+
+# =========================================================
+# FAN-OUT STAGE
+# =========================================================
+
+class TelemetryFanout:
+    """
+    Decouples producers (IMU, GNSS, CAN) from the TCP clients.
+
+    publish() only appends the already-encoded frame to each client
+    queue and returns; a single selector-based writer thread drains
+    the queues with non-blocking sends. A slow client either loses
+    its oldest frames or is disconnected, depending on the policy.
+    """
+
+    def __init__(self, max_queue=2048, policy=POLICY_DROP_OLDEST, stats_interval=10.0):
+        if policy not in (POLICY_DROP_OLDEST, POLICY_DISCONNECT):
+            raise ValueError(f"Unknown slow client policy: {policy}")
+
+        self.max_queue = max_queue
+        self.policy = policy
+        self.stats_interval = stats_interval
+
+        self.clients = []
+        # Snapshot imutável dos clientes com subscription (trocado a cada mudança)
+        self.subscribed = []
+        self.lock = threading.Lock()
+
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._wake_pending = False
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+        self.running = False
+        self.thread = None
+
+    # =====================================================
+    # PRODUCER SIDE
+    # =====================================================
+
+    def publish(self, raw, include_subscribed=False):
+        """
+        Enqueue one encoded frame for every client without subscription
+        (or for every client with include_subscribed). Never blocks on I/O.
+        """
+        wake = False
+
+        with self.lock:
+            for client in self.clients:
+                if client.subscription is not None and not include_subscribed:
+                    continue
+                if self._enqueue(client, raw):
+                    wake = True
+
+            if self.clients and not self._wake_pending:
+                self._wake_pending = True
+                wake = True
+
+        if wake:
+            self._wake()
+
+    def publish_to(self, client, raw):
+        """Enqueue a frame for a single (subscribed) client."""
+        wake = False
+
+        with self.lock:
+            if self._enqueue(client, raw):
+                wake = True
+
+            if not self._wake_pending:
+                self._wake_pending = True
+                wake = True
+
+        if wake:
+            self._wake()
+
+    def _enqueue(self, client, raw):
+        """Append under lock; returns True when the client must be closed by the writer."""
+        if client.closed:
+            return False
+
+        frames = client.frames
+
+        if len(frames) >= client.max_frames:
+            if self.policy == POLICY_DISCONNECT:
+                client.closed = True
+                return True
+            frames.popleft()
+            client.dropped += 1
+
+        frames.append(raw)
+
+        if len(frames) > client.max_depth:
+            client.max_depth = len(frames)
+
+        return False
+
+    def add_client(self, conn, addr=None, greeting=None, subscription=None):
+        """greeting: frame enviado antes de qualquer publish (ex.: dicionário)."""
+        conn.setblocking(False)
+        client = ClientQueue(conn, addr, self.max_queue, subscription)
+
+        if greeting:
+            client.frames.append(greeting)
+
+        with self.lock:
+            self.clients.append(client)
+            if subscription is not None:
+                self.subscribed = self.subscribed + [client]
+
+        if greeting:
+            self._wake()
+
+        return client
+
+    def stats(self):
+        with self.lock:
+            return [c.stats() for c in self.clients]
+
+    # =====================================================
+    # WRITER THREAD
+    # =====================================================
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake()
+
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+        with self.lock:
+            clients = list(self.clients)
+            self.clients.clear()
+            self.subscribed = []
+
+        for client in clients:
+            self._close_client(client)
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            # Buffer cheio: o writer já tem um wakeup pendente
+            pass
+
+    def _drain_wakeup(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+
+        with self.lock:
+            self._wake_pending = False
+
+    def _run(self):
+        last_report = time.monotonic()
+
+        while self.running:
+            events = self.selector.select(timeout=1.0)
+
+            for key, _ in events:
+                if key.data is None:
+                    self._drain_wakeup()
+
+            with self.lock:
+                snapshot = list(self.clients)
+
+            for client in snapshot:
+                if client.closed:
+                    self._remove_client(client, "queue overflow")
+                    continue
+                self._flush(client)
+
+            now = time.monotonic()
+            if self.stats_interval and now - last_report >= self.stats_interval:
+                self._report_slow_clients()
+                last_report = now
+
+    def _flush(self, client):
+        while True:
+            if client.pending is None:
+                with self.lock:
+                    if not client.frames:
+                        break
+                    client.pending = memoryview(client.frames.popleft())
+
+            try:
+                n = client.conn.send(client.pending)
+            except (BlockingIOError, InterruptedError):
+                self._set_want_write(client, True)
+                return
+            except OSError as e:
+                self._remove_client(client, e)
+                return
+
+            client.bytes_sent += n
+
+            if n < len(client.pending):
+                client.pending = client.pending[n:]
+                self._set_want_write(client, True)
+                return
+
+            client.pending = None
+            client.sent += 1
+
+        self._set_want_write(client, False)
+
+    def _set_want_write(self, client, want):
+        if client.want_write == want:
+            return
+
+        if want:
+            self.selector.register(client.conn, selectors.EVENT_WRITE, client)
+        else:
+            self.selector.unregister(client.conn)
+
+        client.want_write = want
+
+    # =====================================================
+    # CLIENT REMOVAL / METRICS
+    # =====================================================
+
+    def _remove_client(self, client, reason):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+            if client in self.subscribed:
+                self.subscribed = [c for c in self.subscribed if c is not client]
+
+        logger.warning(
+            f"Telemetry client {client.addr} removed ({reason}) | {client.stats()}"
+        )
+        self._close_client(client)
+
+    def _close_client(self, client):
+        client.closed = True
+
+        if client.want_write:
+            try:
+                self.selector.unregister(client.conn)
+            except (KeyError, ValueError):
+                pass
+            client.want_write = False
+
+        try:
+            client.conn.close()
+        except Exception:
+            pass
+
+    def _report_slow_clients(self):
+        with self.lock:
+            snapshot = [(c, c.stats()) for c in self.clients]
+
+        for client, s in snapshot:
+            new_drops = s["dropped"] - client.reported_drops
+            if new_drops > 0:
+                logger.warning(
+                    f"Slow telemetry client {s['addr']}: "
+                    f"dropped {new_drops} frames "
+                    f"(depth={s['depth']}, max_depth={s['max_depth']}, total_dropped={s['dropped']})"
+                )
+                client.reported_drops = s["dropped"]
@@ -0,0 +1,203 @@
+import math
+
+import numpy as np
+
+
+# =========================================================
+# FILTER BANK (IIR por canal)
+# =========================================================
+#
+# Cada canal passa por uma cascata de seções de segunda ordem (Direct
+# Form II transposta). order=1 é o filtro RC do LowPassFilter (mesma
+# resposta); order >= 2 é Butterworth (transformação bilinear com prewarp).
+#
+# Tudo em float do Python: com os ~12 canais do IMU cada chamada NumPy
+# custa mais que a conta inteira do canal, tanto por amostra quanto no
+# reprocessamento em lote (ver bench_filters.py).
+
+
+def _rc_section(cutoff_hz, sample_rate):
+    dt = 1.0 / sample_rate
+    rc = 1.0 / (2 * 3.1415926535 * cutoff_hz)
+    alpha = dt / (rc + dt)
+    # y = y + alpha * (x - y)
+    return (alpha, 0.0, 0.0, -(1.0 - alpha), 0.0)
+
+
+def _butterworth_sections(cutoff_hz, sample_rate, order):
+    """Coeficientes (b0, b1, b2, a1, a2) de cada seção, ganho DC unitário."""
+    k = math.tan(math.pi * cutoff_hz / sample_rate)
+    sections = []
+
+    for i in range(order // 2):
+        q = 1.0 / (2.0 * math.sin(math.pi * (2 * i + 1) / (2 * order)))
+        norm = 1.0 / (1.0 + k / q + k * k)
+        b0 = k * k * norm
+        sections.append((b0, 2.0 * b0, b0, 2.0 * (k * k - 1.0) * norm, (1.0 - k / q + k * k) * norm))
+
+    if order % 2:
+        norm = 1.0 / (1.0 + k)
+        sections.append((k * norm, k * norm, 0.0, (k - 1.0) * norm, 0.0))
+
+    return sections
+
+
+class FilterBank:
+    """
+    Banco de passa-baixas para um vetor de canais.
+
+    cutoff_hz: corte padrão; cutoffs: {canal: Hz} para cortes específicos.
+    order=1 é o RC de primeira ordem; order >= 2 é Butterworth.
+    wrap: {canal: (low, period)} para ângulos que dão a volta, ex.
+    {"yaw": (0.0, 360.0)}; o canal é desenrolado antes do filtro e o
+    resultado volta para [low, low + period).
+    """
+
+    def __init__(self, channels, sample_rate, cutoff_hz=1.0, order=1, wrap=None, cutoffs=None):
+        if order < 1:
+            raise ValueError("Ordem do filtro deve ser >= 1")
+
+        self.channels = list(channels)
+        self.sample_rate = sample_rate
+        self.order = order
+
+        cutoffs = [(cutoffs or {}).get(name, cutoff_hz) for name in self.channels]
+        for name, fc in zip(self.channels, cutoffs):
+            if not 0 < fc < sample_rate / 2:
+                raise ValueError(f"Corte inválido para {name}: {fc} Hz (fs={sample_rate} Hz)")
+
+        # sections[c] = [(b0, b1, b2, a1, a2), ...] do canal c
+        if order == 1:
+            self.sections = [[_rc_section(fc, sample_rate)] for fc in cutoffs]
+        else:
+            self.sections = [_butterworth_sections(fc, sample_rate, order) for fc in cutoffs]
+
+        # RC: só b0 e a1 são não nulos, y[n] = b0 * x[n] + (-a1) * y[n-1]
+        self.rc_b0 = [secs[0][0] for secs in self.sections]
+        self.rc_feedback = [-secs[0][3] for secs in self.sections]
+
+        # wrap: [(canal, low, period)]
+        wrap = wrap or {}
+        self.wrap = [
+            (i, *wrap[name]) for i, name in enumerate(self.channels) if name in wrap
+        ]
+
+        self.reset()
+
+    def reset(self):
+        self.z1 = [[0.0] * len(secs) for secs in self.sections]
+        self.z2 = [[0.0] * len(secs) for secs in self.sections]
+        self.rc_output = [0.0] * len(self.channels)
+        self.last_input = [0.0] * len(self.wrap)
+        self.unwrapped = [0.0] * len(self.wrap)
+        self.initialized = False
+
+    def _initialize(self, x):
+        """Estado de regime para entrada constante x (sem transiente inicial)."""
+        for c, value in enumerate(x):
+            z1, z2 = self.z1[c], self.z2[c]
+            for s, (b0, b1, b2, a1, a2) in enumerate(self.sections[c]):
+                z2[s] = (b2 - a2) * value
+                z1[s] = (b1 - a1) * value + z2[s]
+        # z1 = -a1 * x = feedback * x: a "saída anterior" do RC é o próprio x
+        self.rc_output = list(x)
+        self.initialized = True
+
+    def apply(self, sample):
+        """Filtra uma amostra (sequência na ordem de channels); retorna uma lista."""
+        x = list(sample)
+
+        for k, (i, low, period) in enumerate(self.wrap):
+            raw = x[i]
+            if self.initialized:
+                delta = (raw - self.last_input[k] + period / 2) % period - period / 2
+                self.unwrapped[k] += delta
+            else:
+                self.unwrapped[k] = raw
+            self.last_input[k] = raw
+            x[i] = self.unwrapped[k]
+
+        if not self.initialized:
+            self._initialize(x)
+
+        if self.order == 1:
+            y = [
+                b0 * v + fb * prev
+                for b0, fb, v, prev in zip(self.rc_b0, self.rc_feedback, x, self.rc_output)
+            ]
+            self.rc_output = y
+        else:
+            y = []
+            for c, v in enumerate(x):
+                z1, z2 = self.z1[c], self.z2[c]
+                for s, (b0, b1, b2, a1, a2) in enumerate(self.sections[c]):
+                    out = b0 * v + z1[s]
+                    z1[s] = b1 * v - a1 * out + z2[s]
+                    z2[s] = b2 * v - a2 * out
+                    v = out
+                y.append(v)
+
+        out = list(y) if self.wrap else y
+        for i, low, period in self.wrap:
+            out[i] = (out[i] - low) % period + low
+
+        return out
+
+    def filter_batch(self, samples):
+        """
+        Reprocessamento offline: filtra uma matriz (amostras x canais) a
+        partir do estado inicial, canal a canal, com as mesmas operações
+        do tempo real (resultado idêntico). O estado do banco não é
+        alterado.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if not len(samples):
+            return samples.copy()
+
+        wrap = {i: (low, period) for i, low, period in self.wrap}
+        columns = []
+
+        for c, column in enumerate(samples.T.tolist()):
+            if c in wrap:
+                low, period = wrap[c]
+                column = _unwrap(column, period)
+
+            x0 = column[0]
+            for b0, b1, b2, a1, a2 in self.sections[c]:
+                z2 = (b2 - a2) * x0
+                z1 = (b1 - a1) * x0 + z2
+                out = []
+                append = out.append
+
+                if self.order == 1:
+                    feedback = self.rc_feedback[c]
+                    for v in column:
+                        y = b0 * v + z1
+                        z1 = feedback * y
+                        append(y)
+                else:
+                    for v in column:
+                        y = b0 * v + z1
+                        z1 = b1 * v - a1 * y + z2
+                        z2 = b2 * v - a2 * y
+                        append(y)
+
+                column = out
+
+            if c in wrap:
+                column = [(v - low) % period + low for v in column]
+            columns.append(column)
+
+        return np.array(columns).T
+
+
+def _unwrap(values, period):
+    """Desenrola uma série de ângulos como o apply() faz amostra a amostra."""
+    out = [values[0]]
+    unwrapped = values[0]
+    last = values[0]
+    for raw in values[1:]:
+        unwrapped += (raw - last + period / 2) % period - period / 2
+        last = raw
+        out.append(unwrapped)
+    return out
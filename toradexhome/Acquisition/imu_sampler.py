@@ -0,0 +1,204 @@
+import time
+import logging
+from bisect import bisect_left
+
+
+logger = logging.getLogger("IMUSampler")
+
+
+# =========================================================
+# SAMPLING STATS (período, jitter e overruns)
+# =========================================================
+
+# Limites do histograma de |jitter| (µs); o último bin é "acima de 5 ms"
+JITTER_EDGES_US = (10, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class SamplingStats:
+    """
+    Estatísticas de amostragem de uma janela: período medido entre
+    amostras consecutivas, histograma de |período - nominal| e contagem de
+    overruns (amostra atrasada), períodos perdidos e timeouts do GPIO.
+    """
+
+    def __init__(self, rate_hz, edges_us=JITTER_EDGES_US):
+        self.rate_hz = rate_hz
+        self.period_ns = round(1e9 / rate_hz)
+        self.edges_us = tuple(edges_us)
+        self.edges_ns = [e * 1000 for e in self.edges_us]
+        self.last_ns = None
+        self.reset()
+
+    def reset(self):
+        self.samples = 0
+        self.overruns = 0
+        self.missed = 0
+        self.timeouts = 0
+        self.histogram = [0] * (len(self.edges_ns) + 1)
+        self.period_sum_ns = 0
+        self.periods = 0
+        self.period_min_ns = None
+        self.period_max_ns = None
+        self.window_start_ns = self.last_ns
+
+    def record(self, sample_ns):
+        """Registra o instante (monotônico, ns) de uma amostra."""
+        last = self.last_ns
+        if last is not None:
+            period = sample_ns - last
+            jitter = abs(period - self.period_ns)
+            self.histogram[bisect_left(self.edges_ns, jitter)] += 1
+
+            self.period_sum_ns += period
+            self.periods += 1
+            if self.period_min_ns is None or period < self.period_min_ns:
+                self.period_min_ns = period
+            if self.period_max_ns is None or period > self.period_max_ns:
+                self.period_max_ns = period
+
+        if self.window_start_ns is None:
+            self.window_start_ns = sample_ns
+
+        self.last_ns = sample_ns
+        self.samples += 1
+
+    def overrun(self, missed=0):
+        """Amostra atrasada; missed = períodos inteiros perdidos."""
+        self.overruns += 1
+        self.missed += missed
+
+    def timeout(self):
+        self.timeouts += 1
+
+    def _jitter_percentile_us(self, fraction):
+        """Limite superior do bin que contém o percentil (estimativa conservadora)."""
+        target = fraction * self.periods
+        count = 0
+        for edge, n in zip(self.edges_us, self.histogram):
+            count += n
+            if count >= target:
+                return float(edge)
+        # Acima do último bin: maior desvio observado na janela
+        return max(
+            abs(self.period_max_ns - self.period_ns),
+            abs(self.period_min_ns - self.period_ns)
+        ) / 1000
+
+    def snapshot(self, reset=False):
+        periods = self.periods
+        elapsed_ns = (self.last_ns or 0) - (self.window_start_ns or 0)
+
+        stats = {
+            "samples": self.samples,
+            "rate_hz": periods * 1e9 / elapsed_ns if elapsed_ns > 0 else 0.0,
+            "period_mean_us": self.period_sum_ns / periods / 1000 if periods else 0.0,
+            "period_min_us": (self.period_min_ns or 0) / 1000,
+            "period_max_us": (self.period_max_ns or 0) / 1000,
+            "jitter_p99_us": self._jitter_percentile_us(0.99) if periods else 0.0,
+            "overruns": self.overruns,
+            "missed": self.missed,
+            "timeouts": self.timeouts,
+        }
+        for edge, n in zip(self.edges_us, self.histogram):
+            stats[f"jitter_le_{edge}us"] = n
+        stats[f"jitter_gt_{self.edges_us[-1]}us"] = self.histogram[-1]
+
+        if reset:
+            self.reset()
+        return stats
+
+
+# =========================================================
+# TRIGGERS
+# =========================================================
+#
+# wait() bloqueia até o instante da próxima amostra e retorna esse instante
+# em ns de CLOCK_MONOTONIC (o mesmo relógio dos eventos do gpiod).
+
+class TimerTrigger:
+    """Agenda por relógio monotônico; atraso conta como overrun e ressincroniza."""
+
+    def __init__(self, rate_hz, stats):
+        self.period_ns = round(1e9 / rate_hz)
+        self.stats = stats
+        self.next_ns = None
+
+    def wait(self):
+        now = time.monotonic_ns()
+
+        if self.next_ns is None:
+            self.next_ns = now
+        else:
+            delay = self.next_ns - now
+            if delay > 0:
+                time.sleep(delay / 1e9)
+            elif delay < 0:
+                self.stats.overrun(-delay // self.period_ns)
+                self.next_ns = now
+
+        sample_ns = time.monotonic_ns()
+        self.next_ns += self.period_ns
+        return sample_ns
+
+    def close(self):
+        pass
+
+
+def parse_gpio(spec):
+    """'gpiochip0:12' -> ('gpiochip0', 12); a linha também pode ser um nome."""
+    if not spec:
+        return None
+    chip, _, line = spec.partition(":")
+    return chip, int(line) if line.isdigit() else line
+
+
+class GpioTrigger:
+    """
+    Amostra na borda de uma linha GPIO (pino INT do BNO055 ou um clock de
+    amostragem externo), via eventos de borda do libgpiod v2. O timestamp é
+    o do kernel na borda; buracos no line_seqno contam como períodos
+    perdidos. Sem borda em timeout_periods períodos, amostra mesmo assim
+    (conta timeout) para o stream não parar.
+    """
+
+    def __init__(self, chip, line, rate_hz, stats, edge="rising", timeout_periods=3):
+        # Só necessário com IMU_INT_GPIO configurado
+        import gpiod
+        from gpiod.line import Edge
+
+        edges = {"rising": Edge.RISING, "falling": Edge.FALLING}
+        if edge not in edges:
+            raise ValueError(f"Borda inválida: {edge}")
+
+        if not chip.startswith("/"):
+            chip = f"/dev/{chip}"
+
+        self.request = gpiod.request_lines(
+            chip,
+            consumer="tupa-imu",
+            config={line: gpiod.LineSettings(edge_detection=edges[edge])}
+        )
+        self.timeout = timeout_periods / rate_hz
+        self.stats = stats
+        self.last_seqno = None
+
+        logger.info(f"IMU sampling on {edge} edge of {chip} line {line}")
+
+    def wait(self):
+        if not self.request.wait_edge_events(self.timeout):
+            self.stats.timeout()
+            return time.monotonic_ns()
+
+        # Eventos acumulados = a leitura anterior atrasou; usa a borda mais recente
+        event = self.request.read_edge_events()[-1]
+
+        if self.last_seqno is not None:
+            skipped = event.line_seqno - self.last_seqno - 1
+            if skipped > 0:
+                self.stats.overrun(skipped)
+        self.last_seqno = event.line_seqno
+
+        return event.timestamp_ns
+
+    def close(self):
+        self.request.release()
@@ -1,16 +1,25 @@
 import os
 import json
+import signal
 import socket
 import threading
-import time
 import logging
 
 from can_receiver import CANReceiver
 from can_sender import CANSender
 from can_decoder import CANDecoderCore
+from can_batch import CAN_EFF_MASK, BatchDecoder
+from timebase import FrameClock, SOURCE_SYSTEM, wallclock, start_pps
 from bno055 import start as start_imu
-from neo_m8n import start as start_gnss
+from imu_sampler import parse_gpio
+from neo_m8n import ChangeFilter, start as start_gnss
 from mcap_logger import McapTelemetryLogger
+from fanout import TelemetryFanout
+from shm_ring import ShmRingWriter
+from stream_protocol import (
+    HELLO_OK, NDJSON_OK, MAX_HELLO, BinaryEncoder,
+    parse_hello, payload_signals, signals_payload,
+)
 
 
 # =========================================================
@@ -31,75 +40,379 @@ CAN_INTERFACE = os.getenv("CAN_INTERFACE", "can0")
 RX_PORT = int(os.getenv("RX_STREAM_PORT", "7000"))
 TX_PORT = int(os.getenv("TX_COMMAND_PORT", "7002"))
 
+# Sem filtro no kernel: recebe o barramento inteiro e grava no MCAP os
+# frames de IDs que o decoder não conhece (tópico can_raw)
+CAN_RAW_ALL = os.getenv("CAN_RAW_ALL", "0") == "1"
+
+# Recepção CAN em lotes (recvmmsg) com decodificação vetorizada (NumPy)
+CAN_BATCH = os.getenv("CAN_BATCH", "0") == "1"
+CAN_MAX_BATCH = int(os.getenv("CAN_MAX_BATCH", "256"))
+
+# Fila de envio por cliente (frames) e política para cliente lento
+RX_CLIENT_QUEUE = int(os.getenv("RX_CLIENT_QUEUE", "2048"))
+RX_SLOW_CLIENT_POLICY = os.getenv("RX_SLOW_CLIENT_POLICY", "drop_oldest")
+RX_STATS_INTERVAL = float(os.getenv("RX_STATS_INTERVAL", "10"))
+
+# Quaternion fundido e vetor gravidade no registro do IMU
+IMU_QUATERNION = os.getenv("IMU_QUATERNION", "0") == "1"
+
+# Passa-baixas do IMU: corte padrão, ordem (1 = RC, >= 2 = Butterworth) e
+# cortes por canal, ex. IMU_LPF_CUTOFFS="gyro_z=5,lin_accel_x=3"
+IMU_LPF_CUTOFF = float(os.getenv("IMU_LPF_CUTOFF", "1.0"))
+IMU_LPF_ORDER = int(os.getenv("IMU_LPF_ORDER", "1"))
+IMU_LPF_CUTOFFS = {
+    name.strip(): float(value)
+    for name, value in (
+        item.split("=", 1) for item in os.getenv("IMU_LPF_CUTOFFS", "").split(",") if item.strip()
+    )
+}
+
+# Amostragem do IMU na borda de um GPIO ("gpiochip0:12" ou "gpiochip0:NOME_DA_LINHA")
+# em vez do timer; estatísticas de jitter/overrun a cada IMU_STATS_INTERVAL s
+IMU_INT_GPIO = os.getenv("IMU_INT_GPIO", "")
+IMU_INT_EDGE = os.getenv("IMU_INT_EDGE", "rising")
+IMU_STATS_INTERVAL = float(os.getenv("IMU_STATS_INTERVAL", "10"))
+
+# Perfil de calibração do BNO055 (restaurado no boot, salvo ao calibrar);
+# vazio desativa
+IMU_CALIBRATION_PATH = os.getenv("IMU_CALIBRATION_PATH", "/logs/bno055_calibration.json")
+
+# GNSS (NEO-M8N em UBX NAV-PVT); o módulo é trocado da baudrate de fábrica
+# para GNSS_BAUDRATE na primeira conexão. UBLOX_TOKEN ativa o AssistNow Online
+# (só quando não há assistência em disco)
+GNSS_PORT = os.getenv("GNSS_PORT", "/dev/ttymxc2")
+GNSS_BAUDRATE = int(os.getenv("GNSS_BAUDRATE", "115200"))
+GNSS_INITIAL_BAUDRATE = int(os.getenv("GNSS_INITIAL_BAUDRATE", "9600"))
+GNSS_RATE_HZ = float(os.getenv("GNSS_RATE_HZ", "10"))
+UBLOX_TOKEN = os.getenv("UBLOX_TOKEN")
+
+# Assistência em disco para TTFF curto sem rede: banco de navegação do
+# receptor (salvo a cada GNSS_ASSIST_SAVE_INTERVAL s com fix e no shutdown;
+# vazio desativa) e arquivo AssistNow Offline/Autonomous baixado antes
+GNSS_ASSIST_PATH = os.getenv("GNSS_ASSIST_PATH", "/logs/gnss_navdb.ubx")
+GNSS_ASSIST_OFFLINE_PATH = os.getenv("GNSS_ASSIST_OFFLINE_PATH", "")
+GNSS_ASSIST_SAVE_INTERVAL = float(os.getenv("GNSS_ASSIST_SAVE_INTERVAL", "300"))
+
+# Timepulse (PPS) do GNSS num GPIO ("gpiochip0:13"): disciplina o relógio do
+# gateway com precisão de µs; sem ele vale a hora UTC do NAV-PVT (~ms)
+GNSS_PPS_GPIO = os.getenv("GNSS_PPS_GPIO", "")
+GNSS_PPS_EDGE = os.getenv("GNSS_PPS_EDGE", "rising")
+
+# Stream do GNSS só com os campos que mudaram na época (o MCAP continua com
+# o registro completo); registro completo a cada GNSS_KEYFRAME_INTERVAL s
+GNSS_CHANGES_ONLY = os.getenv("GNSS_CHANGES_ONLY", "0") == "1"
+GNSS_KEYFRAME_INTERVAL = float(os.getenv("GNSS_KEYFRAME_INTERVAL", "1"))
+
+# Ring em memória compartilhada para control/telemetry (volume tmpfs /shm)
+SHM_RING = os.getenv("SHM_RING", "0") == "1"
+SHM_RING_PATH = os.getenv("SHM_RING_PATH", "/shm/telemetry.ring")
+SHM_RING_SLOTS = int(os.getenv("SHM_RING_SLOTS", "65536"))
+
+# Tempo que o servidor espera pelo HELLO do protocolo binário; sem HELLO o
+# cliente recebe NDJSON
+RX_HELLO_TIMEOUT = float(os.getenv("RX_HELLO_TIMEOUT", "0.5"))
+
+# MCAP escrito por uma thread dedicada (produtores só enfileiram)
+MCAP_ASYNC = os.getenv("MCAP_ASYNC", "1") == "1"
+MCAP_QUEUE_SIZE = int(os.getenv("MCAP_QUEUE_SIZE", "65536"))
+MCAP_ROTATE_MINUTES = float(os.getenv("MCAP_ROTATE_MINUTES", "0"))
+
+# Codificação do MCAP: "json" ou "cdr" (ros2msg tipado), com override por
+# source, ex.: MCAP_ENCODINGS="can=cdr,imu=cdr,gps=json"
+MCAP_ENCODING = os.getenv("MCAP_ENCODING", "json")
+MCAP_ENCODINGS = dict(
+    item.split("=", 1)
+    for item in os.getenv("MCAP_ENCODINGS", "").split(",")
+    if "=" in item
+)
+
+# Um canal MCAP por sinal (ex.: /BMS1/pack_current) em vez de um por source
+MCAP_SPLIT_SIGNALS = os.getenv("MCAP_SPLIT_SIGNALS", "0") == "1"
+
+# Compressão dos chunks MCAP (zstd/lz4/none) e tamanho do chunk
+MCAP_COMPRESSION = os.getenv("MCAP_COMPRESSION", "zstd")
+MCAP_CHUNK_KB = int(os.getenv("MCAP_CHUNK_KB", "64"))
+
 
 # =========================================================
 # GLOBAL STATE
 # =========================================================
 
-clients = []
-clients_lock = threading.Lock()
+fanout = TelemetryFanout(
+    max_queue=RX_CLIENT_QUEUE,
+    policy=RX_SLOW_CLIENT_POLICY,
+    stats_interval=RX_STATS_INTERVAL
+)
+
+# Clientes do protocolo binário (stream_protocol) têm fanout próprio
+binary_fanout = TelemetryFanout(
+    max_queue=RX_CLIENT_QUEUE,
+    policy=RX_SLOW_CLIENT_POLICY,
+    stats_interval=RX_STATS_INTERVAL
+)
 
 decoder = CANDecoderCore()
+
+# Sinais do DBC entram no dicionário do stream binário com ids estáveis
+binary_encoder = BinaryEncoder(
+    ("can", s.name, s.unit)
+    for can_id in sorted(decoder.messages)
+    for s in decoder.messages[can_id].signals
+)
+# Serializa encode + publish: o dicionário precisa chegar antes das amostras
+binary_lock = threading.Lock()
+
+shm_writer = ShmRingWriter(
+    SHM_RING_PATH,
+    slots=SHM_RING_SLOTS,
+    signals=(
+        ("can", s.name, s.unit)
+        for can_id in sorted(decoder.messages)
+        for s in decoder.messages[can_id].signals
+    )
+) if SHM_RING else None
+batch_decoder = BatchDecoder(decoder.messages)
+# Timestamp de recepção do kernel (msg.timestamp) convertido para wallclock
+can_clock = FrameClock()
 sender = CANSender(interface=CAN_INTERFACE)
 
-mcap_logger = McapTelemetryLogger(output_dir="/logs/acquisition")
+mcap_logger = McapTelemetryLogger(
+    output_dir="/logs/acquisition",
+    async_mode=MCAP_ASYNC,
+    queue_size=MCAP_QUEUE_SIZE,
+    rotate_interval_s=MCAP_ROTATE_MINUTES * 60 or None,
+    encodings=MCAP_ENCODINGS,
+    default_encoding=MCAP_ENCODING,
+    split_signals=MCAP_SPLIT_SIGNALS,
+    compression=MCAP_COMPRESSION,
+    chunk_size=MCAP_CHUNK_KB * 1024,
+    clock=wallclock.now_ns
+)
+
+
+def on_clock_source(previous, source):
+    # O arquivo aberto com o relógio do sistema leva o nome com a data errada
+    if previous == SOURCE_SYSTEM:
+        mcap_logger.request_rotation()
+
+
+wallclock.add_listener(on_clock_source)
 
 
 # =========================================================
 # BROADCAST (Low-latency + Safe)
 # =========================================================
 
-def broadcast(payload):
+def broadcast(payload, log=True):
     # --- ISOLADO COM TRY/EXCEPT: Se o logger falhar, não derruba a rede ---
     try:
-        if mcap_logger:
+        if mcap_logger and log:
             mcap_logger.log_payload(payload)
     except Exception as e:
         logging.error(f"Falha catastrófica ao registrar MCAP no broadcast: {e}")
     # ----------------------------------------------------------------------
 
+    if shm_writer:
+        publish_shm(payload)
+
+    # Cada formato só é serializado se houver cliente conectado nele
+    if not fanout.clients and not binary_fanout.clients:
+        return
+
+    if len(fanout.clients) > len(fanout.subscribed):
+        try:
+            raw = (json.dumps(payload, separators=(",", ":")) + "\n").encode()
+        except Exception as e:
+            logging.error(f"JSON encode error: {e}")
+        else:
+            # Serializa uma vez; o envio para cada cliente fica com o writer do fanout
+            fanout.publish(raw)
+
+    json_subscribed = fanout.subscribed
+
+    if not json_subscribed and not binary_fanout.clients:
+        return
+
+    source, signals = payload_signals(payload)
+    if not signals:
+        return
+
+    timestamp_ns = payload.get("timestamp_ns") or wallclock.now_ns()
+
+    # Clientes com subscription: só os sinais pedidos, respeitando a taxa máxima
+    for client in json_subscribed:
+        selected = client.subscription.select(signals, timestamp_ns)
+        if selected:
+            raw = (json.dumps(signals_payload(source, timestamp_ns, selected), separators=(",", ":")) + "\n").encode()
+            fanout.publish_to(client, raw)
+
+    if binary_fanout.clients:
+        publish_binary(((source, signals, timestamp_ns),))
+
+
+def broadcast_can(frames):
+    """
+    broadcast() de frames CAN decodificados (DecodedFrame; um frame ou o
+    lote de um recvmmsg): uma operação por sink e, para cada cliente, os
+    frames concatenados. Os sinks de sinais usam os valores direto; os
+    dicts do payload JSON só são montados para o MCAP (na thread de
+    escrita) e para clientes NDJSON sem subscription.
+    """
+    if not frames:
+        return
+
     try:
-        raw = (json.dumps(payload, separators=(",", ":")) + "\n").encode()
+        if mcap_logger:
+            mcap_logger.log_deferred([(f.timestamp_ns, "can", f.payload) for f in frames])
     except Exception as e:
-        logging.error(f"JSON encode error: {e}")
+        logging.error(f"Falha ao registrar lote no MCAP: {e}")
+
+    if not shm_writer and not fanout.clients and not binary_fanout.clients:
         return
 
-    dead_clients = []
+    entries = [("can", f.signals(), f.timestamp_ns) for f in frames]
 
-    with clients_lock:
-        for c in clients:
-            try:
-                c.sendall(raw)
-            except Exception:
-                dead_clients.append(c)
+    if shm_writer:
+        try:
+            shm_writer.publish_many(entries)
+        except Exception as e:
+            logging.error(f"Shared-memory ring publish error: {e}")
 
-        for d in dead_clients:
-            try:
-                d.close()
-            except:
-                pass
-            clients.remove(d)
+    if len(fanout.clients) > len(fanout.subscribed):
+        try:
+            raw = "".join(json.dumps(f.payload(), separators=(",", ":")) + "\n" for f in frames).encode()
+        except Exception as e:
+            logging.error(f"JSON encode error: {e}")
+        else:
+            fanout.publish(raw)
+
+    for client in fanout.subscribed:
+        lines = []
+        for source, signals, timestamp_ns in entries:
+            selected = client.subscription.select(signals, timestamp_ns)
+            if selected:
+                lines.append(json.dumps(signals_payload(source, timestamp_ns, selected), separators=(",", ":")) + "\n")
+        if lines:
+            fanout.publish_to(client, "".join(lines).encode())
+
+    if binary_fanout.clients:
+        publish_binary(entries)
+
+
+gnss_changes = ChangeFilter(GNSS_KEYFRAME_INTERVAL)
+
+
+def broadcast_gnss(record):
+    """Registro completo no MCAP; para os streams, só os campos alterados."""
+    try:
+        mcap_logger.log_payload(record)
+    except Exception as e:
+        logging.error(f"Falha ao registrar GNSS no MCAP: {e}")
+
+    changes = gnss_changes.filter(record)
+    if changes:
+        broadcast(changes, log=False)
+
+
+def publish_shm(payload):
+
+    try:
+        source, signals = payload_signals(payload)
+        if signals:
+            shm_writer.publish(source, signals, payload.get("timestamp_ns") or wallclock.now_ns())
+    except Exception as e:
+        logging.error(f"Shared-memory ring publish error: {e}")
+
+
+def publish_binary(entries):
+    """entries: [(source, sinais, timestamp_ns)]; um frame por cliente para o lote todo."""
+
+    with binary_lock:
+        try:
+            # Sinais novos vão para o dicionário de todos os clientes binários
+            for source, signals, _ in entries:
+                dictionary = binary_encoder.register(source, signals)
+                if dictionary:
+                    binary_fanout.publish(dictionary, include_subscribed=True)
+
+            if len(binary_fanout.clients) > len(binary_fanout.subscribed):
+                binary_fanout.publish(b"".join(
+                    binary_encoder.encode_signals(signals, timestamp_ns)
+                    for _, signals, timestamp_ns in entries
+                ))
+
+            for client in binary_fanout.subscribed:
+                frames = []
+                for _, signals, timestamp_ns in entries:
+                    selected = client.subscription.select(signals, timestamp_ns)
+                    if selected:
+                        frames.append(binary_encoder.encode_signals(selected, timestamp_ns))
+                if frames:
+                    binary_fanout.publish_to(client, b"".join(frames))
+
+        except Exception as e:
+            logging.error(f"Binary encode error: {e}")
 
 
 # =========================================================
 # CAN CALLBACK
 # =========================================================
 
+def log_raw_can(msg):
+    """Frame sem decodificação: vai só para o MCAP, não para os clientes."""
+    try:
+        mcap_logger.log_payload({
+            "source": "can_raw",
+            "timestamp_ns": can_clock.to_wall_ns(msg.timestamp),
+            "can_id": hex(msg.arbitration_id),
+            "data": bytes(msg.data).hex()
+        })
+    except Exception as e:
+        logging.error(f"Falha ao registrar frame CAN bruto: {e}")
+
+
 def handle_can(msg):
 
-    decoded = decoder.decode(msg)
+    frame = decoder.decode(msg, can_clock.to_wall_ns(msg.timestamp))
 
-    if not decoded:
+    if frame is None:
+        if CAN_RAW_ALL:
+            log_raw_can(msg)
         return
 
-    payload = {
-        "source": "can",
-        "timestamp_ns": time.time_ns(),
-        "can_id": hex(msg.arbitration_id),
-        "signals": decoded
-    }
+    broadcast_can((frame,))
+
+
+def handle_can_batch(frames, timestamps_ns):
+    """Lote do FrameBatchReader: frames na ordem de chegada e timestamps do kernel (ns)."""
+
+    if len(frames) == 0:
+        return
 
-    broadcast(payload)
+    # Um offset de wallclock por lote (o relógio não muda dentro de um recvmmsg)
+    offset_ns = can_clock.offset_ns(int(timestamps_ns[0]))
+
+    decoded, undecoded = batch_decoder.decode(frames, timestamps_ns, offset_ns)
+
+    if CAN_RAW_ALL and undecoded:
+        raw = frames[undecoded]
+        try:
+            mcap_logger.log_payloads([
+                {
+                    "source": "can_raw",
+                    "timestamp_ns": timestamp_ns + offset_ns,
+                    "can_id": hex(can_id & CAN_EFF_MASK),
+                    "data": bytes(data[:dlc]).hex()
+                }
+                for can_id, dlc, data, timestamp_ns in zip(
+                    raw["can_id"].tolist(), raw["dlc"].tolist(),
+                    raw["data"], timestamps_ns[undecoded].tolist()
+                )
+            ])
+        except Exception as e:
+            logging.error(f"Falha ao registrar frames CAN brutos: {e}")
+
+    broadcast_can(decoded)
 
 
 # =========================================================
@@ -116,20 +429,76 @@ def start_rx_server():
         sock.bind(("0.0.0.0", RX_PORT))
         sock.listen(10)
 
-        logging.info(f"JSON telemetry stream available on port {RX_PORT}")
+        logging.info(f"Telemetry stream (NDJSON/binary) available on port {RX_PORT}")
 
         while True:
             conn, addr = sock.accept()
             conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
 
-            logging.info(f"Telemetry client connected: {addr}")
-
-            with clients_lock:
-                clients.append(conn)
+            threading.Thread(
+                target=negotiate_rx_client,
+                args=(conn, addr),
+                daemon=True
+            ).start()
 
     threading.Thread(target=server, daemon=True).start()
 
 
+def negotiate_rx_client(conn, addr):
+    """
+    Lê a linha de hello (formato e subscription, ver stream_protocol);
+    sem hello o cliente recebe NDJSON com todos os sinais.
+    """
+    hello = b""
+
+    try:
+        conn.settimeout(RX_HELLO_TIMEOUT)
+        while not hello.endswith(b"\n") and len(hello) < MAX_HELLO:
+            chunk = conn.recv(MAX_HELLO - len(hello))
+            if not chunk:
+                conn.close()
+                return
+            hello += chunk
+    except socket.timeout:
+        pass
+    except OSError as e:
+        logging.error(f"Telemetry client {addr} handshake error: {e}")
+        conn.close()
+        return
+
+    binary, subscription = False, None
+
+    if hello:
+        try:
+            binary, subscription = parse_hello(hello)
+        except ValueError as e:
+            logging.warning(f"Telemetry client {addr} sent invalid hello {hello[:80]!r} ({e}), using NDJSON")
+        else:
+            try:
+                conn.sendall(HELLO_OK if binary else NDJSON_OK)
+            except OSError as e:
+                logging.error(f"Telemetry client {addr} handshake error: {e}")
+                conn.close()
+                return
+
+    detail = f" topics={subscription.topics} max_rate_hz={subscription.max_rate_hz}" if subscription else ""
+
+    if binary:
+        logging.info(f"Telemetry client connected (binary{detail}): {addr}")
+
+        # Dicionário e registro do cliente sob o mesmo lock do encode
+        with binary_lock:
+            binary_fanout.add_client(
+                conn, addr,
+                greeting=binary_encoder.dictionary_frame(),
+                subscription=subscription
+            )
+        return
+
+    logging.info(f"Telemetry client connected (NDJSON{detail}): {addr}")
+    fanout.add_client(conn, addr, subscription=subscription)
+
+
 # =========================================================
 # TX SERVER (CAN command input)
 # =========================================================
@@ -195,6 +564,12 @@ def handle_tx_client(conn):
 # MAIN
 # =========================================================
 
+def handle_sigterm(signum, frame):
+    # docker stop manda SIGTERM: sem isso o processo morre sem o finally,
+    # com registros na fila do MCAP e o arquivo sem fechar
+    raise KeyboardInterrupt
+
+
 def main():
 
     logging.info("Starting Acquisition Gateway")
@@ -203,32 +578,73 @@ def main():
     sender.connect()
 
     # Start network servers
+    fanout.start()
+    binary_fanout.start()
     start_rx_server()
     start_tx_server()
 
     # ============================
     # 200 Hz IMU
     # ============================
-    start_imu(callback=broadcast, rate_hz=200)
+    start_imu(
+        callback=broadcast,
+        rate_hz=200,
+        quaternion=IMU_QUATERNION,
+        lpf_cutoff_hz=IMU_LPF_CUTOFF,
+        lpf_order=IMU_LPF_ORDER,
+        lpf_cutoffs=IMU_LPF_CUTOFFS,
+        int_gpio=parse_gpio(IMU_INT_GPIO),
+        int_edge=IMU_INT_EDGE,
+        stats_interval=IMU_STATS_INTERVAL,
+        calibration_path=IMU_CALIBRATION_PATH or None
+    )
 
     # ============================
     # 10 Hz GNSS (UBX NAV-PVT)
     # ============================
-    start_gnss(callback=broadcast)
+    save_gnss_assistance = start_gnss(
+        callback=broadcast_gnss if GNSS_CHANGES_ONLY else broadcast,
+        port=GNSS_PORT,
+        baudrate=GNSS_BAUDRATE,
+        initial_baudrate=GNSS_INITIAL_BAUDRATE,
+        rate_hz=GNSS_RATE_HZ,
+        assistnow_token=UBLOX_TOKEN,
+        clock=wallclock,
+        assist_path=GNSS_ASSIST_PATH or None,
+        offline_path=GNSS_ASSIST_OFFLINE_PATH or None,
+        assist_save_interval=GNSS_ASSIST_SAVE_INTERVAL
+    )
+
+    pps = parse_gpio(GNSS_PPS_GPIO)
+    if pps:
+        start_pps(*pps, clock=wallclock, edge=GNSS_PPS_EDGE)
 
     # ============================
     # CAN RX (blocking loop)
     # ============================
-    receiver = CANReceiver(interface=CAN_INTERFACE)
+    # Filtros do kernel a partir dos IDs do DBC ativo
+    can_ids = None if CAN_RAW_ALL else decoder.messages.keys()
+    receiver = CANReceiver(interface=CAN_INTERFACE, can_ids=can_ids)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
 
     try:
         logging.info("Iniciando loop de recepção CAN...")
-        receiver.start_receiving(handle_can)
+        if CAN_BATCH:
+            receiver.start_receiving_batches(handle_can_batch, max_batch=CAN_MAX_BATCH)
+        else:
+            receiver.start_receiving(handle_can)
     except KeyboardInterrupt:
-        logging.info("Desligamento solicitado (KeyboardInterrupt).")
+        logging.info("Desligamento solicitado (SIGINT/SIGTERM).")
     except Exception as e:
         logging.error(f"Erro fatal na aquisição: {e}")
     finally:
+        # Um segundo SIGTERM não interrompe o shutdown
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        fanout.stop()
+        binary_fanout.stop()
+        # Próximo boot com efemérides/almanaque do receptor
+        save_gnss_assistance()
         logging.info("Executando shutdown limpo do logger MCAP...")
         if mcap_logger:
             mcap_logger.close()
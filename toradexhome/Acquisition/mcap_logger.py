@@ -1,47 +1,176 @@
 import time
 import json
 from pathlib import Path
-from mcap.writer import Writer
+from mcap.writer import Writer, CompressionType
 import logging
 import threading  # <-- ADICIONADO para resolver a condição de corrida
+import queue as queue_mod
+from collections import deque
+
+from stream_protocol import payload_signals, source_from_name
+from mcap_schemas import (
+    TypedEncoder,
+    SIGNAL_SCHEMA,
+    SIGNAL_JSON_SCHEMA,
+    SCHEMA_ENCODING,
+    MESSAGE_ENCODING,
+)
+
+
+class _CountingStream:
+    """Repassa as escritas ao arquivo contando os bytes (evita stat() por mensagem)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        n = self.stream.write(data)
+        self.bytes_written += len(data)
+        return n
+
+    def tell(self):
+        return self.bytes_written
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+# O Writer do mcap comprime cada chunk com zstandard.compress() /
+# lz4.frame.compress() sem expor o nível: zstd sai no nível padrão da
+# biblioteca (3) e lz4 no modo rápido. Só o tipo e o tamanho do chunk são
+# configuráveis.
+COMPRESSION_TYPES = {
+    "zstd": CompressionType.ZSTD,
+    "lz4": CompressionType.LZ4,
+    "none": CompressionType.NONE,
+}
+
+
+def _file_order(path):
+    """Ordem numérica de telemetria_<epoch>[_n].mcap (o epoch muda de número
+    de dígitos quando o relógio passa da data do boot para a hora GNSS)."""
+    try:
+        return tuple(int(part) for part in path.stem.split("_")[1:])
+    except ValueError:
+        return (0,)
+
 
 class McapTelemetryLogger:
-    def __init__(self, output_dir="/logs", max_file_size_mb=10, max_files=20):
+    def __init__(self, output_dir="/logs", max_file_size_mb=10, max_files=20,
+                 async_mode=False, queue_size=65536, flush_interval=0.05,
+                 max_records=None, rotate_interval_s=None, on_rotate=None,
+                 encodings=None, default_encoding="json", split_signals=False,
+                 compression="zstd", chunk_size=1024 * 64,
+                 clock=time.time_ns):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
         self.max_file_size = max_file_size_mb * 1024 * 1024
         self.max_files = max_files
-        
+
+        # Compressão dos chunks: "zstd", "lz4" ou "none"
+        if compression not in COMPRESSION_TYPES:
+            raise ValueError(f"Compressão MCAP inválida: {compression}")
+        self.compression = compression
+        self.chunk_size = chunk_size
+
+        # Critérios extras de rotação (opcionais) e hook de arquivo finalizado
+        self.max_records = max_records
+        self.rotate_interval_s = rotate_interval_s
+        self.on_rotate = on_rotate
+        self.rotation_requested = False
+        self.file_records = 0
+        self.file_opened_at = 0.0
+        self.finished_files = queue_mod.Queue()
+        self.rotate_thread = None
+
         self.current_file = None
         self.writer = None
         self.mcap_file_stream = None
         
         self.schemas = {}
         self.channels = {}
-        
+
+        # Codificação por source: "json" (padrão) ou "cdr" (ros2msg tipado)
+        self.encodings = encodings or {}
+        self.default_encoding = default_encoding
+        self.encoder = TypedEncoder()
+
+        # Um canal por sinal (/BMS1/pack_current) em vez de um por source.
+        # Sequências por canal seguem monotônicas entre rotações de arquivo.
+        self.split_signals = split_signals
+        self.sequences = {}
+
+        # Relógio (ns) do nome dos arquivos e de payloads sem timestamp_ns;
+        # no gateway é o WallClock disciplinado pelo GNSS
+        self.clock = clock
+
         # Trava para garantir exclusão mútua entre IMU, GPS e CAN
         self.lock = threading.Lock()  # <-- ADICIONADO
-        
+
+        # Modo assíncrono: produtores só fazem append no ring buffer,
+        # uma única thread escreve no MCAP em lotes.
+        self.async_mode = async_mode
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.wakeup = threading.Event()
+        # Fila até a metade: acorda o writer antes do flush_interval
+        self.high_water = max(1, queue_size // 2)
+        # Produtores (IMU, GPS, CAN) em threads diferentes: descarte, append
+        # e contadores sob esta trava (curta; o writer não a usa no popleft)
+        self.push_lock = threading.Lock()
+        self.running = False
+        self.writer_thread = None
+
+        self.pushed = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.reported_drops = 0
+
         self._rotate_file()
 
+        if self.async_mode:
+            self.running = True
+            self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self.writer_thread.start()
+
     def _rotate_file(self):
         """Fecha o arquivo atual, rotaciona e abre um novo. (Chamado internamente com lock)"""
         self.close_internal()
         
-        files = sorted(self.output_dir.glob("telemetria_*.mcap"))
+        files = sorted(self.output_dir.glob("telemetria_*.mcap"), key=_file_order)
         while len(files) >= self.max_files:
             files[0].unlink()
-            files = sorted(self.output_dir.glob("telemetria_*.mcap"))
+            files = sorted(self.output_dir.glob("telemetria_*.mcap"), key=_file_order)
             
-        timestamp = int(time.time())
+        timestamp = self.clock() // 1_000_000_000
         filename = self.output_dir / f"telemetria_{timestamp}.mcap"
+
+        # Rotação por registros/tempo pode abrir dois arquivos no mesmo segundo
+        suffix = 1
+        while filename.exists():
+            filename = self.output_dir / f"telemetria_{timestamp}_{suffix}.mcap"
+            suffix += 1
         
-        self.mcap_file_stream = open(filename, "wb")
-        self.writer = Writer(self.mcap_file_stream, chunk_size=1024 * 64)
+        self.mcap_file_stream = _CountingStream(open(filename, "wb"))
+        self.writer = Writer(
+            self.mcap_file_stream,
+            chunk_size=self.chunk_size,
+            compression=COMPRESSION_TYPES[self.compression]
+        )
         self.writer.start()
-        
+
         self.current_file = filename
+        self.file_records = 0
+        self.rotation_requested = False
+        self.file_opened_at = time.monotonic()
         self.schemas = {}
         self.channels = {}
         logging.info(f"Novo arquivo MCAP iniciado: {filename}")
@@ -65,33 +194,306 @@ class McapTelemetryLogger:
             
         return self.channels[source]
 
+    def _get_or_create_typed_channel(self, key, schema):
+        """Registra schema ros2msg e canal CDR. Sempre executado dentro do bloco de lock."""
+        # O schema entra na chave: {"n","v"} e registro agrupado do mesmo
+        # source (ex.: gps) são canais diferentes
+        channel_key = ("cdr", key, schema.name)
+
+        if channel_key not in self.channels:
+            schema_id = self.schemas.get(schema.name)
+            if schema_id is None:
+                schema_id = self.writer.register_schema(
+                    name=schema.name,
+                    encoding=SCHEMA_ENCODING,
+                    data=schema.definition
+                )
+                self.schemas[schema.name] = schema_id
+
+            self.channels[channel_key] = self.writer.register_channel(
+                topic=f"/veiculo/{key}",
+                message_encoding=MESSAGE_ENCODING,
+                schema_id=schema_id
+            )
+
+        return self.channels[channel_key]
+
+    def _get_or_create_signal_channel(self, name, unit, cdr):
+        """Canal de um único sinal, com o tópico igual ao nome do sinal."""
+        channel_key = ("signal", name)
+
+        if channel_key not in self.channels:
+            schema = SIGNAL_SCHEMA if cdr else None
+            schema_name = SIGNAL_SCHEMA.name if cdr else "signal_schema"
+
+            schema_id = self.schemas.get(schema_name)
+            if schema_id is None:
+                schema_id = self.writer.register_schema(
+                    name=schema_name,
+                    encoding=SCHEMA_ENCODING if cdr else "jsonschema",
+                    data=schema.definition if cdr else SIGNAL_JSON_SCHEMA
+                )
+                self.schemas[schema_name] = schema_id
+
+            self.channels[channel_key] = self.writer.register_channel(
+                topic=name if name.startswith("/") else f"/{name}",
+                message_encoding=MESSAGE_ENCODING if cdr else "json",
+                schema_id=schema_id,
+                metadata={"unit": unit} if unit else {}
+            )
+
+        return self.channels[channel_key]
+
+    def _encode(self, source, payload):
+        """Retorna [(chave_do_canal, channel_id, bytes)] conforme a codificação do source."""
+        if self.split_signals:
+            return self._encode_signals(source, payload)
+
+        if self.encodings.get(source, self.default_encoding) == "cdr":
+            typed = self.encoder.encode(source, payload)
+            if typed is not None:
+                key, schema, data = typed
+                return [(("cdr", key, schema.name), self._get_or_create_typed_channel(key, schema), data)]
+
+            # Formato sem schema tipado: mantém JSON num tópico separado
+            source = f"{source}/json"
+
+        channel_id = self._get_or_create_channel(source)
+        return [(source, channel_id, json.dumps(payload, separators=(",", ":")).encode('utf-8'))]
+
+    def _encode_signals(self, source, payload):
+        """Quebra o payload em uma mensagem por sinal numérico."""
+        cdr = self.encodings.get(source, self.default_encoding) == "cdr"
+        messages = []
+
+        # Mesma divisão em sinais do stream da porta 7000
+        _, signals = payload_signals(payload)
+        for name, value, unit in signals:
+            channel_id = self._get_or_create_signal_channel(name, unit, cdr)
+
+            if cdr:
+                data = SIGNAL_SCHEMA.encode((value,))
+            else:
+                data = json.dumps({"value": value}, separators=(",", ":")).encode('utf-8')
+
+            messages.append((("signal", name), channel_id, data))
+
+        return messages
+
     def log_payload(self, payload):
         """Recebe o payload de forma thread-safe."""
+        now_ns = payload.get("timestamp_ns") or self.clock()
+        source = payload.get("source") or source_from_name(payload.get("n"))
+
+        if self.async_mode and self.running:
+            self._push(now_ns, source, payload)
+            return
+
         # Adquire a trava. Se outra thread estiver escrevendo, esta aguarda sua vez
-        with self.lock:  
-            if not self.writer:
-                return
+        with self.lock:
+            self._write_message(now_ns, source, payload)
 
-            try:
-                now_ns = payload.get("timestamp_ns", time.time_ns())
-                source = payload.get("source", "unknown")
+    def log_payloads(self, payloads):
+        """Lote de payloads com timestamp (ex.: um recvmmsg de CAN) numa operação só."""
+        entries = [
+            (payload["timestamp_ns"], payload.get("source") or source_from_name(payload.get("n")), payload)
+            for payload in payloads
+        ]
+
+        if self.async_mode and self.running:
+            self._push_many(entries)
+            return
+
+        with self.lock:
+            for entry in entries:
+                self._write_message(*entry)
+
+    def log_deferred(self, entries):
+        """
+        Lote de (timestamp_ns, source, build): build() monta o payload só
+        na hora de gravar, na thread de escrita do modo assíncrono (ex.:
+        DecodedFrame.payload, que cria os dicts dos sinais CAN).
+        """
+        if self.async_mode and self.running:
+            self._push_many(entries)
+            return
+
+        with self.lock:
+            for now_ns, source, build in entries:
+                self._write_message(now_ns, source, build())
 
-                channel_id = self._get_or_create_channel(source)
-                data_bytes = json.dumps(payload, separators=(",", ":")).encode('utf-8')
+    def _write_message(self, now_ns, source, payload):
+        """Escreve uma mensagem no arquivo atual. Chamado com lock."""
+        if not self.writer:
+            return
+
+        try:
+            sequences = self.sequences
+
+            for channel_key, channel_id, data_bytes in self._encode(source, payload):
+                sequence = sequences.get(channel_key, 0) + 1
+                sequences[channel_key] = sequence
 
                 self.writer.add_message(
                     channel_id=channel_id,
                     log_time=now_ns,
                     publish_time=now_ns,
-                    sequence=0,
+                    sequence=sequence,
                     data=data_bytes
                 )
+                self.file_records += 1
+
+            self.written += 1
+
+            if self._should_rotate():
+                self._rotate_file()
+        except Exception as e:
+            # Evita que uma falha no log quebre o broadcast da rede
+            logging.error(f"Erro interno no McapLogger: {e}")
+
+    def _should_rotate(self):
+        """Decide a rotação pelos contadores em memória, sem syscall de stat()."""
+        if self.rotation_requested:
+            return True
+
+        if self.mcap_file_stream.bytes_written >= self.max_file_size:
+            return True
+
+        if self.max_records and self.file_records >= self.max_records:
+            return True
+
+        if self.rotate_interval_s and time.monotonic() - self.file_opened_at >= self.rotate_interval_s:
+            return True
+
+        return False
+
+    def request_rotation(self):
+        """Fecha o arquivo atual na próxima mensagem (ex.: o relógio ganhou hora GNSS)."""
+        self.rotation_requested = True
+
+    # =========================================================
+    # HOOK DE ROTAÇÃO (executado fora do writer)
+    # =========================================================
+
+    def _hand_off(self, path):
+        """Entrega o arquivo finalizado ao callback numa thread separada."""
+        if not self.on_rotate:
+            return
+
+        if self.rotate_thread is None:
+            self.rotate_thread = threading.Thread(target=self._rotate_worker, daemon=True)
+            self.rotate_thread.start()
 
-                if self.current_file.stat().st_size >= self.max_file_size:
-                    self._rotate_file()
+        self.finished_files.put(path)
+
+    def _rotate_worker(self):
+        while True:
+            path = self.finished_files.get()
+            if path is None:
+                break
+
+            try:
+                self.on_rotate(path)
             except Exception as e:
-                # Evita que uma falha no log quebre o broadcast da rede
-                logging.error(f"Erro interno no McapLogger: {e}")
+                logging.error(f"Erro no callback de rotação ({path}): {e}")
+
+    # =========================================================
+    # MODO ASSÍNCRONO (ring buffer + writer thread)
+    # =========================================================
+
+    def _push(self, now_ns, source, payload):
+        """Caminho do produtor: um append no deque e os contadores, sob push_lock."""
+        queue = self.queue
+
+        with self.push_lock:
+            if len(queue) >= self.queue_size:
+                # Backpressure: descarta o mais antigo para não bloquear o produtor
+                try:
+                    queue.popleft()
+                    self.dropped += 1
+                except IndexError:
+                    pass
+
+            queue.append((now_ns, source, payload))
+            self.pushed += 1
+
+            depth = len(queue)
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+        if depth == self.high_water:
+            self.wakeup.set()
+
+    def _push_many(self, entries):
+        """Como _push(), com um único extend no deque para o lote inteiro."""
+        queue = self.queue
+
+        with self.push_lock:
+            before = len(queue)
+            excess = before + len(entries) - self.queue_size
+            for _ in range(excess):
+                try:
+                    queue.popleft()
+                    self.dropped += 1
+                except IndexError:
+                    break
+
+            queue.extend(entries)
+            self.pushed += len(entries)
+
+            depth = len(queue)
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+        if before < self.high_water <= depth:
+            self.wakeup.set()
+
+    def _writer_loop(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self._drain()
+
+            if self.dropped != self.reported_drops:
+                logging.warning(f"McapLogger backpressure: {self.stats()}")
+                self.reported_drops = self.dropped
+
+        # Flush final garantido: esvazia o que sobrou antes do close()
+        self._drain()
+
+    def _drain(self):
+        """Escreve em lote tudo o que estiver na fila."""
+        queue = self.queue
+        if not queue:
+            return
+
+        with self.lock:
+            count = 0
+            while True:
+                try:
+                    now_ns, source, payload = queue.popleft()
+                except IndexError:
+                    break
+                if callable(payload):
+                    # Entrada de log_deferred()
+                    payload = payload()
+                self._write_message(now_ns, source, payload)
+                count += 1
+
+            if count:
+                self.batches += 1
+
+    def stats(self):
+        """Estatísticas de backpressure do modo assíncrono."""
+        with self.push_lock:
+            return {
+                "depth": len(self.queue),
+                "max_depth": self.max_depth,
+                "pushed": self.pushed,
+                "written": self.written,
+                "dropped": self.dropped,
+                "batches": self.batches,
+            }
 
     def close_internal(self):
         """Fecha os streams sem travar (uso interno)."""
@@ -108,7 +510,22 @@ class McapTelemetryLogger:
                 pass
             self.mcap_file_stream = None
 
+            if self.current_file:
+                self._hand_off(self.current_file)
+
     def close(self):
         """Fecha o logger externamente de forma segura."""
+        if self.writer_thread:
+            self.running = False
+            self.wakeup.set()
+            self.writer_thread.join()
+            self.writer_thread = None
+
         with self.lock:
-            self.close_internal()
\ No newline at end of file
+            self.close_internal()
+            self.current_file = None
+
+        if self.rotate_thread:
+            self.finished_files.put(None)
+            self.rotate_thread.join(timeout=5.0)
+            self.rotate_thread = None
@@ -0,0 +1,217 @@
+import math
+import struct
+
+
+# =========================================================
+# ROS2MSG + CDR (little endian)
+# =========================================================
+#
+# Foxglove decodifica "ros2msg"/"cdr" nativamente. Como todas as nossas
+# mensagens têm layout fixo, cada schema vira um único struct.Struct
+# pré-compilado (com o padding de alinhamento do CDR).
+
+CDR_LE_HEADER = b"\x00\x01\x00\x00"
+
+SCHEMA_ENCODING = "ros2msg"
+MESSAGE_ENCODING = "cdr"
+
+ROS_PRIMITIVES = {
+    "bool": ("?", 1),
+    "uint8": ("B", 1),
+    "int8": ("b", 1),
+    "uint16": ("H", 2),
+    "int16": ("h", 2),
+    "uint32": ("I", 4),
+    "int32": ("i", 4),
+    "uint64": ("Q", 8),
+    "int64": ("q", 8),
+    "float32": ("f", 4),
+    "float64": ("d", 8),
+}
+
+
+class StructSchema:
+    """ros2msg de campos primitivos, serializado com um único struct.pack."""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+        fmt = "<"
+        offset = 0
+        defaults = []
+
+        for ros_type, _ in fields:
+            code, size = ROS_PRIMITIVES[ros_type]
+            pad = -offset % size
+            fmt += "x" * pad + code
+            offset += pad + size
+            defaults.append(math.nan if ros_type.startswith("float") else 0)
+
+        self.struct = struct.Struct(fmt)
+        self.defaults = defaults
+        self.keys = [name for _, name in fields]
+        self.definition = "\n".join(f"{t} {n}" for t, n in fields).encode()
+
+    def encode(self, values):
+        return CDR_LE_HEADER + self.struct.pack(*values)
+
+    def encode_record(self, record):
+        """Codifica um dict plano; campos ausentes/None viram NaN ou 0."""
+        values = []
+        for key, default in zip(self.keys, self.defaults):
+            v = record.get(key)
+            values.append(default if v is None else v)
+        return self.encode(values)
+
+
+class ScalarSchema:
+    """Par nome/valor, usado pelas mensagens {"n", "v"} do IMU e GNSS."""
+
+    name = "tupa_msgs/msg/Scalar"
+    definition = b"string name\nfloat64 value"
+
+    _len = struct.Struct("<I")
+    _value = struct.Struct("<d")
+
+    def encode(self, name, value):
+        raw = name.encode() + b"\0"
+        pad = -(4 + len(raw)) % 8
+        if value is None:
+            value = math.nan
+        return (
+            CDR_LE_HEADER
+            + self._len.pack(len(raw))
+            + raw
+            + b"\0" * pad
+            + self._value.pack(value)
+        )
+
+
+# =========================================================
+# SCHEMAS DO VEÍCULO
+# =========================================================
+
+SCALAR_SCHEMA = ScalarSchema()
+
+# Canal por sinal: o nome vai no tópico e a unidade no metadata do canal
+SIGNAL_SCHEMA = StructSchema("tupa_msgs/msg/Signal", [
+    ("float64", "value"),
+])
+
+SIGNAL_JSON_SCHEMA = (
+    b'{"type": "object", "properties": {"value": {"type": "number"}}, "required": ["value"]}'
+)
+
+IMU_SAMPLE_SCHEMA = StructSchema("tupa_msgs/msg/ImuSample", [
+    ("float64", "yaw"),
+    ("float64", "roll"),
+    ("float64", "pitch"),
+    ("float64", "gyro_x"),
+    ("float64", "gyro_y"),
+    ("float64", "gyro_z"),
+    ("float64", "lin_accel_x"),
+    ("float64", "lin_accel_y"),
+    ("float64", "lin_accel_z"),
+    ("uint8", "calib_sys"),
+    ("uint8", "calib_gyro"),
+    ("uint8", "calib_accel"),
+    ("uint8", "calib_mag"),
+    # 0 = calibrando, 1 = perfil restaurado, 2 = calibrado (bno055.CALIB_STATE_*)
+    ("uint8", "calib_state"),
+    # Só com IMU_QUATERNION=1; ausentes viram NaN
+    ("float64", "quat_w"),
+    ("float64", "quat_x"),
+    ("float64", "quat_y"),
+    ("float64", "quat_z"),
+    ("float64", "gravity_x"),
+    ("float64", "gravity_y"),
+    ("float64", "gravity_z"),
+])
+
+GNSS_FIX_SCHEMA = StructSchema("tupa_msgs/msg/GnssFix", [
+    ("float64", "latitude"),
+    ("float64", "longitude"),
+    ("float64", "altitude"),
+    ("float64", "speed"),
+    ("float64", "heading"),
+    ("uint8", "fix"),
+    ("uint8", "satellites"),
+    ("float64", "h_acc"),
+    ("float64", "v_acc"),
+    ("float64", "s_acc"),
+])
+
+# Registros agrupados (um dict plano por amostra) por source
+RECORD_SCHEMAS = {
+    "imu": IMU_SAMPLE_SCHEMA,
+    "gps": GNSS_FIX_SCHEMA,
+}
+
+
+def _field_name(signal_name):
+    """'/BMS1/pack_current' -> 'pack_current' (identificador válido em ros2msg)."""
+    field = signal_name.rsplit("/", 1)[-1].lower()
+    field = "".join(c if c.isalnum() else "_" for c in field)
+    if not field or not field[0].isalpha():
+        field = "s_" + field
+    return field
+
+
+def can_frame_schema(can_id, signals):
+    """Schema de um ID CAN a partir da lista de sinais decodificados."""
+    fields = [("uint32", "can_id")]
+    used = set()
+
+    for s in signals:
+        field = _field_name(s["name"])
+        while field in used:
+            field += "_"
+        used.add(field)
+        fields.append(("float64", field))
+
+    return StructSchema(f"tupa_msgs/msg/Can{can_id:03X}", fields)
+
+
+# =========================================================
+# ENCODER (payload -> canal tipado)
+# =========================================================
+
+class TypedEncoder:
+    """
+    Escolhe schema e serializa um payload do gateway em CDR.
+    encode() retorna (chave_do_canal, schema, bytes) ou None quando
+    não há schema tipado para o formato recebido.
+    """
+
+    def __init__(self):
+        self.can_schemas = {}
+
+    def encode(self, source, payload):
+        if "n" in payload and "v" in payload:
+            value = payload["v"]
+            if value is not None and not isinstance(value, (int, float)):
+                return None
+            return (source, SCALAR_SCHEMA, SCALAR_SCHEMA.encode(payload["n"], value))
+
+        if source == "can":
+            can_id = int(payload["can_id"], 16)
+            signals = payload["signals"]
+
+            schema = self.can_schemas.get(can_id)
+            if schema is None:
+                schema = can_frame_schema(can_id, signals)
+                self.can_schemas[can_id] = schema
+
+            values = [can_id]
+            for s in signals:
+                v = s["value"]
+                values.append(math.nan if v is None else v)
+
+            return (f"can/{payload['can_id']}", schema, schema.encode(values))
+
+        schema = RECORD_SCHEMAS.get(source)
+        if schema is not None:
+            return (source, schema, schema.encode_record(payload))
+
+        return None
@@ -1,144 +1,402 @@
+import os
 import serial
+import requests
 import threading
 import time
 import logging
 
+import ubx
+from timebase import SOURCE_SYSTEM, wallclock
+
 logger = logging.getLogger("NEO-M8N")
 logging.basicConfig(level=logging.INFO)
 
 SERIAL_PORT = "/dev/ttymxc2"   # UART2
-BAUDRATE = 9600
+BAUDRATE = 115200
+INITIAL_BAUDRATE = 9600        # padrão de fábrica do NEO-M8N
+RATE_HZ = 10
+
+# Sem NAV-PVT nesse intervalo, reabre a serial e reconfigura o módulo
+# (ex.: o receptor reiniciou e voltou para 9600/NMEA)
+STALL_TIMEOUT = 5.0
+
+# Intervalo mínimo entre avisos de frames corrompidos na serial
+SCANNER_REPORT_INTERVAL = 10.0
+
+# Banco de navegação (MGA-DBD) salvo periodicamente com fix, para o
+# próximo boot partir com efemérides/almanaque (queda de energia não
+# passa pelo shutdown)
+ASSIST_SAVE_INTERVAL = 300.0
+# A resposta ao poll do MGA-DBD não tem fim explícito: termina quando
+# os frames param de chegar
+DBD_QUIET_TIME = 1.0
+DBD_TIMEOUT = 3.0
+# Intervalo entre mensagens MGA enviadas (o receptor processa a
+# assistência mais devagar do que a UART entrega)
+MGA_PACING = 0.005
+# Precisão declarada da hora enviada com a assistência
+ASSIST_TIME_ACCURACY_S = 2
+
+ASSISTNOW_URL = (
+    "https://online-live1.services.u-blox.com/GetOnlineData.ashx"
+    "?token={token};gnss=gps,gal,bds,glo"
+)
 
 
 # =========================================================
-# NMEA PARSER
+# CONFIGURAÇÃO DO RECEPTOR
 # =========================================================
 
-def parse_latlon(value, direction):
-    if not value or not direction:
-        return None
+def _receiving(ser, timeout):
+    """True se chega UBX ou NMEA válido na baudrate atual dentro do timeout."""
+    deadline = time.monotonic() + timeout
+    data = bytearray()
+    while time.monotonic() < deadline:
+        data += ser.read(256)
+        if ubx.SYNC in data or b"$G" in data:
+            return True
+    return False
+
+
+def open_receiver(port, baudrate, initial_baudrate, rate_hz):
+    """
+    Abre a serial na baudrate alvo. Se o módulo ainda está na baudrate de
+    fábrica, troca a UART dele primeiro; depois configura saída só UBX,
+    taxa de navegação e NAV-PVT a cada solução.
+    """
+    ser = serial.Serial(port, baudrate, timeout=0.1)
+
+    if not _receiving(ser, 1.5):
+        ser.close()
+        logger.info(f"No data at {baudrate} baud, switching receiver from {initial_baudrate}")
+
+        with serial.Serial(port, initial_baudrate, timeout=0.1) as slow:
+            slow.write(ubx.cfg_prt_uart(baudrate))
+            slow.flush()
+            # O módulo troca a baudrate depois de transmitir o ACK
+            time.sleep(0.2)
+
+        ser = serial.Serial(port, baudrate, timeout=0.1)
+
+    ser.write(ubx.cfg_prt_uart(baudrate))
+    ser.write(ubx.cfg_rate(rate_hz))
+    ser.write(ubx.cfg_msg(ubx.CLASS_NAV, ubx.NAV_PVT, 1))
+    ser.flush()
+
+    logger.info(f"GNSS on {port} @ {baudrate}: UBX NAV-PVT at {rate_hz} Hz")
+    return ser
+
+
+class AssistStore:
+    """
+    Dados de assistência em arquivo .ubx (frames UBX-MGA crus): o banco de
+    navegação do receptor (MGA-DBD) salvo pelo gateway ou um arquivo
+    AssistNow Offline/Autonomous baixado antes (ex.: mgaoffline.ubx).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Frames MGA válidos do arquivo (lista vazia se não existe)."""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return []
+        except OSError as e:
+            logger.warning(f"Cannot read GNSS assistance file {self.path}: {e}")
+            return []
+
+        scanner = ubx.FrameScanner()
+        with f:
+            frames = [
+                ubx.build_frame(frame.cls, frame.msg_id, frame.payload)
+                for frame in ubx.scan_stream(f, scanner)
+                if frame.kind == ubx.KIND_UBX and frame.cls == ubx.CLASS_MGA
+            ]
+
+        if scanner.bad_checksum or scanner.bad_length:
+            logger.warning(f"Corrupted frames in GNSS assistance file {self.path}: {scanner.stats()}")
+        return frames
+
+    def save(self, frames):
+        # Arquivo temporário + rename: queda de energia não deixa o banco pela metade
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for frame in frames:
+                f.write(frame)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def save_database(store, frames):
+    """
+    Grava a resposta do poll MGA-DBD; True se gravou (falha de disco não
+    derruba a serial).
+    """
+    if not frames:
+        logger.warning("Receiver did not answer the MGA-DBD poll, navigation database not saved")
+        return False
 
     try:
-        deg_len = 2 if direction in ("N", "S") else 3
-
-        degrees = float(value[:deg_len])
-        minutes = float(value[deg_len:])
-
-        decimal = degrees + minutes / 60.0
-
-        if direction in ("S", "W"):
-            decimal = -decimal
-
-        return decimal
+        store.save(frames)
+    except OSError as e:
+        logger.error(f"Cannot save GNSS navigation database to {store.path}: {e}")
+        return False
 
-    except:
-        return None
+    logger.info(f"GNSS navigation database saved ({len(frames)} messages)")
+    return True
 
 
-# =========================================================
-# GNSS THREAD
-# =========================================================
-
-def start(callback):
-
-    def loop():
-
-        while True:
-            try:
-                logger.info(f"Opening {SERIAL_PORT} @ {BAUDRATE}")
-
-                ser = serial.Serial(
-                    SERIAL_PORT,
-                    BAUDRATE,
-                    timeout=1
-                )
-
-                buffer = ""
-
-                current_data = {
-                    "latitude": None,
-                    "longitude": None,
-                    "altitude": None,
-                    "speed": 0.0,
-                    "heading": 0.0,
-                    "satellites": 0,
-                    "fix": 0
-                }
-
-                while True:
-                    data = ser.read(256).decode(errors="ignore")
-
-                    if not data:
-                        continue
+def send_assistance(ser, frames, clock=None):
+    """
+    Envia frames MGA ao receptor. Com o clock já disciplinado pelo GNSS
+    (reconexão) manda antes a hora UTC; no boot a hora do sistema não é
+    confiável e o receptor tira a hora do primeiro satélite.
+    """
+    if clock is not None and clock.source != SOURCE_SYSTEM:
+        ser.write(ubx.mga_ini_time_utc(clock.now_ns(), ASSIST_TIME_ACCURACY_S))
 
-                    buffer += data
+    for frame in frames:
+        ser.write(frame)
+        time.sleep(MGA_PACING)
+    ser.flush()
 
-                    while "\n" in buffer:
 
-                        line, buffer = buffer.split("\n", 1)
-                        line = line.strip()
-
-                        dado_atualizado = False
-
-                        # DEBUG RAW DATA
-                        print("RAW:", line)
+def send_assistnow_online(ser, token):
+    """Baixa o AssistNow Online (A-GNSS) e repassa ao receptor."""
+    try:
+        r = requests.get(ASSISTNOW_URL.format(token=token), timeout=10)
+    except requests.RequestException as e:
+        logger.warning(f"AssistNow download failed: {e}")
+        return
 
-                        # ---------------------------
-                        # GGA → posição
-                        # ---------------------------
-                        if line.startswith("$GNGGA") or line.startswith("$GPGGA"):
+    if r.status_code == 200:
+        ser.write(r.content)
+        logger.info(f"AssistNow: sent {len(r.content)} bytes")
+    else:
+        logger.warning(f"AssistNow download failed: HTTP {r.status_code}")
 
-                            parts = line.split(",")
 
-                            if len(parts) < 10:
-                                continue
+# =========================================================
+# FRAMES -> REGISTROS
+# =========================================================
 
-                            current_data["latitude"] = parse_latlon(parts[2], parts[3])
-                            current_data["longitude"] = parse_latlon(parts[4], parts[5])
-                            current_data["fix"] = int(parts[6]) if parts[6] else 0
-                            current_data["satellites"] = int(parts[7]) if parts[7] else 0
-                            current_data["altitude"] = float(parts[9]) if parts[9] else 0.0
-                            dado_atualizado = True
+def handle_frame(frame, callback, received_ns=None, clock=None):
+    """
+    NAV-PVT vira um registro "gps" (callback); o resto é ignorado.
+    received_ns: instante monotônico da leitura serial que trouxe o frame;
+    com ele a hora UTC da época disciplina o clock.
+    """
+
+    if frame.kind != ubx.KIND_UBX:
+        return
+
+    if frame.cls == ubx.CLASS_NAV and frame.msg_id == ubx.NAV_PVT:
+        if len(frame.payload) < ubx.NAV_PVT_LENGTH:
+            return
+
+        pvt = ubx.parse_nav_pvt(frame.payload)
+        utc_ns = ubx.nav_pvt_utc_ns(pvt)
+
+        if clock is not None and utc_ns is not None and received_ns is not None:
+            clock.update_gnss(utc_ns, received_ns)
+
+        # Timestamp = instante da época GNSS (não o da chegada na serial)
+        if utc_ns is None:
+            utc_ns = clock.now_ns() if clock is not None else time.time_ns()
+
+        record = {
+            "source": "gps",
+            "timestamp_ns": utc_ns
+        }
+        record.update(ubx.nav_pvt_fix(pvt))
+        callback(record)
+
+    elif frame.cls == ubx.CLASS_ACK and frame.msg_id == ubx.ACK_NAK and len(frame.payload) >= 2:
+        logger.warning(
+            f"Receiver rejected UBX message class 0x{frame.payload[0]:02X} "
+            f"id 0x{frame.payload[1]:02X}"
+        )
+
+
+class ChangeFilter:
+    """
+    Publicação só do que mudou: repassa source, timestamp_ns e os campos
+    com valor diferente do último publicado; época sem mudança retorna
+    None. A cada keyframe_interval s sai o registro completo (cliente que
+    conectou depois e consumidores que dependem de amostras periódicas).
+    """
+
+    def __init__(self, keyframe_interval=1.0):
+        self.keyframe_interval_ns = int(keyframe_interval * 1e9)
+        self.last = {}
+        self.next_keyframe_ns = None
+
+    def filter(self, record):
+        timestamp_ns = record["timestamp_ns"]
+        last = self.last
+
+        keyframe = (
+            self.next_keyframe_ns is None
+            or timestamp_ns >= self.next_keyframe_ns
+            # Relógio voltou (hora do sistema -> hora GNSS)
+            or timestamp_ns < self.next_keyframe_ns - self.keyframe_interval_ns
+        )
+        if keyframe:
+            self.next_keyframe_ns = timestamp_ns + self.keyframe_interval_ns
+            last.update(record)
+            return record
+
+        changed = {
+            key: value for key, value in record.items()
+            if key not in ("source", "timestamp_ns") and last.get(key) != value
+        }
+        if not changed:
+            return None
+
+        last.update(changed)
+        return {"source": record["source"], "timestamp_ns": timestamp_ns, **changed}
+
+
+def replay(path, callback):
+    """Reprocessa um dump binário da serial; retorna as estatísticas do scanner."""
+    scanner = ubx.FrameScanner()
+    with open(path, "rb") as f:
+        for frame in ubx.scan_stream(f, scanner):
+            handle_frame(frame, callback)
+    return scanner.stats()
 
-                        # ---------------------------
-                        # RMC → velocidade
-                        # ---------------------------
-                        elif line.startswith("$GNRMC") or line.startswith("$GPRMC"):
 
-                            parts = line.split(",")
+# =========================================================
+# GNSS THREAD
+# =========================================================
 
-                            if len(parts) < 9:
-                                continue
+def start(callback, port=SERIAL_PORT, baudrate=BAUDRATE, initial_baudrate=INITIAL_BAUDRATE,
+          rate_hz=RATE_HZ, assistnow_token=None, clock=wallclock, assist_path=None,
+          offline_path=None, assist_save_interval=ASSIST_SAVE_INTERVAL):
+    """
+    Um registro por época de navegação (NAV-PVT), source "gps", com os
+    campos do GNSS_FIX_SCHEMA (inclui as estimativas de precisão
+    h_acc/v_acc/s_acc em metros). Envia mesmo sem fix (fix = 0).
+    A hora UTC de cada época disciplina `clock` (WallClock do gateway).
+    Para publicar só o que mudou, passe os registros por ChangeFilter.
+
+    Assistência (TTFF): na conexão envia o banco de navegação salvo em
+    assist_path e o arquivo AssistNow Offline/Autonomous offline_path; o
+    AssistNow Online (assistnow_token) só é baixado sem nenhum dos dois.
+    Com fix, o banco é salvo a cada assist_save_interval s. Retorna
+    save_assistance(timeout), que salva o banco na hora (shutdown) e
+    retorna True só se o arquivo foi gravado (sem fix, sem resposta do
+    receptor ou timeout: False).
+    """
+
+    state = {"last_fix": 0.0, "fix": 0, "saved": False}
+    store = AssistStore(assist_path) if assist_path else None
+    offline = AssistStore(offline_path) if offline_path else None
+    save_request = threading.Event()
+    save_done = threading.Event()
+
+    def on_fix(record):
+        state["last_fix"] = time.monotonic()
+        state["fix"] = record["fix"]
+        callback(record)
+
+    def save_assistance(timeout=5.0):
+        if store is None:
+            return False
+        save_done.clear()
+        save_request.set()
+        if not save_done.wait(timeout):
+            logger.warning("GNSS navigation database save timed out")
+            return False
+        return state["saved"]
 
-                            if parts[2] != "A":
-                                continue
+    def loop():
 
-                            speed_knots = float(parts[7]) if parts[7] else 0.0
-                            current_data["speed"] = speed_knots * 0.514444
-                            current_data["heading"] = float(parts[8]) if parts[8] else 0.0
-                            dado_atualizado = True
+        scanner = ubx.FrameScanner()
+        reported_errors = 0
+        next_report = 0.0
 
-                        # ---------------------------
-                        # ENVIA SEM PRECISAR DE FIX
-                        # ---------------------------
+        while True:
+            ser = None
+            try:
+                ser = open_receiver(port, baudrate, initial_baudrate, rate_hz)
 
-                        # Caso seja um dado de interesse
-                        if dado_atualizado:
-                            
-                            # Envio modularizado dos dados (nome e valor)
-                            for name, value in current_data.items():
-                                if name in ("latitude", "longitude") and value is None:
-                                    continue
+                assistance = (store.load() if store else []) + (offline.load() if offline else [])
+                if assistance:
+                    send_assistance(ser, assistance, clock)
+                    logger.info(f"GNSS assistance: sent {len(assistance)} cached MGA messages")
+                elif assistnow_token:
+                    send_assistnow_online(ser, assistnow_token)
 
-                                payload = {
-                                    "v": value,
-                                    "n": f"/GPS/{name}"
-                                }
+                state["last_fix"] = time.monotonic()
+                next_save = time.monotonic() + assist_save_interval
+                dbd = None
+                dbd_deadline = 0.0
 
-                                callback(payload)
+                while True:
+                    data = ser.read(min(ser.in_waiting or 1, scanner.space()))
+                    received_ns = time.monotonic_ns()
+
+                    if data:
+                        scanner.feed(data)
+                        for frame in scanner.frames():
+                            if dbd is not None and frame.cls == ubx.CLASS_MGA and frame.msg_id == ubx.MGA_DBD:
+                                dbd.append(ubx.build_frame(ubx.CLASS_MGA, ubx.MGA_DBD, frame.payload))
+                                dbd_deadline = time.monotonic() + DBD_QUIET_TIME
+                            else:
+                                handle_frame(frame, on_fix, received_ns, clock)
+
+                    now = time.monotonic()
+
+                    if store and dbd is None and (save_request.is_set() or now >= next_save):
+                        if state["fix"] >= 2:
+                            ser.write(ubx.mga_dbd_poll())
+                            dbd = []
+                            dbd_deadline = now + DBD_TIMEOUT
+                        else:
+                            # Sem fix o banco não vale a pena: mantém o arquivo anterior
+                            if save_request.is_set():
+                                logger.warning("No GNSS fix, navigation database not saved")
+                            state["saved"] = False
+                            next_save = now + assist_save_interval
+
+                    elif dbd is not None and now >= dbd_deadline:
+                        state["saved"] = save_database(store, dbd)
+                        dbd = None
+                        next_save = now + assist_save_interval
+
+                    if dbd is None and save_request.is_set():
+                        save_request.clear()
+                        save_done.set()
+
+                    if now - state["last_fix"] > STALL_TIMEOUT:
+                        raise TimeoutError(f"no NAV-PVT for {STALL_TIMEOUT:.0f} s")
+
+                    errors = scanner.bad_checksum + scanner.bad_length
+                    if errors != reported_errors and now >= next_report:
+                        logger.warning(f"GNSS serial errors: {scanner.stats()}")
+                        reported_errors = errors
+                        next_report = now + SCANNER_REPORT_INTERVAL
 
             except Exception as e:
                 logger.error(f"GNSS error: {e}")
                 time.sleep(2)
 
+            finally:
+                if ser is not None:
+                    ser.close()
+
     threading.Thread(target=loop, daemon=True).start()
+    return save_assistance
+
+
+if __name__ == "__main__":
+    # Replay de uma captura da serial (ex.: cat /dev/ttymxc2 > gnss.bin)
+    import sys
+    import json
+
+    stats = replay(sys.argv[1], lambda record: print(json.dumps(record)))
+    print(json.dumps(stats), file=sys.stderr)
@@ -0,0 +1,296 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+
+logger = logging.getLogger("Timebase")
+
+
+# =========================================================
+# WALL CLOCK (GNSS + PPS)
+# =========================================================
+#
+# O Toradex boota sem NTP, então time.time_ns() pode estar errado por dias.
+# O WallClock mapeia CLOCK_MONOTONIC para UTC com um offset (e drift):
+#
+#   system  relógio do sistema (até o GNSS ter hora válida)
+#   gnss    UTC do NAV-PVT menos o instante de recepção; o máximo numa
+#           janela desconta a latência de saída da serial (erro ~ms)
+#   pps     borda do timepulse via GPIO rotulada com o segundo UTC mais
+#           próximo (erro ~µs); drift medido entre pulsos
+#
+# Com GNSS_SET_SYSTEM_CLOCK=1 o relógio do sistema é ajustado para a hora
+# GNSS quando diverge mais de 1 s (containers e processos sem acesso ao
+# WallClock passam a gravar a data certa).
+
+GNSS_SET_SYSTEM_CLOCK = os.getenv("GNSS_SET_SYSTEM_CLOCK", "0") == "1"
+
+SOURCE_SYSTEM = "system"
+SOURCE_GNSS = "gnss"
+SOURCE_PPS = "pps"
+
+_SECOND_NS = 1_000_000_000
+
+# Borda de PPS longe do segundo UTC estimado pelo NAV-PVT é pulso espúrio
+_PPS_MAX_ERROR_NS = 250_000_000
+
+# Drift só com pulsos consecutivos e plausível (cristal: dezenas de ppm)
+_PPS_MAX_GAP_NS = 5 * _SECOND_NS
+_MAX_DRIFT = 500e-6
+
+
+class WallClock:
+    """
+    Relógio de parede do gateway. to_wall_ns() converte instantes
+    monotônicos (ns); now_ns() substitui time.time_ns(). Leituras não
+    travam: o modelo (offset, drift, referência) é trocado atomicamente.
+    """
+
+    def __init__(self, resync_interval=1.0, gnss_window=10.0, pps_holdover=60.0,
+                 pps_baseline=60, set_system_clock=False, step_threshold=1.0):
+        self.resync_interval_ns = int(resync_interval * 1e9)
+        self.gnss_window_ns = int(gnss_window * 1e9)
+        self.pps_holdover_ns = int(pps_holdover * 1e9)
+        self.set_system_clock = set_system_clock
+        self.step_threshold_ns = int(step_threshold * 1e9)
+
+        self.lock = threading.Lock()
+        self.source = SOURCE_SYSTEM
+        self.model = None
+        self.listeners = []
+
+        self.system_offset_ns = 0
+        self.next_sync_ns = 0
+
+        self.gnss_samples = deque()
+        self.coarse_offset_ns = None
+        self.pps_samples = deque(maxlen=pps_baseline)
+        self.pps_rejected = 0
+
+        self._sync(time.monotonic_ns())
+
+    # ---------------------------------------------------------
+    # Leitura
+    # ---------------------------------------------------------
+
+    def _sync(self, now_mono):
+        """Offset wallclock - monotônico, amostrado entre duas leituras do wallclock."""
+        t0 = time.time_ns()
+        mono = time.monotonic_ns()
+        t1 = time.time_ns()
+        self.system_offset_ns = (t0 + t1) // 2 - mono
+        # Ressincroniza periodicamente para acompanhar ajustes do NTP
+        self.next_sync_ns = now_mono + self.resync_interval_ns
+
+    def _system_offset(self, now_mono):
+        if now_mono >= self.next_sync_ns:
+            self._sync(now_mono)
+        return self.system_offset_ns
+
+    def to_wall_ns(self, monotonic_ns):
+        model = self.model
+        if model is None:
+            return monotonic_ns + self._system_offset(monotonic_ns)
+
+        offset, drift, reference = model
+        return monotonic_ns + offset + int(drift * (monotonic_ns - reference))
+
+    def now_ns(self):
+        return self.to_wall_ns(time.monotonic_ns())
+
+    def from_system_ns(self, realtime_ns):
+        """Timestamp do relógio do sistema (ex.: SO_TIMESTAMP) no WallClock."""
+        if self.model is None:
+            return realtime_ns
+        return self.to_wall_ns(realtime_ns - self._system_offset(time.monotonic_ns()))
+
+    def status(self):
+        model = self.model
+        return {
+            "source": self.source,
+            "offset_ns": model[0] if model else self.system_offset_ns,
+            "drift_ppm": model[1] * 1e6 if model else 0.0,
+            "pps_rejected": self.pps_rejected,
+        }
+
+    def add_listener(self, listener):
+        """listener(fonte_anterior, fonte_nova) a cada troca de fonte."""
+        self.listeners.append(listener)
+
+    # ---------------------------------------------------------
+    # Disciplina
+    # ---------------------------------------------------------
+
+    def update_gnss(self, utc_ns, received_monotonic_ns):
+        """Hora UTC de uma época NAV-PVT e o instante monotônico em que chegou."""
+        with self.lock:
+            samples = self.gnss_samples
+            samples.append((received_monotonic_ns, utc_ns - received_monotonic_ns))
+            while received_monotonic_ns - samples[0][0] > self.gnss_window_ns:
+                samples.popleft()
+
+            # Latência só atrasa a recepção: o maior offset é o mais próximo do real
+            coarse = max(offset for _, offset in samples)
+            self.coarse_offset_ns = coarse
+
+            if self.source == SOURCE_PPS and self.pps_samples:
+                last_edge = self.pps_samples[-1][0]
+                if received_monotonic_ns - last_edge <= self.pps_holdover_ns:
+                    return
+
+            self._set_model(SOURCE_GNSS, coarse, 0.0, received_monotonic_ns)
+
+    def update_pps(self, edge_monotonic_ns):
+        """Borda do timepulse (início de um segundo UTC), em ns monotônicos."""
+        with self.lock:
+            coarse = self.coarse_offset_ns
+            if coarse is None:
+                # Sem hora do NAV-PVT ainda não dá para rotular o segundo
+                return
+
+            estimate = edge_monotonic_ns + coarse
+            second = (estimate + _SECOND_NS // 2) // _SECOND_NS * _SECOND_NS
+            if abs(estimate - second) > _PPS_MAX_ERROR_NS:
+                self.pps_rejected += 1
+                return
+
+            offset = second - edge_monotonic_ns
+
+            samples = self.pps_samples
+            if samples and edge_monotonic_ns - samples[-1][0] > _PPS_MAX_GAP_NS:
+                samples.clear()
+            samples.append((edge_monotonic_ns, offset))
+
+            drift = 0.0
+            if len(samples) > 1:
+                first_edge, first_offset = samples[0]
+                drift = (offset - first_offset) / (edge_monotonic_ns - first_edge)
+                if abs(drift) > _MAX_DRIFT:
+                    drift = 0.0
+
+            self._set_model(SOURCE_PPS, offset, drift, edge_monotonic_ns)
+
+    def _set_model(self, source, offset, drift, reference):
+        """Chamado com lock."""
+        previous = self.source
+        self.model = (offset, drift, reference)
+        self.source = source
+
+        if previous != source:
+            logger.info(f"Wall clock source: {previous} -> {source}")
+            for listener in self.listeners:
+                try:
+                    listener(previous, source)
+                except Exception as e:
+                    logger.error(f"Wall clock listener error: {e}")
+
+        if self.set_system_clock:
+            self._step_system_clock()
+
+    def _step_system_clock(self):
+        now_mono = time.monotonic_ns()
+        error = time.time_ns() - self.to_wall_ns(now_mono)
+        if abs(error) < self.step_threshold_ns:
+            return
+
+        try:
+            time.clock_settime_ns(time.CLOCK_REALTIME, self.to_wall_ns(time.monotonic_ns()))
+        except OSError as e:
+            logger.error(f"Cannot set system clock from GNSS ({e}), disabling")
+            self.set_system_clock = False
+            return
+
+        logger.warning(f"System clock stepped by {-error / 1e9:.3f} s to GNSS time")
+        self._sync(time.monotonic_ns())
+
+
+# Relógio único do gateway (IMU, GNSS, CAN e MCAP)
+wallclock = WallClock(set_system_clock=GNSS_SET_SYSTEM_CLOCK)
+
+
+def start_pps(chip, line, clock=wallclock, edge="rising"):
+    """
+    Disciplina o clock pelo timepulse do GNSS numa linha GPIO (eventos de
+    borda do libgpiod v2, timestamp monotônico do kernel).
+    """
+    try:
+        import gpiod
+        from gpiod.line import Edge
+
+        edges = {"rising": Edge.RISING, "falling": Edge.FALLING}
+        if not chip.startswith("/"):
+            chip = f"/dev/{chip}"
+
+        request = gpiod.request_lines(
+            chip,
+            consumer="tupa-pps",
+            config={line: gpiod.LineSettings(edge_detection=edges[edge])}
+        )
+    except Exception as e:
+        logger.error(f"PPS GPIO {chip}:{line} unavailable ({e}), using NAV-PVT time only")
+        return
+
+    def loop():
+        while True:
+            try:
+                if request.wait_edge_events(2.0):
+                    for event in request.read_edge_events():
+                        clock.update_pps(event.timestamp_ns)
+            except Exception as e:
+                logger.error(f"PPS error: {e}")
+                time.sleep(1)
+
+    logger.info(f"PPS on {edge} edge of {chip} line {line}")
+    threading.Thread(target=loop, daemon=True).start()
+
+
+# =========================================================
+# CAN FRAME CLOCK
+# =========================================================
+#
+# msg.timestamp do python-can vem do kernel. No socketcan é SO_TIMESTAMP
+# (CLOCK_REALTIME, relógio do sistema); interfaces com timestamp de
+# hardware ou de boot entregam um relógio monotônico. Os dois são levados
+# para o WallClock.
+
+CAN_TIMESTAMP_CLOCK = os.getenv("CAN_TIMESTAMP_CLOCK", "auto")
+
+# Timestamps a menos de um dia do relógio do host são tratados como wallclock
+_WALLCLOCK_WINDOW_NS = 86_400 * 1_000_000_000
+
+
+class FrameClock:
+    """
+    Converte timestamps de frame (segundos, float) em wallclock (ns).
+    clock: "auto" (decide no primeiro frame), "realtime" ou "monotonic".
+    """
+
+    def __init__(self, clock=CAN_TIMESTAMP_CLOCK, wallclock=wallclock):
+        if clock not in ("auto", "realtime", "monotonic"):
+            raise ValueError(f"Relógio de timestamp inválido: {clock}")
+
+        self.clock = clock
+        self.wallclock = wallclock
+
+    def to_wall_ns(self, timestamp):
+        """Timestamp do frame em ns de wallclock; sem timestamp usa o relógio atual."""
+        if not timestamp:
+            return self.wallclock.now_ns()
+
+        return self._wall_from_ns(round(timestamp * 1e9))
+
+    def offset_ns(self, timestamp_ns):
+        """wallclock - timestamp (ns) no instante do frame; vale para um lote inteiro."""
+        return self._wall_from_ns(timestamp_ns) - timestamp_ns
+
+    def _wall_from_ns(self, ts_ns):
+        if self.clock == "auto":
+            near_wallclock = abs(time.time_ns() - ts_ns) < _WALLCLOCK_WINDOW_NS
+            self.clock = "realtime" if near_wallclock else "monotonic"
+
+        if self.clock == "realtime":
+            return self.wallclock.from_system_ns(ts_ns)
+
+        return self.wallclock.to_wall_ns(ts_ns)
@@ -0,0 +1,353 @@
+import calendar
+import struct
+import time
+from collections import namedtuple
+
+
+# =========================================================
+# UBX PROTOCOL (u-blox M8)
+# =========================================================
+#
+# Frame: B5 62 | classe | id | comprimento (u16 LE) | payload | CK_A CK_B
+# O checksum (Fletcher de 8 bits) cobre classe, id, comprimento e payload.
+
+SYNC = b"\xB5\x62"
+HEADER = struct.Struct("<BBH")
+HEADER_SIZE = 6
+CHECKSUM_SIZE = 2
+
+CLASS_NAV = 0x01
+CLASS_ACK = 0x05
+CLASS_CFG = 0x06
+CLASS_MGA = 0x13
+
+NAV_PVT = 0x07
+ACK_NAK = 0x00
+ACK_ACK = 0x01
+CFG_PRT = 0x00
+CFG_MSG = 0x01
+CFG_RATE = 0x08
+MGA_INI = 0x40
+MGA_DBD = 0x80
+
+# UART1 do módulo, 8N1, entrada UBX+NMEA
+PORT_UART1 = 1
+UART_MODE_8N1 = 0x000008D0
+PROTO_UBX = 0x0001
+PROTO_NMEA = 0x0002
+
+CFG_PRT_STRUCT = struct.Struct("<BxHIIHHHxx")
+CFG_RATE_STRUCT = struct.Struct("<HHH")
+CFG_MSG_STRUCT = struct.Struct("<BBB")
+
+# MGA-INI-TIME_UTC: tipo, versão, referência, leap seconds (-128 =
+# desconhecido), data/hora UTC, ns, precisão (s + ns)
+MGA_INI_TIME_UTC = 0x10
+MGA_INI_TIME_UTC_STRUCT = struct.Struct("<BBBbHBBBBBxIHxxI")
+
+
+def checksum(data):
+    ck_a = 0
+    ck_b = 0
+    for b in data:
+        ck_a = (ck_a + b) & 0xFF
+        ck_b = (ck_b + ck_a) & 0xFF
+    return ck_a, ck_b
+
+
+def build_frame(cls, msg_id, payload=b""):
+    body = HEADER.pack(cls, msg_id, len(payload)) + bytes(payload)
+    return SYNC + body + bytes(checksum(body))
+
+
+def cfg_prt_uart(baudrate, out_proto=PROTO_UBX, in_proto=PROTO_UBX | PROTO_NMEA):
+    """CFG-PRT da UART1: baudrate e protocolos (padrão: só UBX na saída)."""
+    payload = CFG_PRT_STRUCT.pack(PORT_UART1, 0, UART_MODE_8N1, baudrate, in_proto, out_proto, 0)
+    return build_frame(CLASS_CFG, CFG_PRT, payload)
+
+
+def cfg_rate(rate_hz):
+    """CFG-RATE: período de medição em ms, uma solução por medição, tempo GPS."""
+    return build_frame(CLASS_CFG, CFG_RATE, CFG_RATE_STRUCT.pack(round(1000 / rate_hz), 1, 1))
+
+
+def cfg_msg(cls, msg_id, rate=1):
+    """CFG-MSG: mensagem a cada `rate` soluções na porta atual (0 desliga)."""
+    return build_frame(CLASS_CFG, CFG_MSG, CFG_MSG_STRUCT.pack(cls, msg_id, rate))
+
+
+def mga_dbd_poll():
+    """Pede o banco de navegação do receptor (resposta: uma série de MGA-DBD)."""
+    return build_frame(CLASS_MGA, MGA_DBD)
+
+
+def mga_ini_time_utc(utc_ns, accuracy_s):
+    """MGA-INI-TIME_UTC: hora aproximada para o receptor usar a assistência."""
+    seconds, ns = divmod(utc_ns, 1_000_000_000)
+    t = time.gmtime(seconds)
+    payload = MGA_INI_TIME_UTC_STRUCT.pack(
+        MGA_INI_TIME_UTC, 0, 0, -128,
+        t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec,
+        ns, int(accuracy_s), 0
+    )
+    return build_frame(CLASS_MGA, MGA_INI, payload)
+
+
+# =========================================================
+# NAV-PVT
+# =========================================================
+
+NAV_PVT_STRUCT = struct.Struct("<IHBBBBBBIiBBBBiiiiIIiiiiiIIH6xihH")
+NAV_PVT_LENGTH = NAV_PVT_STRUCT.size
+
+NavPvt = namedtuple("NavPvt", [
+    "itow", "year", "month", "day", "hour", "minute", "second", "valid",
+    "t_acc", "nano", "fix_type", "flags", "flags2", "num_sv",
+    "lon", "lat", "height", "h_msl", "h_acc", "v_acc",
+    "vel_n", "vel_e", "vel_d", "g_speed", "head_mot", "s_acc", "head_acc",
+    "p_dop", "head_veh", "mag_dec", "mag_acc",
+])
+
+# flags
+FLAG_GNSS_FIX_OK = 0x01
+
+# valid: data, hora e tempo totalmente resolvidos
+VALID_UTC = 0x07
+
+
+def parse_nav_pvt(buffer, offset=0):
+    """Campos brutos do NAV-PVT (unidades do protocolo) a partir de buffer[offset:]."""
+    return NavPvt._make(NAV_PVT_STRUCT.unpack_from(buffer, offset))
+
+
+def nav_pvt_utc_ns(pvt):
+    """Instante da época em ns UTC (epoch Unix), ou None sem data/hora válida."""
+    if pvt.valid & VALID_UTC != VALID_UTC:
+        return None
+
+    # nano é a correção (com sinal) do segundo arredondado, ±1e9
+    seconds = calendar.timegm((pvt.year, pvt.month, pvt.day, pvt.hour, pvt.minute, pvt.second))
+    return seconds * 1_000_000_000 + pvt.nano
+
+
+def nav_pvt_fix(pvt):
+    """NAV-PVT em unidades SI, com os campos do GNSS_FIX_SCHEMA."""
+    return {
+        "latitude": pvt.lat * 1e-7,
+        "longitude": pvt.lon * 1e-7,
+        "altitude": pvt.h_msl / 1000.0,
+        "speed": pvt.g_speed / 1000.0,
+        "heading": pvt.head_mot * 1e-5,
+        "fix": pvt.fix_type if pvt.flags & FLAG_GNSS_FIX_OK else 0,
+        "satellites": pvt.num_sv,
+        "h_acc": pvt.h_acc / 1000.0,
+        "v_acc": pvt.v_acc / 1000.0,
+        "s_acc": pvt.s_acc / 1000.0,
+    }
+
+
+# =========================================================
+# FRAME SCANNER (UBX + NMEA)
+# =========================================================
+#
+# Buffer preallocado com índices de leitura/escrita: bytes da serial são
+# copiados uma vez para o buffer e os frames saem como memoryview sobre
+# ele (sem cópia). O buffer nunca muda de tamanho; a compactação só move
+# o trecho ainda não lido para o início.
+
+KIND_UBX = "ubx"
+KIND_NMEA = "nmea"
+
+Frame = namedtuple("Frame", ["kind", "cls", "msg_id", "payload"])
+
+UBX_SYNC_1 = SYNC[0]
+UBX_SYNC_2 = SYNC[1]
+NMEA_START = ord("$")
+NMEA_MAX_LENGTH = 128
+
+
+class FrameScanner:
+    """
+    Separa frames UBX (checksum verificado) e sentenças NMEA (checksum
+    *hh verificado) de um fluxo de bytes. Frame corrompido: avança um
+    byte e procura o próximo início (resync). Os payloads são memoryviews
+    do buffer interno, válidos até a próxima chamada de feed().
+    """
+
+    def __init__(self, size=16384, max_payload=2048):
+        if max_payload + HEADER_SIZE + CHECKSUM_SIZE > size:
+            raise ValueError("Buffer menor que o maior frame aceito")
+
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.max_payload = max_payload
+        self.read_index = 0
+        self.write_index = 0
+
+        self.ubx_frames = 0
+        self.nmea_sentences = 0
+        self.bad_checksum = 0
+        self.bad_length = 0
+        self.discarded_bytes = 0
+        self.overflows = 0
+
+    def stats(self):
+        return {
+            "ubx_frames": self.ubx_frames,
+            "nmea_sentences": self.nmea_sentences,
+            "bad_checksum": self.bad_checksum,
+            "bad_length": self.bad_length,
+            "discarded_bytes": self.discarded_bytes,
+            "overflows": self.overflows,
+        }
+
+    def _compact(self):
+        pending = self.write_index - self.read_index
+        if self.read_index:
+            # bytes(): origem e destino se sobrepõem no mesmo buffer
+            self.buffer[:pending] = bytes(self.view[self.read_index:self.write_index])
+            self.read_index = 0
+            self.write_index = pending
+
+    def space(self):
+        """Bytes que cabem no buffer sem descartar o que ainda não foi lido."""
+        self._compact()
+        return len(self.buffer) - self.write_index
+
+    def feed(self, data):
+        """Copia os bytes recebidos para o buffer (leia no máximo space() bytes)."""
+        n = len(data)
+        size = len(self.buffer)
+
+        if n > size - self.write_index:
+            self._compact()
+
+            if n > size - self.write_index:
+                # Buffer cheio sem frame completo: descarta o acumulado
+                self.overflows += 1
+                self.discarded_bytes += self.write_index - self.read_index
+                self.read_index = self.write_index = 0
+
+                if n > size:
+                    self.discarded_bytes += n - size
+                    data = memoryview(data)[n - size:]
+                    n = size
+
+        self.buffer[self.write_index:self.write_index + n] = data
+        self.write_index += n
+
+    def frames(self):
+        """Gera os frames completos disponíveis no buffer."""
+        buf = self.buffer
+
+        while True:
+            start = self.read_index
+            end = self.write_index
+            if start >= end:
+                return
+
+            ubx_pos = buf.find(UBX_SYNC_1, start, end)
+            nmea_pos = buf.find(NMEA_START, start, end)
+            if ubx_pos < 0 and nmea_pos < 0:
+                self.discarded_bytes += end - start
+                self.read_index = end
+                return
+
+            if nmea_pos < 0 or 0 <= ubx_pos < nmea_pos:
+                pos = ubx_pos
+                scan = self._scan_ubx
+            else:
+                pos = nmea_pos
+                scan = self._scan_nmea
+
+            if pos > start:
+                self.discarded_bytes += pos - start
+                self.read_index = pos
+
+            frame = scan(pos, end)
+            if frame is None:
+                # Frame incompleto: espera mais bytes
+                return
+            if frame is not False:
+                yield frame
+
+    def __iter__(self):
+        return self.frames()
+
+    def _resync(self, pos):
+        self.discarded_bytes += 1
+        self.read_index = pos + 1
+        return False
+
+    def _scan_ubx(self, pos, end):
+        buf = self.buffer
+
+        if end - pos < 2:
+            return None
+        if buf[pos + 1] != UBX_SYNC_2:
+            return self._resync(pos)
+        if end - pos < HEADER_SIZE:
+            return None
+
+        cls, msg_id, length = HEADER.unpack_from(buf, pos + 2)
+        if length > self.max_payload:
+            self.bad_length += 1
+            return self._resync(pos)
+
+        frame_end = pos + HEADER_SIZE + length + CHECKSUM_SIZE
+        if frame_end > end:
+            return None
+
+        ck_a, ck_b = checksum(self.view[pos + 2:frame_end - CHECKSUM_SIZE])
+        if ck_a != buf[frame_end - 2] or ck_b != buf[frame_end - 1]:
+            self.bad_checksum += 1
+            return self._resync(pos)
+
+        self.ubx_frames += 1
+        self.read_index = frame_end
+        return Frame(KIND_UBX, cls, msg_id, self.view[pos + HEADER_SIZE:frame_end - CHECKSUM_SIZE])
+
+    def _scan_nmea(self, pos, end):
+        buf = self.buffer
+
+        newline = buf.find(b"\n", pos, min(end, pos + NMEA_MAX_LENGTH))
+        if newline < 0:
+            if end - pos < NMEA_MAX_LENGTH:
+                return None
+            self.bad_length += 1
+            return self._resync(pos)
+
+        line_end = newline - 1 if buf[newline - 1] == 0x0D else newline
+        star = line_end - 3
+
+        valid = star > pos and buf[star] == ord("*")
+        if valid:
+            calculated = 0
+            for b in self.view[pos + 1:star]:
+                calculated ^= b
+            try:
+                valid = calculated == int(buf[star + 1:line_end], 16)
+            except ValueError:
+                valid = False
+
+        if not valid:
+            self.bad_checksum += 1
+            return self._resync(pos)
+
+        self.nmea_sentences += 1
+        self.read_index = newline + 1
+        return Frame(KIND_NMEA, None, None, self.view[pos:line_end])
+
+
+def scan_stream(stream, scanner=None, chunk_size=4096):
+    """
+    Frames de um arquivo binário (dump capturado da serial) com o mesmo
+    scanner do tempo real.
+    """
+    scanner = scanner or FrameScanner()
+    while True:
+        data = stream.read(min(chunk_size, scanner.space()))
+        if not data:
+            return
+        scanner.feed(data)
+        yield from scanner.frames()
@@ -1,14 +1,31 @@
+import os
 import socket
 import json
 import logging
 import threading
 import time
 from kalman_speed import SpeedKalman
+from stream_protocol import StreamReader, Subscription
+from shm_ring import ShmRingReader
 
 logging.basicConfig(level=logging.INFO)
 
 ACQUISITION_HOST = "127.0.0.1"
 ACQUISITION_PORT = 7000
+ACQUISITION_BINARY = os.getenv("ACQUISITION_BINARY", "1") == "1"
+
+# Só os sinais usados em process_message() são pedidos ao gateway
+ACQUISITION_TOPICS = [
+    t for t in os.getenv(
+        "ACQUISITION_TOPICS",
+        "/IMU/lin_accel_x,/IMU/yaw,/IMU/roll,/IMU/pitch,/GPS/speed"
+    ).split(",") if t
+]
+ACQUISITION_MAX_RATE = float(os.getenv("ACQUISITION_MAX_RATE", "0")) or None
+
+# "tcp" (porta 7000) ou "shm" (ring em memória compartilhada do gateway)
+ACQUISITION_TRANSPORT = os.getenv("ACQUISITION_TRANSPORT", "tcp")
+SHM_RING_PATH = os.getenv("SHM_RING_PATH", "/shm/telemetry.ring")
 
 OUTPUT_PORT = 7001
 
@@ -21,20 +38,31 @@ class RealTimeDerivative:
         self.last_value = {}
         self.last_time = {}
 
-    def calculate(self, name, current_value):
-        current_time = time.time()
-        
+    def calculate(self, name, current_value, timestamp_ns=None, period=None):
+        """
+        timestamp_ns: instante da amostra (timestamp_ns do gateway), para que
+        o dt não dependa de quando a mensagem chegou (lotes do TCP/shm chegam
+        juntos); sem ele usa o relógio local.
+        period: ângulo que dá a volta (ex. 360); usa a menor diferença angular.
+        """
+        current_time = time.time_ns() if timestamp_ns is None else timestamp_ns
+
         if name not in self.last_value or name not in self.last_time:
             self.last_value[name] = current_value
             self.last_time[name] = current_time
             return 0.0
 
-        dt = current_time - self.last_time[name]
+        dt = (current_time - self.last_time[name]) / 1e9
 
         if dt <= 0.0001:
             return 0.0
 
-        derivative = (current_value - self.last_value[name]) / dt
+        delta = current_value - self.last_value[name]
+        if period:
+            # 359° -> 1° é +2°, não -358° (evita os picos na derivada do yaw)
+            delta = (delta + period / 2) % period - period / 2
+
+        derivative = delta / dt
 
         self.last_value[name] = current_value
         self.last_time[name] = current_time
@@ -64,6 +92,10 @@ class ControlECU:
             time.sleep(1)
 
     def connect_to_acquisition(self):
+        if ACQUISITION_TRANSPORT == "shm":
+            self.read_shared_memory()
+            return
+
         while True:
             try:
                 logging.info("🔄 Connecting to acquisition...")
@@ -71,26 +103,30 @@ class ControlECU:
                 sock.connect((ACQUISITION_HOST, ACQUISITION_PORT))
                 logging.info("✅ Connected to acquisition")
 
-                buffer = ""
+                # Stream binário quando o gateway suporta, NDJSON caso contrário
+                subscription = Subscription(ACQUISITION_TOPICS, ACQUISITION_MAX_RATE)
+                reader = StreamReader(sock, binary=ACQUISITION_BINARY, subscription=subscription)
 
-                while True:
-                    data = sock.recv(4096)
-                    if not data:
-                        raise ConnectionError("Connection closed")
+                for source, timestamp_ns, signals in reader:
+                    for name, value, unit in signals:
+                        self.process_message({"n": name, "v": value, "t": timestamp_ns})
 
-                    buffer += data.decode()
+            except Exception as e:
+                logging.error(f"Acquisition connection error: {e}")
+                time.sleep(2)
 
-                    while "\n" in buffer:
-                        line, buffer = buffer.split("\n", 1)
-                        if not line.strip():
-                            continue
+    def read_shared_memory(self):
+        logging.info(f"🔄 Reading acquisition from shared memory {SHM_RING_PATH}")
 
-                        msg = json.loads(line)
-                        self.process_message(msg)
+        # Mesmo filtro da subscription TCP, aplicado localmente
+        subscription = Subscription(ACQUISITION_TOPICS, ACQUISITION_MAX_RATE)
 
+        for source, timestamp_ns, signals in ShmRingReader(SHM_RING_PATH):
+            try:
+                for name, value, unit in subscription.select(signals, timestamp_ns):
+                    self.process_message({"n": name, "v": value, "t": timestamp_ns})
             except Exception as e:
-                logging.error(f"Acquisition connection error: {e}")
-                time.sleep(2)
+                logging.error(f"Shared-memory message error: {e}")
 
     def accept_clients(self):
         while True:
@@ -118,6 +154,7 @@ class ControlECU:
         # Extração flexível de nome e valor
         name = msg.get("n")
         value = msg.get("v")
+        timestamp_ns = msg.get("t")
         
         imu_accel = None
         gps_speed = None
@@ -145,7 +182,9 @@ class ControlECU:
         # CÁLCULOS
         # ======================================================
         if angle_position is not None:
-            angle_velocity = self.angle_derivative.calculate(name, angle_position)
+            angle_velocity = self.angle_derivative.calculate(
+                name, angle_position, timestamp_ns, period=360.0
+            )
             data_list.append({"n": f"{name}_derivative", "v": float(angle_velocity)})
 
         imu_predicted = None
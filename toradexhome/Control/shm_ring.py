@@ -0,0 +1,298 @@
+"""
+Transporte por memória compartilhada entre os containers.
+
+Um único produtor (o gateway) escreve amostras de tamanho fixo num ring em
+um arquivo mapeado com mmap (volume tmpfs compartilhado, ver
+docker-compose.yml); qualquer número de leitores acompanha o ring sem
+syscalls nem serialização. Módulo sem dependências externas, usado pelo
+gateway e por Control/telemetry. O original fica em shared/shm_ring.py;
+altere lá e rode python shared/sync.py para atualizar as cópias.
+
+Layout do arquivo (little endian):
+
+    header (64 B)   magic | versão | slots | max_sinais | n_sinais
+                    | geração | write_index
+    dicionário      max_sinais x (source 16 B | nome 64 B | unidade 16 B)
+    slots           slots x (seq u64 | timestamp_ns i64 | id u32
+                    | restantes u16 | valor f64)
+
+Cada slot usa seqlock: seq ímpar durante a escrita e 2 * índice + 2 depois.
+Um leitor atrasado mais de um ring inteiro perde as amostras mais antigas
+(contadas em lost). "restantes" é o número de amostras do mesmo payload
+depois desta, o que permite remontar o payload no leitor. A geração muda
+quando o gateway reinicia e recria o arquivo.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+MAGIC = b"TUPARING"
+VERSION = 1
+
+HEADER = struct.Struct("<8sIIIIQQ")
+HEADER_SIZE = 64
+SIGNAL_COUNT_OFFSET = 20
+WRITE_INDEX_OFFSET = 32
+
+ENTRY = struct.Struct("<16s64s16s")
+SLOT = struct.Struct("<QqIHxxd")
+SLOT_BODY = struct.Struct("<qIHxxd")
+SEQ = struct.Struct("<Q")
+COUNT = struct.Struct("<I")
+
+DEFAULT_SLOTS = 65536
+DEFAULT_MAX_SIGNALS = 1024
+
+logger = logging.getLogger("ShmRing")
+
+
+def _ring_size(slots, max_signals):
+    return HEADER_SIZE + max_signals * ENTRY.size + slots * SLOT.size
+
+
+def _retire(path):
+    """Apaga o magic do ring anterior para que os leitores reanexem ao novo."""
+    try:
+        with open(path, "r+b") as f:
+            f.write(b"\0" * len(MAGIC))
+    except FileNotFoundError:
+        pass
+
+
+# =========================================================
+# PRODUTOR (gateway)
+# =========================================================
+
+class ShmRingWriter:
+    """
+    Produtor do ring. publish() é thread-safe (um lock serializa os
+    produtores do gateway, mantendo um único escritor no ring).
+    """
+
+    def __init__(self, path, slots=DEFAULT_SLOTS, max_signals=DEFAULT_MAX_SIGNALS, signals=()):
+        self.path = path
+        self.slots = slots
+        self.max_signals = max_signals
+        self.size = _ring_size(slots, max_signals)
+
+        self.slots_offset = HEADER_SIZE + max_signals * ENTRY.size
+        self.ids = {}
+        self.write_index = 0
+        self.dropped_signals = set()
+        self.lock = threading.Lock()
+
+        # Ring novo num arquivo temporário + rename: leitores que ainda mapeiam
+        # o arquivo antigo nunca o veem mudar de tamanho (SIGBUS)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            self.mm = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+
+        HEADER.pack_into(
+            self.mm, 0, b"\0" * 8, VERSION, slots, max_signals, 0,
+            time.time_ns(), 0
+        )
+        # Magic por último: leitores só anexam a um ring completo
+        self.mm[:8] = MAGIC
+
+        _retire(path)
+        os.replace(tmp_path, path)
+
+        for source, name, unit in signals:
+            self._register(source, name, unit)
+
+    def _register(self, source, name, unit):
+        signal_id = len(self.ids)
+        if signal_id >= self.max_signals:
+            if name not in self.dropped_signals:
+                self.dropped_signals.add(name)
+                logger.warning(f"Shared-memory ring dictionary full, dropping signal {name}")
+            return None
+
+        ENTRY.pack_into(
+            self.mm, HEADER_SIZE + signal_id * ENTRY.size,
+            source.encode()[:16], name.encode()[:64], unit.encode()[:16]
+        )
+        # Contador depois da entrada: leitores nunca veem uma entrada incompleta
+        COUNT.pack_into(self.mm, SIGNAL_COUNT_OFFSET, signal_id + 1)
+
+        self.ids[name] = signal_id
+        return signal_id
+
+    def publish(self, source, signals, timestamp_ns):
+        """Escreve os sinais [(nome, valor, unidade)] de um payload."""
+        self.publish_many(((source, signals, timestamp_ns),))
+
+    def publish_many(self, payloads):
+        """Lote de (source, sinais, timestamp_ns): um lock e um write_index por lote."""
+        with self.lock:
+            ids = self.ids
+            mm = self.mm
+            slots = self.slots
+            slots_offset = self.slots_offset
+            index = self.write_index
+
+            for source, signals, timestamp_ns in payloads:
+                records = []
+
+                for name, value, unit in signals:
+                    signal_id = ids.get(name)
+                    if signal_id is None:
+                        signal_id = self._register(source, name, unit)
+                        if signal_id is None:
+                            continue
+                    records.append((signal_id, value))
+
+                remaining = len(records)
+
+                for signal_id, value in records:
+                    remaining -= 1
+                    offset = slots_offset + (index % slots) * SLOT.size
+
+                    SEQ.pack_into(mm, offset, 2 * index + 1)
+                    SLOT_BODY.pack_into(mm, offset + 8, timestamp_ns, signal_id, remaining, value)
+                    SEQ.pack_into(mm, offset, 2 * index + 2)
+
+                    index += 1
+
+            # Publica os payloads inteiros de uma vez
+            self.write_index = index
+            SEQ.pack_into(mm, WRITE_INDEX_OFFSET, index)
+
+    def close(self):
+        with self.lock:
+            self.mm.close()
+
+
+# =========================================================
+# LEITOR (consumidores)
+# =========================================================
+
+class ShmRingReader:
+    """
+    Lê o ring e gera (source, timestamp_ns, sinais) por payload, com
+    sinais = [(nome, valor, unidade), ...], como o stream_protocol.StreamReader.
+    Espera o gateway criar o ring e acompanha reinícios dele.
+    """
+
+    def __init__(self, path, idle_sleep=0.0005, from_start=False):
+        self.path = path
+        self.idle_sleep = idle_sleep
+        self.from_start = from_start
+
+        self.mm = None
+        self.generation = None
+        self.cursor = 0
+        self.lost = 0
+        # id -> (source, nome, unidade)
+        self.dictionary = {}
+
+    def _attach(self):
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+
+        magic, version, slots, max_signals, _, generation, write_index = HEADER.unpack_from(mm)
+        if magic != MAGIC or version != VERSION or len(mm) < _ring_size(slots, max_signals):
+            mm.close()
+            return False
+
+        # Ao reanexar depois de um reinício do gateway, tudo no ring novo é inédito
+        reattach = self.mm is not None
+        if reattach:
+            self.mm.close()
+
+        self.mm = mm
+        self.slots = slots
+        self.slots_offset = HEADER_SIZE + max_signals * ENTRY.size
+        self.generation = generation
+        self.dictionary = {}
+        self.cursor = 0 if self.from_start or reattach else write_index
+        logger.info(f"Attached to shared-memory ring {self.path} ({slots} slots)")
+        return True
+
+    def _generation_changed(self):
+        magic, _, _, _, _, generation, _ = HEADER.unpack_from(self.mm)
+        return magic != MAGIC or generation != self.generation
+
+    def _lookup(self, signal_id):
+        entry = self.dictionary.get(signal_id)
+        if entry is None:
+            (count,) = COUNT.unpack_from(self.mm, SIGNAL_COUNT_OFFSET)
+            if signal_id >= count:
+                return None
+            raw = ENTRY.unpack_from(self.mm, HEADER_SIZE + signal_id * ENTRY.size)
+            entry = tuple(field.rstrip(b"\0").decode("utf-8", "replace") for field in raw)
+            self.dictionary[signal_id] = entry
+        return entry
+
+    def poll(self, max_records=4096):
+        """Payloads completos publicados desde a última chamada."""
+        if self.mm is None or self._generation_changed():
+            # Ring novo (gateway reiniciou): reanexa, com o arquivo recriado
+            if not self._attach():
+                return []
+
+        mm = self.mm
+        slots = self.slots
+        slots_offset = self.slots_offset
+
+        (write_index,) = SEQ.unpack_from(mm, WRITE_INDEX_OFFSET)
+        cursor = self.cursor
+
+        if write_index - cursor > slots:
+            self.lost += write_index - slots - cursor
+            cursor = write_index - slots
+
+        end = min(write_index, cursor + max_records)
+        payloads = []
+        current = None
+
+        for index in range(cursor, end):
+            offset = slots_offset + (index % slots) * SLOT.size
+            seq, timestamp_ns, signal_id, remaining, value = SLOT.unpack_from(mm, offset)
+
+            # Slot sobrescrito durante/antes da leitura
+            if seq != 2 * index + 2 or SEQ.unpack_from(mm, offset)[0] != seq:
+                self.lost += 1
+                current = None
+                continue
+
+            entry = self._lookup(signal_id)
+            if entry is None:
+                self.lost += 1
+            else:
+                source, name, unit = entry
+                if current is None:
+                    current = (source, timestamp_ns, [])
+                current[2].append((name, value, unit))
+
+            if remaining == 0 and current is not None:
+                payloads.append(current)
+                current = None
+
+        # Payload cortado por max_records: relê na próxima chamada
+        if current is not None and end - len(current[2]) > cursor:
+            end -= len(current[2])
+        elif current is not None:
+            payloads.append(current)
+
+        self.cursor = end
+        return payloads
+
+    def __iter__(self):
+        while True:
+            payloads = self.poll()
+            if not payloads:
+                time.sleep(self.idle_sleep)
+                continue
+            yield from payloads
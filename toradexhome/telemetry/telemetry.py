@@ -1,14 +1,22 @@
+import os
 import socket
 import json
 import time
 import logging
 import threading
 from foxglove_sender import FoxgloveSender
+from stream_protocol import StreamReader
+from shm_ring import ShmRingReader
 
 logging.basicConfig(level=logging.INFO)
 
 ACQUISITION_HOST = "127.0.0.1"
 ACQUISITION_PORT = 7000
+ACQUISITION_BINARY = os.getenv("ACQUISITION_BINARY", "1") == "1"
+
+# "tcp" (port 7000) or "shm" (gateway shared-memory ring)
+ACQUISITION_TRANSPORT = os.getenv("ACQUISITION_TRANSPORT", "tcp")
+SHM_RING_PATH = os.getenv("SHM_RING_PATH", "/shm/telemetry.ring")
 
 CONTROL_HOST = "127.0.0.1"
 CONTROL_PORT = 7001
@@ -25,18 +33,24 @@ class TimeWindowAggregator:
         self.interval = interval_sec
         self.lock = threading.Lock()
         self.buffers = {}
+        self.time_buffers = {}
         self.meta_buffers = {}
         
-    def add_value(self, topic, value, unit=""):
+    def add_value(self, topic, value, unit="", timestamp_ns=None):
         """Thread-safe method to dump incoming raw hardware data."""
         # Only accept numeric values for averaging
         if not isinstance(value, (int, float)):
             return
+
+        if timestamp_ns is None:
+            timestamp_ns = time.time_ns()
             
         with self.lock:
             if topic not in self.buffers:
                 self.buffers[topic] = []
+                self.time_buffers[topic] = []
             self.buffers[topic].append(value)
+            self.time_buffers[topic].append(timestamp_ns)
             self.meta_buffers[topic] = unit
 
     def _flush_and_send(self):
@@ -44,17 +58,22 @@ class TimeWindowAggregator:
         with self.lock:
             current_buffers = self.buffers
             self.buffers = {}
+            current_times = self.time_buffers
+            self.time_buffers = {}
             meta = self.meta_buffers
             self.meta_buffers = {}
 
-        timestamp = time.time_ns()
-
         for topic, values in current_buffers.items():
             if not values:
                 continue
             
             # Calculate the average of all data points received in this window
             avg_value = sum(values) / len(values)
+
+            # Stamp the average with the mean acquisition time of its samples,
+            # not with the flush time, so Foxglove plots keep the real timing
+            times = current_times[topic]
+            timestamp = sum(times) // len(times)
             unit = meta.get(topic, "")
 
             payload = {"value": avg_value, "timestamp_ns": timestamp}
@@ -94,56 +113,35 @@ def connect(host, port):
 # ACQUISITION LISTENER
 # ==========================================================
 
+def add_signals(aggregator, source, timestamp_ns, signals):
+    # CAN signals are grouped under /CAN in Foxglove
+    prefix = "/CAN" if source == "can" else ""
+
+    for name, value, unit in signals:
+        aggregator.add_value(f"{prefix}{name}", value, unit, timestamp_ns=timestamp_ns)
+
+
+def shared_memory_listener(aggregator):
+    logging.info(f"Reading acquisition from shared memory {SHM_RING_PATH}")
+
+    for source, timestamp_ns, signals in ShmRingReader(SHM_RING_PATH):
+        add_signals(aggregator, source, timestamp_ns, signals)
+
+
 def acquisition_listener(fox, aggregator):
+    if ACQUISITION_TRANSPORT == "shm":
+        shared_memory_listener(aggregator)
+        return
+
     while True:
         try:
             logging.info("Connecting to acquisition...")
             sock = connect(ACQUISITION_HOST, ACQUISITION_PORT)
             logging.info("Connected to acquisition")
 
-            sock_file = sock.makefile('r', encoding='utf-8')
-
-            while True:
-                line = sock_file.readline()
-                
-                if not line:
-                    raise ConnectionError("Acquisition connection closed")
-
-                if not line.strip():
-                    continue
-
-                try:
-                    msg = json.loads(line)
-                    
-                    if "n" in msg and "v" in msg:
-                        if msg.get("v") is not None:
-                            aggregator.add_value(msg.get("n"), msg.get("v"))
-
-                    elif msg.get("source") == "can":
-                        signals = msg.get("signals", {})
-                        for name, value in signals.items():
-                            aggregator.add_value(f"/CAN/{name}", value)
-
-                    '''elif msg.get("source") == "imu":
-                        for signal in msg.get("signals", []):
-                            name = signal.get("name")
-                            value = signal.get("value")
-                            if name:
-                                aggregator.add_value(name, value)
-
-                    elif msg.get("source") == "gps":
-                        # Break GPS payload into individual topics for averaging
-                        if "latitude" in msg and "longitude" in msg:
-                            aggregator.add_value("/GPS/latitude", msg.get("latitude", 0.0))
-                            aggregator.add_value("/GPS/longitude", msg.get("longitude", 0.0))
-                            aggregator.add_value("/GPS/altitude", msg.get("altitude", 0.0))
-                            aggregator.add_value("/GPS/speed", msg.get("speed", 0.0))
-                            aggregator.add_value("/GPS/heading", msg.get("heading", 0.0))
-                            aggregator.add_value("/GPS/satellites", msg.get("satellites", 0))
-                            aggregator.add_value("/GPS/fix", msg.get("fix", 0))'''
-
-                except Exception as e:
-                    logging.error(f"Invalid JSON line in acquisition: {e}")
+            # Binary stream when the gateway supports it, NDJSON otherwise
+            for source, timestamp_ns, signals in StreamReader(sock, binary=ACQUISITION_BINARY):
+                add_signals(aggregator, source, timestamp_ns, signals)
 
         except Exception as e:
             logging.error(f"Acquisition connection error: {e}")